@@ -1,15 +1,31 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 
-from customer_ai.utils import normalize
-from customer_ai.columns import read_uploaded_file, detect_columns, sidebar_column_mapping
-from customer_ai.scoring import build_config_from_sidebar
+from customer_ai.columns import detect_columns
+from customer_ai.downloads import get_export_cache, export_format_selector
+from customer_ai.sidebar import (
+    get_stage_cache,
+    get_parsed_cache,
+    get_snapshot_store,
+    load_uploaded_header,
+    load_uploaded_file,
+    sidebar_column_mapping,
+    sidebar_incremental,
+    saved_mapping,
+    build_config_from_sidebar,
+)
+from customer_ai.pipeline import run_pipeline, required_columns
+from customer_ai.incremental import snapshot_result
 from customer_ai.main_tab import render_main_tab
+from customer_ai.incremental_panel import render_snapshot_diff
 from customer_ai.delta_tab import render_delta_tab
 from customer_ai.returns_tab import render_returns_tab
 from customer_ai.diag_tab import render_diag_tab
 from customer_ai.rep_turnover_tab import render_rep_turnover_tab
+from customer_ai.whatif_tab import render_whatif_tab
 from customer_ai.export_unified import render_unified_export
+from customer_ai.batch_panel import render_batch_panel
+from customer_ai.perf_panel import start_run, render_perf_panel
 
 st.set_page_config(page_title="المساعد الذكي لتصنيف العملاء - v5.6.5", layout="wide")
 st.title("المساعد الذكي لتصنيف العملاء وتحليل المديونية — v5.6.5")
@@ -17,22 +33,56 @@ st.title("المساعد الذكي لتصنيف العملاء وتحليل ا
 # ======================== الشريط الجانبي ========================
 st.sidebar.header("📂 ملف البيانات")
 uploaded_file = st.sidebar.file_uploader("ارفع ملف Excel أو CSV", type=["xlsx", "csv"])
+timer = start_run(uploaded_file.name if uploaded_file else None)
 
 st.sidebar.header("⚙️ الإعدادات الأساسية")
-config = build_config_from_sidebar()
+batch_mode = st.sidebar.toggle(
+    "تجميع التعديلات بزر تطبيق", value=False,
+    help="لا يعاد الحساب مع كل تعديل، بل عند الضغط على زر التطبيق فقط."
+)
+config = build_config_from_sidebar(batch=batch_mode)
+
+if st.sidebar.button("🧹 مسح النتائج المخزنة مؤقتًا"):
+    get_stage_cache().clear()
+    get_parsed_cache().clear()
+    get_export_cache().clear()
+    get_snapshot_store().clear()
+
+export_format_selector()
+
+# ======================== عدة ملفات (فروع) ========================
+render_batch_panel(config)
 
 # ======================== قراءة الملف ========================
 if not uploaded_file:
     st.info("⬆️ ارفع ملف العملاء للبدء (Excel/CSV).")
     st.stop()
 
-df = read_uploaded_file(uploaded_file)
-df.columns = [normalize(c) for c in df.columns]
-df_original = df.copy()
+cache = get_stage_cache()
+fast_read = st.sidebar.toggle(
+    "⚡ قراءة سريعة (الأعمدة المستخدمة فقط)", value=False,
+    help="يقرأ فقط الأعمدة التي يحتاجها التحليل؛ الملف الموحّد لن يحتوي بقية أعمدة الملف."
+)
+file_key, header = load_uploaded_header(uploaded_file, cache, timer)
 
 # ======================== اكتشاف/اختيار الأعمدة ========================
-detected = detect_columns(df)
-cols = sidebar_column_mapping(df, detected)
+# تعيين محفوظ لنفس شكل الملف => بدون اكتشاف
+detected = saved_mapping(header)
+from_profile = detected is not None
+if not from_profile:
+    detected = cache.get_or_compute((file_key, "detect"), timer.run, "detect", detect_columns, header)
+cols = sidebar_column_mapping(header, detected, from_profile=from_profile)
+id_col = sidebar_incremental(header)
+
+if fast_read:
+    usecols, numeric = required_columns(cols)
+    if id_col:
+        usecols = list(dict.fromkeys(usecols + [id_col]))
+    data_key, df = load_uploaded_file(
+        uploaded_file, cache, file_key, usecols=usecols, numeric=numeric, disk=get_parsed_cache(), timer=timer
+    )
+else:
+    data_key, df = load_uploaded_file(uploaded_file, cache, file_key, disk=get_parsed_cache(), timer=timer)
 
 st.sidebar.caption(
     f"Detected ➜ المديونية: {detected['debt'] or '—'} | المتوسط: {detected['avgq'] or '—'} | "
@@ -45,29 +95,56 @@ st.info(
     )
 )
 
+# ======================== الحساب (مرة واحدة لكل التبويبات) ========================
+missing = [c for c in [cols["debt"], cols["avgq"]] if c not in df.columns]
+if missing:
+    st.error(f"يجب توافر أعمدة: {missing}")
+    st.stop()
+
+# مقارنة مع الرفع السابق => لا يُعاد إلا تصنيف العملاء الجدد والمتغيرين
+snapshot = None
+if id_col and id_col in df.columns:
+    snapshot = snapshot_result(
+        get_snapshot_store(), df, cols, config, id_col, timer=timer, cache=cache, data_key=data_key
+    )
+    result = snapshot.result
+else:
+    result = run_pipeline(df, cols, config, timer=timer, cache=cache, data_key=data_key)
+
 # ======================== تبويبات الواجهة ========================
-tab_main, tab_delta, tab_returns, tab_diag, tab_rep = st.tabs([
+tab_main, tab_delta, tab_returns, tab_diag, tab_rep, tab_whatif = st.tabs([
     "🔎 التصنيف والتحليل الأساسي",
     "🔁 أعمدة الفارق المبسطة",
     "📊 تصنيفات المرتجع (مستقل)",
     "🛠️ تشخيص سريع",
-    "👥 دوران المديونية للمندوبين"
+    "👥 دوران المديونية للمندوبين",
+    "🧪 محاكاة الحدود",
 ])
 
+# زمن كل تبويب يشمل حساباته (عرض الجداول، أقسام المرتجع) ورسم عناصره
 with tab_main:
-    render_main_tab(df, df_original, cols, config)
+    if snapshot is not None:
+        render_snapshot_diff(snapshot)
+    timer.run("tab: main", render_main_tab, result)
 
 with tab_delta:
-    render_delta_tab(df, cols, config)
+    timer.run("tab: delta", render_delta_tab, result)
 
 with tab_returns:
-    render_returns_tab(df, cols, config)
+    timer.run("tab: returns", render_returns_tab, result)
 
 with tab_diag:
-    render_diag_tab(df, cols, config)
+    timer.run("tab: diag", render_diag_tab, result)
 
 with tab_rep:
-    render_rep_turnover_tab(df_original, cols, config)  # نستخدم الأصل لثبات الأعمدة
+    timer.run("tab: rep_turnover", render_rep_turnover_tab, result)
+
+with tab_whatif:
+    timer.run("tab: whatif", render_whatif_tab, result)
 
 # ======================== تصدير ملف موحّد ========================
-render_unified_export(df, df_original, cols, config)
\ No newline at end of file
+timer.run("unified_export", render_unified_export, result)
+
+# بعد كل التبويبات حتى يظهر زمن هذا التشغيل كاملًا
+with tab_diag:
+    render_perf_panel()
\ No newline at end of file
@@ -0,0 +1 @@
+"""قياس أداء خط التصنيف: مولّد ملفات عملاء اصطناعية + قياس زمن وذاكرة كل مرحلة."""
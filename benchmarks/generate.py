@@ -0,0 +1,105 @@
+"""
+مولّد ملفات عملاء اصطناعية بنفس شكل ملفات الفروع الحقيقية:
+
+    python -m benchmarks.generate --rows 10000 100000 1000000 --out-dir bench_data
+
+أرقام عربية-هندية، فواصل (٬ و ،)، نسب بعلامة %، خلايا فارغة، متوسطات = 0،
+مندوبين كثيرين، وأعمدة المرتجع والسداد الشهري.
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_ARABIC_DIGITS = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _as_arabic_text(values: np.ndarray, sep: str, suffix: str = "") -> list:
+    """12345.5 => "١٢٬٣٤٥٫٥" (الفاصل sep للآلاف)."""
+    return [
+        f"{v:,.2f}".replace(",", sep).replace(".", "٫").translate(_ARABIC_DIGITS) + suffix
+        for v in values
+    ]
+
+
+def _mix_text(rng, values: np.ndarray, share: float, sep_choices=("٬", "،"), suffix: str = "") -> np.ndarray:
+    """نسبة share من القيم تُكتب نصًا عربيًا والباقي يبقى رقمًا (كما في ملفات Excel المدمجة)."""
+    out = values.astype(object)
+    picked = np.flatnonzero(rng.random(len(values)) < share)
+    for sep in sep_choices:
+        part = picked[rng.random(len(picked)) < 1 / len(sep_choices)] if sep != sep_choices[-1] else picked
+        out[part] = _as_arabic_text(values[part], sep, suffix)
+        picked = np.setdiff1d(picked, part, assume_unique=True)
+    return out
+
+
+def make_customers(rows: int, seed: int = 0, reps: int | None = None) -> pd.DataFrame:
+    """ملف عملاء اصطناعي بعدد rows صفًا (نفس البذرة => نفس الملف)."""
+    rng = np.random.default_rng(seed)
+    reps = reps or max(20, rows // 400)
+
+    rep_ids = rng.integers(1, reps + 1, rows)
+    avgq = (60_000 * rng.beta(0.7, 4, rows)).round(2)
+    avgq[rng.random(rows) < 0.06] = 0.0                      # متوسط = 0
+    debt = (avgq * rng.gamma(2, 0.9, rows) + rng.uniform(0, 3000, rows)).round(2)
+    high = (avgq * rng.uniform(0.6, 1.8, rows)).round(2)
+    monthly = (avgq / 3 * rng.uniform(0.5, 1.5, rows)).round(2)
+    age = rng.gamma(2.5, 18, rows).round()
+
+    ret_base = rng.gamma(2, 3, rows).round(2)
+    ret_new = rng.uniform(0, 12, rows).round(2)
+    ret_comp = rng.uniform(0, 12, rows).round(2)
+
+    df = pd.DataFrame({
+        "رقم العميل": np.arange(1, rows + 1),
+        "اسم العميل": [f"عميل {i}" for i in range(1, rows + 1)],
+        "رقم المندوب": rep_ids,
+        "اسم المندوب": pd.Series([f"مندوب {i}" for i in range(reps + 1)])[rep_ids].to_numpy(),
+        "المديونية": _mix_text(rng, debt, 0.3),
+        "متوسط السداد الربعي": _mix_text(rng, avgq, 0.1),
+        "أعلى متوسط السداد الربعي": high,
+        "عمر المديونية (يوم)": age,
+        "السداد الشهري للعميل": _mix_text(rng, monthly, 0.1),
+        "نسبة المرتجع من المباع": _mix_text(rng, ret_base, 0.5, sep_choices=("٬",), suffix="%"),
+        "نسبة نوع جديد من مرتجعات العميل": ret_new,
+        "نسبة نوع تعويض من مرتجعات العميل": ret_comp,
+    })
+
+    # خلايا فارغة متفرقة
+    for col, share in [("المديونية", 0.02), ("متوسط السداد الربعي", 0.01), ("عمر المديونية (يوم)", 0.03),
+                       ("أعلى متوسط السداد الربعي", 0.02), ("نسبة نوع جديد من مرتجعات العميل", 0.05)]:
+        df.loc[rng.random(rows) < share, col] = np.nan
+    return df
+
+
+def write_customers(df: pd.DataFrame, path: Path):
+    if path.suffix.lower() == ".csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        from customer_ai.export import write_excel
+        write_excel(df, path)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.generate", description="توليد ملفات عملاء اصطناعية للقياس")
+    p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="أحجام الملفات بالصفوف")
+    p.add_argument("--out-dir", type=Path, default=Path("bench_data"))
+    p.add_argument("--format", nargs="+", choices=["csv", "xlsx"], default=["csv"])
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for rows in args.rows:
+        df = make_customers(rows, seed=args.seed)
+        for fmt in args.format:
+            path = args.out_dir / f"customers_{rows}.{fmt}"
+            write_customers(df, path)
+            print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
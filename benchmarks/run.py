@@ -0,0 +1,174 @@
+"""
+قياس زمن وذاكرة كل مرحلة من خط التصنيف على ملفات العملاء (انظر generate.py):
+
+    python -m benchmarks.run bench_data/ --repeat 3 --output bench.json
+    python -m benchmarks.run bench_data/ --compare bench_old.json
+
+المراحل: read (قراءة + normalize)، detect، clean، pp/age/risk (النقاط)، final (نسب المندوب)،
+plan (خطة المعالجة)، scored، delta، returns، rep_turnover، unified، ثم export_<صيغة> (كتابة في الذاكرة).
+الزمن = الوسيط على --repeat مرات؛ الذاكرة = ذروة tracemalloc لكل مرحلة في تشغيل منفصل.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from customer_ai.utils import normalize
+from customer_ai.columns import read_table, detect_columns
+from customer_ai.scoring import merge_config
+from customer_ai.pipeline import StageTimer, run_pipeline
+from customer_ai.batch import resolve_columns, expand_inputs
+from customer_ai.export import write_frame, available_formats
+
+DEFAULT_EXPORT_FORMATS = ["csv"]
+
+
+def _read(path: Path) -> pd.DataFrame:
+    df = read_table(path)
+    df.columns = [normalize(c) for c in df.columns]
+    return df
+
+
+def _serialize(df: pd.DataFrame, fmt: str) -> pd.DataFrame:
+    buf = io.BytesIO()
+    write_frame(df, buf, fmt)
+    return df
+
+
+def run_once(path: Path, config: dict, formats: list) -> list:
+    """تشغيل كامل واحد لملف؛ يرجع سجلات المراحل."""
+    timer = StageTimer()
+    df = timer.run("read", _read, path)
+    cols = resolve_columns(timer.run("detect", detect_columns, df), {})
+    result = run_pipeline(df, cols, config, timer=timer)
+    for fmt in formats:
+        timer.run(f"export_{fmt}", _serialize, result.unified, fmt)
+    return timer.records
+
+
+def bench_file(path: Path, config: dict, repeat: int = 3, formats=None, memory: bool = True) -> dict:
+    """{"file", "rows", "stages": {المرحلة: {seconds, min_seconds, rows, peak_mb}}, "total_seconds"}."""
+    formats = DEFAULT_EXPORT_FORMATS if formats is None else formats
+    runs = [run_once(path, config, formats) for _ in range(repeat)]
+
+    peaks = {}
+    if memory:
+        tracemalloc.start()
+        try:
+            peaks = {r["stage"]: r["peak_mb"] for r in run_once(path, config, formats)}
+        finally:
+            tracemalloc.stop()
+
+    stages = {}
+    for rec in runs[0]:
+        name = rec["stage"]
+        secs = [r["seconds"] for run in runs for r in run if r["stage"] == name]
+        stages[name] = {
+            "seconds": round(statistics.median(secs), 4),
+            "min_seconds": min(secs),
+            "rows": rec["rows"],
+            "peak_mb": peaks.get(name),
+        }
+    return {
+        "file": path.name,
+        "rows": stages["read"]["rows"],
+        "stages": stages,
+        "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_meta(repeat: int, formats: list) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "export_formats": formats,
+    }
+
+
+def compare(new: dict, old: dict) -> pd.DataFrame:
+    """جدول (ملف، مرحلة) بزمن الإصدارين والنسبة الجديد/القديم (< 1 => أسرع)."""
+    old_files = {f["file"]: f for f in old["files"]}
+    rows = []
+    for f in new["files"]:
+        before = old_files.get(f["file"])
+        if before is None:
+            continue
+        for stage, s in f["stages"].items():
+            o = before["stages"].get(stage)
+            if o is None:
+                continue
+            rows.append({
+                "file": f["file"],
+                "stage": stage,
+                "old_s": o["seconds"],
+                "new_s": s["seconds"],
+                "ratio": round(s["seconds"] / o["seconds"], 3) if o["seconds"] else None,
+                "old_peak_mb": o.get("peak_mb"),
+                "new_peak_mb": s.get("peak_mb"),
+            })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.run", description="قياس زمن وذاكرة مراحل خط التصنيف")
+    p.add_argument("inputs", nargs="+", type=Path, help="ملفات Excel/CSV أو مجلدات بها ملفات")
+    p.add_argument("--config", type=Path, help="ملف JSON بنفس شكل إعدادات الشريط الجانبي")
+    p.add_argument("--repeat", type=int, default=3, help="عدد مرات القياس (يُسجل الوسيط)")
+    p.add_argument("--export", nargs="*", choices=available_formats(), default=DEFAULT_EXPORT_FORMATS,
+                   help="صيغ تُقاس كتابتها للملف الموحّد")
+    p.add_argument("--no-memory", action="store_true", help="بدون تشغيل tracemalloc (أسرع للملفات الكبيرة)")
+    p.add_argument("--output", type=Path, help="حفظ النتائج JSON لمقارنتها لاحقًا")
+    p.add_argument("--compare", type=Path, help="ملف JSON من تشغيل سابق للمقارنة")
+    args = p.parse_args(argv)
+
+    overrides = json.loads(args.config.read_text(encoding="utf-8")) if args.config else {}
+    config = merge_config(overrides)
+
+    report = {"meta": run_meta(args.repeat, args.export), "files": []}
+    for path in expand_inputs(args.inputs):
+        res = bench_file(path, config, args.repeat, args.export, memory=not args.no_memory)
+        report["files"].append(res)
+        print(f"[{res['file']}] {res['rows']} صف — {res['total_seconds']} ث", file=sys.stderr)
+        table = pd.DataFrame.from_dict(res["stages"], orient="index")
+        print(table.to_string(), file=sys.stderr)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        table = compare(report, old)
+        if table.empty:
+            print("لا توجد ملفات بنفس الاسم في ملف المقارنة", file=sys.stderr)
+        else:
+            print(table.to_string(index=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,191 @@
+"""
+تشغيل خط التصنيف على ملف أو عدة ملفات (فروع) بدون Streamlit.
+عدة ملفات تُوزع على عمليات متوازية (ملف لكل عملية) ثم تُجمع في ملف موحّد بعمود الملف المصدر.
+"""
+import io
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+from .utils import normalize
+from .columns import read_table, read_header, detect_columns
+from .cache import content_hash, config_hash
+from .disk_cache import ParsedFileCache
+from .pipeline import StageTimer, run_pipeline, required_columns
+from .export import write_frame
+from .chunked import run_chunked
+
+SOURCE_COL = "الملف المصدر"
+INPUT_SUFFIXES = (".xlsx", ".csv")  # .xls القديم لا يقرؤه openpyxl (قراءة العناوين والدفعات)
+
+
+def resolve_columns(detected: dict, overrides: dict) -> dict:
+    """دمج الأعمدة المكتشفة مع المحددة من سطر الأوامر (نفس مفاتيح sidebar_column_mapping)."""
+    cols = {
+        "debt": overrides.get("debt") or detected["debt"],
+        "avgq": overrides.get("avgq") or detected["avgq"],
+        "age": overrides.get("age") or detected["age"],
+        "high_avgq": overrides.get("high") or detected["high"],
+    }
+    missing = [k for k in ("debt", "avgq") if not cols[k]]
+    if missing:
+        raise ValueError(f"تعذر تحديد أعمدة: {missing} — استخدم --debt/--avgq")
+    return cols
+
+
+def write_output(frame, path: Path, fmt: str = "xlsx"):
+    write_frame(frame, path, fmt)
+
+
+def _read_normalized(source, usecols=None, numeric=None, name: str | None = None) -> pd.DataFrame:
+    df = read_table(source, name=name, usecols=usecols, numeric=numeric)
+    df.columns = [normalize(c) for c in df.columns]
+    return df
+
+
+def _read(path, disk: ParsedFileCache | None, usecols=None, numeric=None, name: str | None = None) -> pd.DataFrame:
+    """قراءة الملف (من ذاكرة القرص إن وُجد بنفس المحتوى والأعمدة). path مسار أو ملف مفتوح مع name."""
+    if disk is None:
+        return _read_normalized(path, usecols, numeric, name)
+    key = content_hash(path.getvalue() if hasattr(path, "getvalue") else path.read_bytes())
+    if usecols is not None:
+        key = f"{key}:{config_hash([usecols, numeric])}"
+    return disk.get_or_parse(key, _read_normalized, path, usecols, numeric, name)
+
+
+def score_file(path, config: dict, overrides: dict, fast: bool = False,
+               disk: ParsedFileCache | None = None, timer: StageTimer | None = None, name: str | None = None):
+    """قراءة ملف واحد واكتشاف أعمدته وتشغيل كل المراحل. يرجع PipelineResult."""
+    timer = timer or StageTimer()
+    if fast:
+        # العناوين أولًا ثم تحميل الأعمدة المطلوبة فقط
+        header = timer.run("read_header", read_header, path, name)
+        header = pd.DataFrame(columns=[normalize(c) for c in header])
+        detected = timer.run("detect", detect_columns, header)
+        cols = resolve_columns(detected, overrides)
+        usecols, numeric = required_columns(cols)
+        df = timer.run("read", _read, path, disk, usecols, numeric, name)
+    else:
+        df = timer.run("read", _read, path, disk, None, None, name)
+        detected = timer.run("detect", detect_columns, df)
+        cols = resolve_columns(detected, overrides)
+    return run_pipeline(df, cols, config, timer=timer)
+
+
+def run_file(path: Path, config: dict, overrides: dict, output: Path | None, fast: bool = False,
+             disk: ParsedFileCache | None = None, fmt: str = "xlsx", chunk_rows: int | None = None,
+             name: str | None = None) -> dict:
+    """
+    تشغيل كل المراحل على ملف واحد وكتابة الملف الموحّد (output=None => بدون كتابة).
+    chunk_rows: معالجة على دفعات لملف لا يتسع في الذاكرة (انظر chunked.py).
+    يرجع {"timings": أزمنة المراحل، "failures": الخلايا الفاشلة، "unified": الملف الموحّد أو None مع الدفعات}.
+    """
+    timer = StageTimer()
+
+    if chunk_rows:
+        header = timer.run("read_header", read_header, path)
+        header = pd.DataFrame(columns=[normalize(c) for c in header])
+        cols = resolve_columns(timer.run("detect", detect_columns, header), overrides)
+        stats = run_chunked(path, cols, config, output, fmt, chunk_rows, timer)
+        return {"timings": timer.records, "failures": stats["failures"], "unified": None}
+
+    result = score_file(path, config, overrides, fast=fast, disk=disk, timer=timer, name=name)
+    if output is not None:
+        timer.run("write", write_output, result.unified, output, fmt)
+    return {"timings": timer.records, "failures": result.failures, "unified": result.unified}
+
+
+# ================= عدة ملفات بالتوازي =================
+def expand_inputs(paths) -> list:
+    """المسارات المعطاة مع استبدال كل مجلد بملفات Excel/CSV التي بداخله (مرتبة بالاسم)."""
+    out = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            out += sorted(f for f in p.iterdir() if f.suffix.lower() in INPUT_SUFFIXES and not f.name.startswith("~$"))
+        else:
+            out.append(p)
+    return out
+
+
+def output_paths(sources, output_dir: Path, ext: str) -> list:
+    """
+    ملف نتائج لكل مدخل: {الاسم}_نتائج_موحدة. الأسماء المتكررة (x.csv و x.xlsx، أو نفس الاسم في
+    مجلدين) تُميز بامتداد المصدر ثم برقم، حتى لا تكتب عمليتان على نفس الملف.
+    """
+    stems = [Path(p).stem for p in sources]
+    counts = Counter(stems)
+    out, used = [], set()
+    for p, stem in zip(map(Path, sources), stems):
+        name = stem if counts[stem] == 1 else f"{stem}_{p.suffix.lstrip('.').lower()}"
+        base, i = name, 2
+        while name in used:
+            name, i = f"{base}_{i}", i + 1
+        used.add(name)
+        out.append(Path(output_dir) / f"{name}_نتائج_موحدة{ext}")
+    return out
+
+
+def _run_job(job: dict) -> dict:
+    """
+    ملف واحد داخل عملية منفصلة (دالة على مستوى الوحدة حتى تُرسل للعمليات).
+    job["source"] مسار أو (اسم، بايتات) لملف مرفوع. الأخطاء تُعاد ولا توقف بقية الملفات.
+    job["frame_path"]: حفظ الملف الموحّد (pickle) هناك بدل إرجاعه، فيبقى على القرص لا في الذاكرة.
+    """
+    source = job["source"]
+    if isinstance(source, tuple):
+        name, path = source[0], io.BytesIO(source[1])
+    else:
+        name, path = Path(source).name, Path(source)
+    disk = ParsedFileCache(job["cache_dir"]) if job.get("cache_dir") else None
+    t0 = time.perf_counter()
+    try:
+        out = run_file(
+            path, job["config"], job["overrides"], job.get("output"),
+            fast=job.get("fast", False), disk=disk, fmt=job.get("fmt", "xlsx"),
+            chunk_rows=job.get("chunk_rows"), name=name,
+        )
+        if job.get("frame_path") and out["unified"] is not None:
+            out["unified"].to_pickle(job["frame_path"])
+    except Exception as e:
+        return {"name": name, "output": job.get("output"), "error": str(e), "seconds": round(time.perf_counter() - t0, 4)}
+    unified = out["unified"]
+    return {
+        "name": name,
+        "output": job.get("output"),
+        "error": None,
+        "seconds": round(time.perf_counter() - t0, 4),
+        "rows": None if unified is None else len(unified),
+        "timings": out["timings"],
+        "failures": out["failures"],
+        "unified": unified if job.get("keep_frame") else None,
+        "frame_path": job.get("frame_path"),
+    }
+
+
+def run_batch(jobs: list, workers: int | None = None):
+    """
+    تشغيل الملفات على عمليات متوازية (workers=None => عدد الأنوية، 1 => في نفس العملية).
+    يُرجع نتائج الملفات بنفس ترتيب jobs تباعًا كلما انتهى ما قبلها.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+    if workers == 1:
+        yield from map(_run_job, jobs)
+        return
+    # spawn: عمليات نظيفة لا ترث خيوط Streamlit/الخادم
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        yield from pool.map(_run_job, jobs)
+
+
+def combine_unified(parts) -> pd.DataFrame:
+    """دمج الملفات الموحّدة [(اسم الملف، df)] في ملف واحد؛ أول عمود هو الملف المصدر."""
+    frames = []
+    for name, df in parts:
+        frames.append(pd.concat([pd.Series(name, index=df.index, name=SOURCE_COL), df], axis=1))
+    if not frames:
+        return pd.DataFrame(columns=[SOURCE_COL])
+    return pd.concat(frames, ignore_index=True, sort=False)
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+
+import pandas as pd
+import streamlit as st
+
+from .batch import run_batch, combine_unified, output_paths
+from .cache import content_hash, config_hash
+from .downloads import lazy_download_button
+from .export import DEFAULT_EXPORT_DIR
+
+BATCH_STATE_KEY = "batch_results"
+# ملفات الفروع الموحّدة على القرص (مجلد لكل تشغيل)؛ الجلسة تحفظ الملخص والمسارات فقط
+BATCH_DIR = DEFAULT_EXPORT_DIR / "batch"
+
+
+def render_batch_panel(config: dict):
+    """رفع عدة ملفات (فرع لكل ملف) ومعالجتها بالتوازي بنفس الإعدادات، مع ملف لكل فرع وملف مجمّع."""
+    with st.expander("📚 معالجة عدة ملفات (فروع) دفعة واحدة", expanded=False):
+        files = st.file_uploader(
+            "ارفع ملفات الفروع (Excel/CSV)", type=["xlsx", "csv"],
+            accept_multiple_files=True, key="batch_files",
+        )
+        st.caption("الأعمدة تُكتشف تلقائيًا لكل ملف، وكل ملف يُعالج في عملية مستقلة (حسب عدد الأنوية).")
+
+        if files and st.button("▶️ معالجة كل الملفات", key="batch_run"):
+            sources = [(f.name, f.getvalue()) for f in files]
+            batch_key = config_hash([[content_hash(data) for _, data in sources], config])
+            previous = st.session_state.pop(BATCH_STATE_KEY, None)
+            if previous:
+                shutil.rmtree(previous["dir"], ignore_errors=True)
+            BATCH_DIR.mkdir(parents=True, exist_ok=True)
+            run_dir = tempfile.mkdtemp(dir=BATCH_DIR)
+            frame_paths = output_paths([name for name, _ in sources], run_dir, ".pkl")
+            jobs = [
+                {"source": src, "config": config, "overrides": {}, "output": None, "frame_path": path}
+                for src, path in zip(sources, frame_paths)
+            ]
+            progress = st.progress(0.0, text="جارٍ المعالجة...")
+            items = []
+            for i, res in enumerate(run_batch(jobs), start=1):
+                items.append(res)
+                progress.progress(i / len(jobs), text=f"{i} / {len(jobs)} — {res['name']}")
+            progress.empty()
+            st.session_state[BATCH_STATE_KEY] = {"key": batch_key, "dir": run_dir, "items": items}
+
+        state = st.session_state.get(BATCH_STATE_KEY)
+        if not state:
+            return
+
+        items = state["items"]
+        st.dataframe(
+            pd.DataFrame({
+                "الملف": [r["name"] for r in items],
+                "عدد الصفوف": [r.get("rows") for r in items],
+                "الزمن (ث)": [r["seconds"] for r in items],
+                "الحالة": [f"❌ {r['error']}" if r["error"] else "✅" for r in items],
+            }),
+            use_container_width=True,
+        )
+
+        done = [r for r in items if not r["error"]]
+        if not done:
+            return
+
+        lazy_download_button(
+            "⬇️ تحميل الملف المجمّع لكل الفروع",
+            (state["key"], "combined"),
+            lambda: combine_unified([(r["name"], pd.read_pickle(r["frame_path"])) for r in done]),
+            file_name="نتائج_موحدة_كل_الملفات.xlsx",
+        )
+
+        names = [r["name"] for r in done]
+        picked = st.selectbox("ملف فرع", names, key="batch_pick")
+        one = done[names.index(picked)]
+        lazy_download_button(
+            f"⬇️ تحميل نتائج {picked}",
+            (state["key"], picked),
+            lambda: pd.read_pickle(one["frame_path"]),
+            file_name=f"{picked.rsplit('.', 1)[0]}_نتائج_موحدة.xlsx",
+        )
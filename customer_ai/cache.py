@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STAGE_CACHE_MB = int(os.environ.get("CUSTOMER_AI_STAGE_CACHE_MB", "1024"))
+
+
+def content_hash(data: bytes) -> str:
+    """بصمة محتوى الملف المرفوع (نفس الملف = نفس المفتاح مهما تغير اسمه)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def config_hash(obj) -> str:
+    """بصمة ثابتة لجزء من الإعدادات (ترتيب المفاتيح لا يؤثر)."""
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def value_nbytes(value) -> int:
+    """حجم تقريبي في الذاكرة لنتيجة مرحلة (إطارات/أعمدة/مصفوفات، وما بداخل tuple/list/dict)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    return 0
+
+
+class StageCache:
+    """
+    ذاكرة مؤقتة LRU لنتائج المراحل، المفتاح = (بصمة الملف، اسم المرحلة، ...).
+    القيم المخزنة تُشارك كما هي، فلا يجب تعديلها بعد الإرجاع.
+    مشتركة بين الجلسات (st.cache_resource) => كل قراءة/تعديل تحت قفل، والحساب نفسه خارجه.
+    محدودة بعدد المدخلات وبالحجم (max_mb)؛ الأقدم استخدامًا يُحذف أولًا وتبقى آخر نتيجة دائمًا.
+    """
+
+    def __init__(self, max_entries: int = 64, max_mb: int = DEFAULT_STAGE_CACHE_MB):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb) * 1024 * 1024
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: tuple, fn, *args, **kwargs):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = fn(*args, **kwargs)
+        size = value_nbytes(value)
+        with self._lock:
+            self._remove(key)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._items) > 1 and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._items)))
+        return value
+
+    def _remove(self, key):
+        if key in self._items:
+            del self._items[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def invalidate(self, file_key: str | None = None, stage: str | None = None):
+        """
+        حذف مدخلات ملف معيّن و/أو مرحلة معيّنة (بدون معاملات = مسح الكل).
+        مفاتيح البيانات التي تبدأ ببصمة الملف (مثل القراءة الجزئية) تُحذف معه.
+        """
+        with self._lock:
+            for key in list(self._items):
+                if file_key is not None and not str(key[0]).startswith(file_key):
+                    continue
+                if stage is not None and key[1] != stage:
+                    continue
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from .utils import normalize, clean_numeric
+from .columns import iter_table_chunks
+from .export import open_stream_writer
+from .scoring import final_classification_vec, rep_class_sums, rep_class_ratios
+from .pipeline import (
+    REP_COL_CANDIDATES,
+    REP_ID_COL,
+    REP_NAME_COL,
+    REP_TURNOVER_REQUIRED,
+    RETURN_COLUMNS,
+    StageTimer,
+    clean_block,
+    pp_block,
+    age_block,
+    risk_block,
+    final_block,
+    plan_block,
+    class_share_map,
+    assemble_scored,
+    compute_delta_table,
+    compute_returns_table,
+    compute_rep_turnover_map,
+    rep_turnover_sums,
+    rep_turnover_ratios,
+    assemble_unified,
+    required_columns,
+    returns_values,
+    returns_ref_mask,
+)
+
+# معالجة ملف أكبر من الذاكرة على دفعات (بدون Streamlit):
+# 1) تمريرة إحصاءات: أعلى متوسط سداد + إجماليات المندوبين + إجمالي المديونية
+# 2) تمريرة إحصاءات تعتمد على التصنيف: مصفوفة المندوب × التصنيف + مديونية كل تصنيف + معيار المرتجع
+# 3) تمريرة التصنيف والكتابة: كل دفعة تُصنف بإحصاءات الملف كاملًا وتُكتب مباشرة إلى الملف الناتج
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def _chunks(path, chunk_rows: int, usecols=None):
+    for chunk in iter_table_chunks(path, chunk_rows, usecols=usecols):
+        chunk.columns = [normalize(c) for c in chunk.columns]
+        yield chunk
+
+
+def first_pass(path, cols: dict, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """إحصاءات لا تعتمد على التصنيف: أعلى متوسط، إجمالي المديونية، خلايا فاشلة، إجماليات المندوبين."""
+    usecols, _ = required_columns(cols)
+    max_avg, total_debt, rows = np.nan, 0.0, 0
+    failures, rep_parts = {}, []
+    for chunk in _chunks(path, chunk_rows, usecols):
+        num, fails = clean_block(chunk, cols)
+        max_avg = np.fmax(max_avg, num[cols["avgq"]].max())
+        total_debt += num[cols["debt"]].sum(skipna=True)
+        rows += len(chunk)
+        for c, n in fails.items():
+            failures[c] = failures.get(c, 0) + n
+        if all(c in chunk.columns for c in REP_TURNOVER_REQUIRED):
+            rep_parts.append(rep_turnover_sums(chunk))
+
+    rep_turnover = pd.DataFrame()
+    if rep_parts:
+        rep_turnover = rep_turnover_ratios(
+            pd.concat(rep_parts).groupby([REP_ID_COL, REP_NAME_COL], dropna=False).sum().reset_index()
+        )
+    return {
+        "max_avg": max_avg,
+        "total_debt": total_debt,
+        "rows": rows,
+        "failures": failures,
+        "rep_turnover": rep_turnover,
+    }
+
+
+def second_pass(path, cols: dict, config: dict, stats: dict, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """إحصاءات تحتاج التصنيف (وبالتالي أعلى متوسط من التمريرة الأولى)."""
+    usecols, _ = required_columns(cols)
+    col_debt = cols["debt"]
+    class_parts, matrix_parts = [], []
+    ref_sum, ref_count = {}, {}
+    for chunk in _chunks(path, chunk_rows, usecols):
+        num, _ = clean_block(chunk, cols)
+        points = pd.concat([
+            pp_block(num, cols, config, stats),
+            age_block(num, cols, config),
+            risk_block(num, cols, config),
+        ], axis=1)
+        total = points[["نقاط القوة الشرائية", "نقاط الالتزام", "نقاط المخاطرة"]].sum(axis=1)
+        classes = final_classification_vec(total, config["final"])
+
+        class_parts.append(num[col_debt].groupby(classes).sum())
+        rep_col = next((c for c in REP_COL_CANDIDATES if c in chunk.columns), None)
+        if rep_col is not None:
+            work = pd.DataFrame({rep_col: chunk[rep_col], "التصنيف النهائي": classes, col_debt: num[col_debt]})
+            matrix_parts.append(rep_class_sums(work, rep_col, "التصنيف النهائي", col_debt))
+
+        # معيار المرتجع = متوسط القيم في مجموعة المرجع (نقاط 5–10) على الملف كاملًا
+        if cols["avgq"] in chunk.columns:
+            ref = returns_ref_mask(clean_numeric(chunk[cols["avgq"]]), stats["max_avg"])
+            present = [c for c in RETURN_COLUMNS if c in chunk.columns]
+            vals = returns_values(chunk, present)[ref]
+            for c in present:
+                ref_sum[c] = ref_sum.get(c, 0.0) + vals[c].sum(skipna=True)
+                ref_count[c] = ref_count.get(c, 0) + int(vals[c].notna().sum())
+
+    class_debt = pd.concat(class_parts).groupby(level=0).sum() if class_parts else pd.Series(dtype=float)
+    rep_matrix = None
+    if matrix_parts:
+        rep_matrix = rep_class_ratios(pd.concat(matrix_parts).groupby(level=[0, 1]).sum())
+    return {
+        "class_share": class_share_map(class_debt, stats["total_debt"]),
+        "rep_matrix": rep_matrix,
+        "returns_ref": {c: (ref_sum[c] / ref_count[c] if ref_count[c] else np.nan) for c in ref_sum},
+    }
+
+
+def score_chunk(chunk: pd.DataFrame, cols: dict, config: dict, stats: dict) -> pd.DataFrame:
+    """الملف الموحّد لدفعة واحدة بإحصاءات الملف كاملًا (نفس أعمدة run_pipeline)."""
+    num, _ = clean_block(chunk, cols)
+    pp = pp_block(num, cols, config, stats)
+    age = age_block(num, cols, config)
+    risk = risk_block(num, cols, config)
+    points = pd.concat([pp, age, risk], axis=1)
+    final, _ = final_block(chunk, num, points, cols, config, stats)
+    plan = plan_block(num, points, final, cols, config)
+    scored = assemble_scored(chunk, num, [pp, age, risk, final, plan])
+    delta = compute_delta_table(chunk, cols, config)
+    returns = compute_returns_table(chunk, cols, config, stats)
+    rep_map = compute_rep_turnover_map(chunk, stats["rep_turnover"])
+    return assemble_unified(scored, chunk, delta, returns, rep_map)
+
+
+def run_chunked(path, cols: dict, config: dict, output, fmt: str = "csv",
+                chunk_rows: int = DEFAULT_CHUNK_ROWS, timer: StageTimer | None = None) -> dict:
+    """
+    تصنيف ملف لا يتسع في الذاكرة: تمريرتان للإحصاءات ثم تصنيف وكتابة كل دفعة.
+    الذاكرة المستخدمة بحجم الدفعة وليس الملف. يرجع الإحصاءات (مع الخلايا الفاشلة وجدول المندوبين).
+    """
+    timer = timer or StageTimer()
+    stats = timer.run("chunked_pass1", first_pass, path, cols, chunk_rows)
+    stats.update(timer.run("chunked_pass2", second_pass, path, cols, config, stats, chunk_rows))
+
+    def _write():
+        writer = open_stream_writer(output, fmt)
+        try:
+            for chunk in _chunks(path, chunk_rows):
+                writer.write(score_chunk(chunk, cols, config, stats))
+        finally:
+            writer.close()
+
+    timer.run("chunked_write", _write)
+    return stats
@@ -0,0 +1,102 @@
+"""
+تشغيل خط التصنيف كاملًا بدون واجهة (بدون Streamlit):
+
+    python -m customer_ai فرع1.xlsx فرع2.csv --config config.json --output-dir out/
+
+الإعدادات بنفس شكل build_config_from_sidebar() (يكفي ذكر القيم المختلفة عن الافتراضي).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .scoring import merge_config
+from .export import EXPORT_FORMATS, STREAM_WRITERS, available_formats
+from .batch import combine_unified, expand_inputs, output_paths, run_batch, write_output
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="python -m customer_ai",
+        description="تصنيف العملاء وتحليل المديونية بدون واجهة (ملف موحّد لكل ملف إدخال).",
+    )
+    p.add_argument("inputs", nargs="+", type=Path, help="ملفات Excel/CSV أو مجلدات بها ملفات")
+    p.add_argument("--config", type=Path, help="ملف JSON بنفس شكل إعدادات الشريط الجانبي")
+    p.add_argument("--output-dir", type=Path, default=Path("."), help="مجلد ملفات النتائج")
+    p.add_argument("--format", choices=available_formats(), default="xlsx",
+                   help="صيغة الملف الموحّد (xlsx يُقسم على أوراق مرقمة بعد حد صفوف Excel)")
+    p.add_argument("--debt", help="عمود المديونية")
+    p.add_argument("--avgq", help="عمود متوسط السداد الربعي")
+    p.add_argument("--age", help="عمود عمر المديونية")
+    p.add_argument("--high", help="عمود أعلى متوسط السداد الربعي")
+    p.add_argument("--fast", action="store_true", help="قراءة سريعة: الأعمدة المستخدمة فقط (الملف الموحّد بدون بقية الأعمدة)")
+    p.add_argument("--cache-dir", type=Path, help="مجلد ذاكرة القرص للملفات المقروءة (Arrow) لتسريع إعادة التشغيل")
+    p.add_argument("--chunk-rows", type=int, help="معالجة على دفعات بهذا العدد من الصفوف لملفات أكبر من الذاكرة")
+    p.add_argument("--jobs", type=int, default=1, help="عدد الملفات المعالجة بالتوازي (0 = كل الأنوية)")
+    p.add_argument("--combined", action="store_true",
+                   help="إضافة ملف واحد يجمع نتائج كل الملفات مع عمود الملف المصدر")
+    p.add_argument("--timings-json", type=Path, help="حفظ أزمنة المراحل في ملف JSON")
+    return p
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.chunk_rows and args.format not in STREAM_WRITERS:
+        parser.error(f"--chunk-rows يدعم الصيغ: {', '.join(STREAM_WRITERS)}")
+
+    overrides = {}
+    if args.config:
+        overrides = json.loads(args.config.read_text(encoding="utf-8"))
+    config = merge_config(overrides)
+    col_overrides = {"debt": args.debt, "avgq": args.avgq, "age": args.age, "high": args.high}
+
+    if args.chunk_rows and args.combined:
+        parser.error("--combined غير متاح مع --chunk-rows")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    ext = EXPORT_FORMATS[args.format][0]
+    sources = expand_inputs(args.inputs)
+    jobs = [
+        {
+            "source": path,
+            "config": config,
+            "overrides": col_overrides,
+            "output": output,
+            "fmt": args.format,
+            "fast": args.fast,
+            "cache_dir": args.cache_dir,
+            "chunk_rows": args.chunk_rows,
+            "keep_frame": args.combined,
+        }
+        for path, output in zip(sources, output_paths(sources, args.output_dir, ext))
+    ]
+
+    all_timings, parts, errors = {}, [], 0
+    for job, res in zip(jobs, run_batch(jobs, args.jobs or None)):
+        name = res["name"]
+        if res["error"]:
+            errors += 1
+            print(f"[{name}] فشل: {res['error']}", file=sys.stderr)
+            continue
+        failed = {c: n for c, n in res["failures"].items() if n}
+        if failed:
+            print(f"[{name}] خلايا تعذر تحويلها إلى أرقام: {failed}", file=sys.stderr)
+        records = res["timings"]
+        all_timings[str(job["source"])] = records
+        total = sum(r["seconds"] for r in records)
+        print(f"[{name}] ➜ {res['output']} ({total:.2f}s)", file=sys.stderr)
+        for r in records:
+            rows = "" if r["rows"] is None else f"  rows={r['rows']}"
+            print(f"    {r['stage']:<14}{r['seconds']:>9.3f}s{rows}", file=sys.stderr)
+        if args.combined:
+            parts.append((name, res["unified"]))
+
+    if args.combined and parts:
+        output = args.output_dir / f"نتائج_موحدة_كل_الملفات{ext}"
+        write_output(combine_unified(parts), output, args.format)
+        print(f"[{len(parts)} ملف] ➜ {output}", file=sys.stderr)
+
+    if args.timings_json:
+        args.timings_json.write_text(json.dumps(all_timings, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if errors else 0
@@ -1,6 +1,18 @@
 import pandas as pd
-import streamlit as st
-from .utils import match_col
+from pandas.api.types import is_object_dtype, is_string_dtype
+from .utils import column_keys, match_keys, norm_key, normalize
+
+try:  # محرك CSV أسرع إن كان متوفرًا
+    import pyarrow  # noqa: F401
+    FAST_CSV_ENGINE = "pyarrow"
+except ImportError:
+    FAST_CSV_ENGINE = "c"
+
+try:  # محرك Excel أسرع (Rust) إن كان متوفرًا، وإلا openpyxl الافتراضي
+    import python_calamine  # noqa: F401
+    FAST_EXCEL_ENGINE = "calamine"
+except ImportError:
+    FAST_EXCEL_ENGINE = None
 
 # أسماء بديلة شائعة للأعمدة
 DEBT_ALIASES = [
@@ -24,68 +36,136 @@ HIGH_ALIASES = [
 ]
 
 
-def read_uploaded_file(uploaded_file):
-    """قراءة ملف CSV أو Excel بأمان"""
+# فهرس الأسماء البديلة بعد التطبيع (يُبنى مرة واحدة عند الاستيراد)
+ALIAS_INDEX = {
+    field: [norm_key(a) for a in aliases]
+    for field, aliases in {
+        "debt": DEBT_ALIASES,
+        "avgq": AVGQ_ALIASES,
+        "age": AGE_ALIASES,
+        "high": HIGH_ALIASES,
+    }.items()
+}
+
+
+def _is_csv(source, name) -> bool:
+    return str(name if name is not None else source).lower().endswith(".csv")
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _dedupe(names: list) -> list:
+    """
+    أسماء الأعمدة كما يعطيها pd.read_excel: الفارغ => Unnamed: N، والمكرر => x.1, x.2
+    متجاوزًا الأسماء الموجودة فعلًا (نفس ترتيب pandas: المسماة أولًا ثم الفارغة).
+    """
+    unnamed = [i for i, n in enumerate(names) if n is None or n == ""]
+    out = [f"Unnamed: {i}" if i in unnamed else str(n) for i, n in enumerate(names)]
+    counts = {}
+    for i in [i for i in range(len(out)) if i not in unnamed] + unnamed:
+        col = old = out[i]
+        count = counts.get(col, 0)
+        while count > 0:
+            counts[old] = count + 1
+            col = f"{old}.{count}"
+            count = count + 1 if col in out else counts.get(col, 0)
+        out[i] = col
+        counts[col] = count + 1
+    return out
+
+
+def read_header(source, name: str | None = None) -> list:
+    """قراءة صف العناوين فقط (بدون تحميل البيانات)."""
+    _rewind(source)
+    try:
+        if _is_csv(source, name):
+            return list(pd.read_csv(source, nrows=0).columns)
+        from openpyxl import load_workbook
+        wb = load_workbook(source, read_only=True, data_only=True)
+        try:
+            first = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+        return _dedupe(list(first))
+    finally:
+        _rewind(source)
+
+
+def _apply_numeric_hints(df: pd.DataFrame, numeric) -> pd.DataFrame:
+    """تحويل الأعمدة الرقمية المتوقعة إلى أرقام إذا كانت كل قيمها أرقامًا (بدون فقد أي قيمة)."""
+    for c in numeric or []:
+        if c in df.columns and (is_object_dtype(df[c]) or is_string_dtype(df[c])):
+            try:
+                df[c] = pd.to_numeric(df[c])
+            except (ValueError, TypeError):
+                pass  # نصوص (أرقام عربية/فواصل) — يتولاها clean_numeric لاحقًا
+    return df
+
+
+def read_table(source, name: str | None = None, usecols=None, numeric=None) -> pd.DataFrame:
+    """
+    قراءة CSV أو Excel من مسار أو ملف مفتوح (الامتداد من name أو من المسار).
+    Excel يُقرأ بـ calamine إن كان مثبتًا (أسرع بنحو 7 مرات من openpyxl بنفس النتيجة).
+    usecols (أسماء بعد normalize) تفعّل القراءة السريعة: الأعمدة المطلوبة فقط ومحرك CSV أسرع؛
+    و numeric أعمدة يُتوقع أنها رقمية.
+    """
+    if usecols is None:
+        _rewind(source)
+        if _is_csv(source, name):
+            return pd.read_csv(source)
+        return pd.read_excel(source, engine=FAST_EXCEL_ENGINE)
+
+    wanted = set(usecols)
+    raw = [h for h in read_header(source, name) if normalize(h) in wanted]
+    raw_numeric = [h for h in raw if normalize(h) in set(numeric or [])]
+    if _is_csv(source, name):
+        df = pd.read_csv(source, usecols=raw, engine=FAST_CSV_ENGINE)
+    else:
+        df = pd.read_excel(source, usecols=raw, engine=FAST_EXCEL_ENGINE)
+    _rewind(source)
+    return _apply_numeric_hints(df, raw_numeric)
+
+
+def iter_table_chunks(source, chunk_rows: int, name: str | None = None, usecols=None):
+    """
+    قراءة CSV أو Excel على دفعات من chunk_rows صفًا (بدون تحميل الملف كاملًا).
+    usecols بأسماء الأعمدة بعد normalize كما في read_table.
+    """
+    header = read_header(source, name)
+    raw = header if usecols is None else [h for h in header if normalize(h) in set(usecols)]
+    _rewind(source)
+    if _is_csv(source, name):
+        yield from pd.read_csv(source, chunksize=chunk_rows, usecols=None if usecols is None else raw)
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
     try:
-        if uploaded_file.name.lower().endswith(".csv"):
-            return pd.read_csv(uploaded_file)
-        return pd.read_excel(uploaded_file)
-    except Exception as e:
-        st.error(f"تعذر قراءة الملف: {e}")
-        st.stop()
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = _dedupe(list(next(rows, ())))
+        idx = [i for i, h in enumerate(header) if h in raw]
+        names = [header[i] for i in idx]
+        block, n_empty, start = [], 0, 0
+        for row in rows:
+            if all(v is None for v in row):
+                n_empty += 1  # الصفوف الفارغة تُحتسب فقط إذا تبعها صف به بيانات (مثل pd.read_excel)
+                continue
+            block.extend([[None] * len(idx)] * n_empty)
+            n_empty = 0
+            block.append([row[i] if i < len(row) else None for i in idx])
+            while len(block) >= chunk_rows:
+                yield pd.DataFrame(block[:chunk_rows], columns=names, index=pd.RangeIndex(start, start + chunk_rows))
+                block, start = block[chunk_rows:], start + chunk_rows
+        if block:
+            yield pd.DataFrame(block, columns=names, index=pd.RangeIndex(start, start + len(block)))
+    finally:
+        wb.close()
 
 
 def detect_columns(df: pd.DataFrame) -> dict:
-    """اكتشاف الأعمدة تلقائيًا"""
-    return {
-        "debt": match_col(df, DEBT_ALIASES),
-        "avgq": match_col(df, AVGQ_ALIASES),
-        "age":  match_col(df, AGE_ALIASES),
-        "high": match_col(df, HIGH_ALIASES),
-    }
-
-
-def sidebar_column_mapping(df: pd.DataFrame, detected: dict) -> dict:
-    """اختيار الأعمدة من الشريط الجانبي"""
-    st.sidebar.subheader("🧭 تعيين الأعمدة يدويًا (إن لزم)")
-    cols = list(df.columns)
-
-    def idx(name):
-        return cols.index(name) if name in cols else 0
-
-    col_debt = st.sidebar.selectbox(
-        "عمود المديونية",
-        cols,
-        index=idx(detected["debt"]) if detected["debt"] else 0
-    )
-
-    col_avgq = st.sidebar.selectbox(
-        "عمود متوسط السداد الربعي",
-        cols,
-        index=idx(detected["avgq"]) if detected["avgq"] else 0
-    )
-
-    col_age_opt = ["— (بدون) —"] + cols
-    col_age = st.sidebar.selectbox(
-        "عمود عمر المديونية (اختياري)",
-        col_age_opt,
-        index=(1 + idx(detected["age"])) if detected["age"] else 0
-    )
-    if col_age == "— (بدون) —":
-        col_age = None
-
-    col_high_opt = ["— (غير مستخدم) —"] + cols
-    col_high = st.sidebar.selectbox(
-        "عمود أعلى متوسط السداد الربعي (للفارق)",
-        col_high_opt,
-        index=(1 + idx(detected["high"])) if detected["high"] else 0
-    )
-    if col_high == "— (غير مستخدم) —":
-        col_high = None
-
-    return {
-        "debt": col_debt,
-        "avgq": col_avgq,
-        "age": col_age,
-        "high_avgq": col_high,
-    }
+    """اكتشاف الأعمدة تلقائيًا (تطبيع العناوين مرة واحدة ومطابقتها بفهرس الأسماء البديلة)"""
+    keys = column_keys(df.columns)
+    return {field: match_keys(keys, alias_keys) for field, alias_keys in ALIAS_INDEX.items()}
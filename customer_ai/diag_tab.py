@@ -1,10 +1,13 @@
 import streamlit as st
 
-def render_diag_tab(df, cols, config):
+from .pipeline import memory_report
+
+def render_diag_tab(result):
     st.subheader("🛠️ تشخيص أسباب (0) في نقاط المخاطرة")
 
-    col_avgq = cols["avgq"]
-    col_debt = cols["debt"]
+    df = result.scored
+    col_avgq = result.cols["avgq"]
+    col_debt = result.cols["debt"]
 
     if col_avgq not in df.columns:
         st.info("لا يمكن عرض التشخيص لعدم توفر عمود متوسط السداد.")
@@ -20,3 +23,8 @@ def render_diag_tab(df, cols, config):
 
     # متوافق مع score_risk (avg=0 => 0 نقاط)
     st.caption("عند متوسط سداد = 0، يتم إعطاء (0) نقاط مخاطرة حسب منطق الدالة الحالي.")
+
+    with st.expander("🧮 حجم النتائج في الذاكرة", expanded=False):
+        report = memory_report(result)
+        st.dataframe(report, use_container_width=True)
+        st.caption(f"الإجمالي: {report['الحجم (MB)'].sum():.1f} MB (النصوص المتكررة مخزنة كـ category).")
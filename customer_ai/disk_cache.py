@@ -0,0 +1,139 @@
+import os
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:  # اختياري: بدون pyarrow يعمل كل شيء بدون ذاكرة القرص
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("CUSTOMER_AI_CACHE_DIR", Path.home() / ".cache" / "customer_ai" / "parsed"))
+DEFAULT_MAX_MB = int(os.environ.get("CUSTOMER_AI_CACHE_MAX_MB", "2048"))
+
+# الأعمدة المختلطة (أرقام + نصوص، مثل "١٢٬٣٤٥" بجانب 12345) تُحفظ كجزأين وتُدمج عند القراءة
+_NUM_SUFFIX = "\x00num"
+_INT_SUFFIX = "\x00int"
+_STR_SUFFIX = "\x00str"
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool)
+
+
+def _to_arrow(df: pd.DataFrame):
+    """تحويل df إلى جدول Arrow؛ الأعمدة المختلطة تُقسم إلى (رقمي، نصي)."""
+    arrays, names, mixed = [], [], []
+    for c in df.columns:
+        s = df[c]
+        try:
+            arrays.append(pa.Array.from_pandas(s))
+            names.append(c)
+            continue
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        is_num = s.map(_is_number).to_numpy(dtype=bool)
+        is_int = s.map(lambda v: isinstance(v, (int, np.integer)) and not isinstance(v, bool)).to_numpy(dtype=bool)
+        num = pd.to_numeric(s.where(is_num), errors="coerce").astype(float)
+        txt = s.where(~is_num & s.notna()).map(lambda v: v if pd.isna(v) else str(v))
+        arrays += [pa.Array.from_pandas(num), pa.array(is_int), pa.Array.from_pandas(txt.astype(object))]
+        names += [c + _NUM_SUFFIX, c + _INT_SUFFIX, c + _STR_SUFFIX]
+        mixed.append(c)
+    meta = {"columns": json.dumps(list(map(str, df.columns)), ensure_ascii=False), "mixed": json.dumps(mixed, ensure_ascii=False)}
+    return pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(meta)
+
+
+def _from_arrow(table) -> pd.DataFrame:
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    columns = json.loads(meta["columns"])
+    mixed = set(json.loads(meta["mixed"]))
+    raw = table.to_pandas()
+    out = {}
+    for c in columns:
+        if c in mixed:
+            num = raw[c + _NUM_SUFFIX]
+            ints = raw[c + _INT_SUFFIX].to_numpy(dtype=bool)
+            merged = raw[c + _STR_SUFFIX].astype(object)
+            mask = num.notna().to_numpy()
+            merged[mask] = num[mask].to_numpy(dtype=object)
+            # الأعداد الصحيحة تعود int كما قرأها pd.read_excel
+            merged[ints] = num[ints].astype(np.int64).to_numpy(dtype=object)
+            out[c] = merged.where(merged.notna(), np.nan)
+        else:
+            out[c] = raw[c]
+    return pd.DataFrame(out, columns=columns)
+
+
+class ParsedFileCache:
+    """
+    ذاكرة على القرص للملفات بعد القراءة والتطبيع (Arrow IPC قابل للـ memory-map)،
+    المفتاح = بصمة المحتوى (+ الأعمدة المقروءة). حد أقصى للحجم مع حذف الأقدم استخدامًا (LRU).
+    """
+
+    def __init__(self, directory: Path | str = DEFAULT_CACHE_DIR, max_mb: int = DEFAULT_MAX_MB):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb) * 1024 * 1024
+        self.enabled = pa is not None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key.replace(':', '_')}.arrow"
+
+    def load(self, key: str) -> pd.DataFrame | None:
+        path = self._path(key)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            with pa.memory_map(str(path), "r") as source:
+                df = _from_arrow(pa.ipc.open_file(source).read_all())
+        except Exception:
+            path.unlink(missing_ok=True)  # ملف تالف => إعادة القراءة من الأصل
+            return None
+        os.utime(path)  # تحديث وقت الاستخدام لترتيب LRU
+        return df
+
+    def store(self, key: str, df: pd.DataFrame) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            table = _to_arrow(df)
+        except Exception:
+            return False  # أنواع لا يدعمها Arrow — نكتفي بالقراءة العادية
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        tmp.replace(path)
+        self.evict()
+        return True
+
+    def get_or_parse(self, key: str, fn, *args, **kwargs) -> pd.DataFrame:
+        df = self.load(key)
+        if df is None:
+            df = fn(*args, **kwargs)
+            self.store(key, df)
+        return df
+
+    def entries(self) -> list:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.arrow"), key=lambda p: p.stat().st_mtime)
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.entries())
+
+    def evict(self):
+        """حذف الأقدم استخدامًا حتى يصبح الحجم ضمن الحد."""
+        files = self.entries()
+        total = sum(p.stat().st_size for p in files)
+        for p in files:
+            if total <= self.max_bytes:
+                break
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+
+    def clear(self):
+        for p in self.entries():
+            p.unlink(missing_ok=True)
@@ -0,0 +1,51 @@
+import streamlit as st
+
+from .export import ExportCache, EXPORT_FORMATS, available_formats, with_format
+from .perf_panel import current_timer
+
+EXPORT_FORMAT_KEY = "export_format"
+
+_FORMAT_LABELS = {
+    "xlsx": "Excel (xlsx) — أوراق مرقمة بعد حد الصفوف",
+    "csv": "CSV (UTF-8 مع BOM)",
+    "csv.gz": "CSV مضغوط (gz)",
+    "parquet": "Parquet (لأدوات BI)",
+}
+
+
+@st.cache_resource
+def get_export_cache() -> ExportCache:
+    return ExportCache()
+
+
+def export_format_selector():
+    """اختيار صيغة كل ملفات التحميل من الشريط الجانبي."""
+    return st.sidebar.selectbox(
+        "📦 صيغة ملفات التحميل",
+        available_formats(),
+        format_func=lambda f: _FORMAT_LABELS.get(f, f),
+        key=EXPORT_FORMAT_KEY,
+    )
+
+
+def lazy_download_button(label: str, key, frame_fn, file_name: str):
+    """
+    زر تحميل لا يولّد الملف إلا عند الضغط عليه، ويعيد استخدام الملف المولّد لنفس النتيجة.
+    key: بصمة النتيجة (مثل مفاتيح المراحل)، frame_fn: دالة بدون معاملات ترجع df.
+    الصيغة حسب اختيار الشريط الجانبي (xlsx افتراضيًا).
+    """
+    cache = get_export_cache()
+    fmt = st.session_state.get(EXPORT_FORMAT_KEY, "xlsx")
+    file_name = with_format(file_name, fmt)
+    timer = current_timer()
+
+    def _data():
+        return cache.get_or_write(key, frame_fn, fmt, timer=timer, stage=f"export: {file_name}").read_bytes()
+
+    st.download_button(
+        label,
+        _data,
+        file_name=file_name,
+        mime=EXPORT_FORMATS[fmt][1],
+        on_click="ignore",
+    )
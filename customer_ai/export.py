@@ -0,0 +1,239 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from .cache import config_hash
+
+try:  # اختياري: Parquet يحتاج pyarrow
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DEFAULT_EXPORT_DIR = Path(os.environ.get("CUSTOMER_AI_EXPORT_DIR", Path(tempfile.gettempdir()) / "customer_ai_exports"))
+
+# حد Excel للصفوف في الورقة الواحدة (يشمل صف العناوين)
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def _rows(df: pd.DataFrame, chunk_rows: int):
+    """صفوف df كقيم Python (NaN => خلية فارغة) على دفعات، فلا تُنسخ البيانات كلها مرة واحدة."""
+    for start in range(0, len(df), chunk_rows):
+        block = df.iloc[start:start + chunk_rows].astype(object)
+        block = block.where(block.notna(), None)
+        yield from block.itertuples(index=False, name=None)
+
+
+class ExcelStreamWriter:
+    """
+    كتابة xlsx على دفعات بذاكرة ثابتة تقريبًا (openpyxl write-only يكتب الصفوف تباعًا).
+    إذا تجاوزت الصفوف حد Excel تُوزع على أوراق مرقمة (Sheet1_1، Sheet1_2، ...) وكل ورقة بعناوينها.
+    """
+
+    def __init__(self, target, sheet_name: str = "Sheet1", chunk_rows: int = 10_000,
+                 max_rows: int = EXCEL_MAX_ROWS):
+        from openpyxl import Workbook
+        self.target = target
+        self.sheet_name = sheet_name
+        self.chunk_rows = chunk_rows
+        self.per_sheet = max_rows - 1
+        self.wb = Workbook(write_only=True)
+        self.sheets = []
+        self.ws = None
+        self.rows_in_sheet = 0
+        self.columns = None
+
+    def _new_sheet(self):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        if len(self.sheets) == 1:
+            self.sheets[0].title = f"{self.sheet_name}_1"
+        name = self.sheet_name if not self.sheets else f"{self.sheet_name}_{len(self.sheets) + 1}"
+        self.ws = self.wb.create_sheet(name)
+        self.sheets.append(self.ws)
+        bold = Font(bold=True)
+        header = []
+        for c in self.columns:
+            cell = WriteOnlyCell(self.ws, value=str(c))
+            cell.font = bold
+            header.append(cell)
+        self.ws.append(header)
+        self.rows_in_sheet = 0
+
+    def write(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self._new_sheet()
+        for row in _rows(df, self.chunk_rows):
+            if self.rows_in_sheet >= self.per_sheet:
+                self._new_sheet()
+            self.ws.append(row)
+            self.rows_in_sheet += 1
+
+    def close(self):
+        if self.ws is None:
+            self.columns = []
+            self._new_sheet()
+        self.wb.save(self.target)
+
+
+class CsvStreamWriter:
+    """كتابة CSV على دفعات بترميز UTF-8 مع BOM (العناوين مرة واحدة)؛ compress => gzip."""
+
+    def __init__(self, target, compress: bool = False):
+        import gzip
+        import io
+        self._raw = open(target, "wb") if isinstance(target, (str, Path)) else None
+        binary = self._raw if self._raw is not None else target
+        self._gz = gzip.GzipFile(fileobj=binary, mode="wb") if compress else None
+        self._text = io.TextIOWrapper(self._gz or binary, encoding="utf-8-sig", newline="")
+        self._header = True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self._text, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._text.flush()
+        self._text.detach()
+        if self._gz is not None:
+            self._gz.close()
+        if self._raw is not None:
+            self._raw.close()
+
+
+def write_excel(df: pd.DataFrame, target, sheet_name: str = "Sheet1", chunk_rows: int = 10_000,
+                max_rows: int = EXCEL_MAX_ROWS):
+    """كتابة xlsx لـ df كاملًا (انظر ExcelStreamWriter). target مسار أو ملف ثنائي مفتوح."""
+    writer = ExcelStreamWriter(target, sheet_name, chunk_rows, max_rows)
+    writer.write(df)
+    writer.close()
+
+
+def write_csv(df: pd.DataFrame, target, compress: bool = False):
+    """CSV بترميز UTF-8 مع BOM (حتى يفتح Excel العربي صحيحًا)؛ compress => gzip."""
+    df.to_csv(target, index=False, encoding="utf-8-sig", compression="gzip" if compress else None)
+
+
+def _parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """الأعمدة المختلطة (أرقام + نصوص) تُكتب نصًا لأن Parquet يحتاج نوعًا واحدًا لكل عمود."""
+    out = df.copy(deep=False)
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True).startswith("mixed"):
+            out.isetitem(i, s.map(lambda v: v if pd.isna(v) else str(v)))
+    out.columns = [str(c) for c in out.columns]
+    return out
+
+
+def write_parquet(df: pd.DataFrame, target):
+    if not PARQUET_AVAILABLE:
+        raise ImportError("تصدير Parquet يحتاج مكتبة pyarrow")
+    _parquet_safe(df).to_parquet(target, index=False)
+
+
+# الصيغة => (الامتداد، نوع MIME، دالة الكتابة)
+EXPORT_FORMATS = {
+    "xlsx": (".xlsx", XLSX_MIME, write_excel),
+    "csv": (".csv", "text/csv", write_csv),
+    "csv.gz": (".csv.gz", "application/gzip", lambda df, target: write_csv(df, target, compress=True)),
+    "parquet": (".parquet", "application/vnd.apache.parquet", write_parquet),
+}
+
+
+# الصيغ التي يمكن كتابتها دفعة بعد دفعة (المعالجة على دفعات)
+STREAM_WRITERS = {
+    "xlsx": ExcelStreamWriter,
+    "csv": CsvStreamWriter,
+    "csv.gz": lambda target: CsvStreamWriter(target, compress=True),
+}
+
+
+def open_stream_writer(target, fmt: str = "xlsx"):
+    """كاتب بدالتين write(df) و close() لإخراج يُكتب على دفعات."""
+    if fmt not in STREAM_WRITERS:
+        raise ValueError(f"الصيغة {fmt} غير مدعومة في الكتابة على دفعات: {list(STREAM_WRITERS)}")
+    return STREAM_WRITERS[fmt](target)
+
+
+def available_formats() -> list:
+    return [f for f in EXPORT_FORMATS if f != "parquet" or PARQUET_AVAILABLE]
+
+
+def write_frame(df: pd.DataFrame, target, fmt: str = "xlsx"):
+    """كتابة df بالصيغة المطلوبة (انظر EXPORT_FORMATS)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"صيغة تصدير غير معروفة: {fmt}")
+    EXPORT_FORMATS[fmt][2](df, target)
+
+
+def _write_counted(df: pd.DataFrame, target, fmt: str) -> pd.DataFrame:
+    """write_frame ترجع df حتى يسجل StageTimer عدد الصفوف المكتوبة."""
+    write_frame(df, target, fmt)
+    return df
+
+
+def with_format(file_name: str, fmt: str) -> str:
+    """استبدال امتداد اسم الملف بامتداد الصيغة (نتائج.xlsx => نتائج.csv.gz)."""
+    stem = file_name
+    for ext, _, _ in EXPORT_FORMATS.values():
+        if stem.lower().endswith(ext):
+            stem = stem[: -len(ext)]
+            break
+    return stem + EXPORT_FORMATS[fmt][0]
+
+
+class ExportCache:
+    """
+    ملفات التصدير على القرص، المفتاح = بصمة النتيجة (مفاتيح المراحل التي أنتجتها)،
+    فلا يُعاد توليد نفس الملف ولا يُحتفظ بالبايتات في الذاكرة بين التشغيلات.
+    """
+
+    def __init__(self, directory: Path | str = DEFAULT_EXPORT_DIR, max_mb: int = 1024):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb) * 1024 * 1024
+
+    def path_for(self, key, fmt: str = "xlsx") -> Path:
+        return self.directory / f"{config_hash(key)}{EXPORT_FORMATS[fmt][0]}"
+
+    def get_or_write(self, key, frame_fn, fmt: str = "xlsx", timer=None, stage: str | None = None) -> Path:
+        """
+        مسار ملف التصدير؛ frame_fn تُستدعى فقط إذا لم يكن الملف موجودًا.
+        timer (StageTimer): تسجيل زمن وذاكرة الكتابة باسم stage (الافتراضي export_<الصيغة>).
+        """
+        path = self.path_for(key, fmt)
+        if path.exists():
+            os.utime(path)
+            return path
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{path.name}.tmp"
+        with open(tmp, "wb") as fh:
+            if timer is None:
+                write_frame(frame_fn(), fh, fmt)
+            else:
+                timer.run(stage or f"export_{fmt}", _write_counted, frame_fn(), fh, fmt)
+        tmp.replace(path)
+        self.evict()
+        return path
+
+    def _files(self) -> list:
+        return [p for p in self.directory.glob("*") if p.is_file() and not p.name.endswith(".tmp")]
+
+    def evict(self):
+        """حذف الأقدم استخدامًا حتى يصبح الحجم ضمن الحد."""
+        files = sorted(self._files(), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for p in files:
+            if total <= self.max_bytes:
+                break
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+
+    def clear(self):
+        if self.directory.exists():
+            for p in self._files():
+                p.unlink(missing_ok=True)
@@ -0,0 +1,568 @@
+"""
+إعادة التصنيف التزايدية بين رفع ملف وآخر (مثل ملف كل أسبوع) بمفتاح رقم العميل، بدون Streamlit:
+يُقارن كل صف بصف نفس العميل في اللقطة السابقة، ولا يُنظف ويُصنف إلا العملاء الجدد أو الذين تغير صفهم. الإجماليات العامة
+(مديونية كل تصنيف، مصفوفة المندوب × التصنيف، معيار المرتجع، دوران المندوبين) تُحدّث بطرح
+مساهمة الصفوف القديمة وإضافة الجديدة كما في إحصاءات المعالجة على دفعات (chunked.py).
+أعلى متوسط سداد (القائد) يغير نقاط كل العملاء، فإذا تغير القائد يُعاد الحساب كاملًا.
+"""
+import os
+import pickle
+import tempfile
+import threading
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cache import config_hash
+from .scoring import final_classification_vec, rep_class_sums, rep_class_ratios, FINAL_LABELS, FINAL_DEFAULT
+from .pipeline import (
+    REP_COL_CANDIDATES,
+    REP_ID_COL,
+    REP_NAME_COL,
+    REP_TURNOVER_REQUIRED,
+    RETURN_COLUMNS,
+    RETURN_SECTION_LABELS,
+    STAGE_COLUMNS,
+    PipelineResult,
+    StageTimer,
+    clean_block,
+    pp_block,
+    age_block,
+    risk_block,
+    final_block,
+    plan_block,
+    class_share_map,
+    assemble_scored,
+    compute_delta_table,
+    classify_return_values,
+    returns_table_columns,
+    returns_values,
+    returns_ref_mask,
+    rep_turnover_sums,
+    rep_turnover_ratios,
+    compute_rep_turnover_map,
+    assemble_unified,
+    stage_keys,
+    required_columns,
+    run_pipeline,
+)
+
+CUSTOMER_ID_CANDIDATES = ["رقم العميل", "كود العميل", "رقم الحساب", "كود الحساب"]
+CLASS_LABELS = FINAL_LABELS + [FINAL_DEFAULT]
+NEW_LABEL = "جديد"
+REMOVED_LABEL = "محذوف"
+
+DEFAULT_SNAPSHOT_DIR = Path(os.environ.get(
+    "CUSTOMER_AI_SNAPSHOT_DIR", Path.home() / ".cache" / "customer_ai" / "snapshots"
+))
+
+
+def detect_id_column(columns) -> str | None:
+    return next((c for c in CUSTOMER_ID_CANDIDATES if c in columns), None)
+
+
+def input_columns(df: pd.DataFrame, cols: dict) -> list:
+    """أعمدة الملف التي يقرؤها التصنيف (بقية الأعمدة تُنقل كما هي من الملف الجديد)."""
+    return [c for c in required_columns(cols)[0] if c in df.columns]
+
+
+def unchanged_rows(prev: pd.DataFrame, prev_pos: np.ndarray, df: pd.DataFrame) -> np.ndarray:
+    """
+    True لكل صف في df كل حقوله مطابقة لصف نفس العميل في prev (prev_pos: موضعه فيها، -1 = جديد).
+    مقارنة عمود بعمود (الفارغ يساوي الفارغ)؛ أرخص بكثير من بصمة (hash) لكل صف من الأعمدة النصية.
+    """
+    if list(prev.columns) != list(df.columns):
+        return np.zeros(len(df), dtype=bool)
+    rows = np.flatnonzero(prev_pos >= 0)
+    src = prev_pos[rows]
+    same = np.ones(len(rows), dtype=bool)
+    for c in df.columns:
+        a = df[c].iloc[rows].reset_index(drop=True)
+        b = prev[c].iloc[src].reset_index(drop=True)
+        if a.dtype != b.dtype:  # مثل عمود رقمي أصبح فيه نص: مقارنة القيم كما هي
+            a, b = a.astype(object), b.astype(object)
+        same &= (a == b).fillna(False).to_numpy(dtype=bool) | (a.isna().to_numpy() & b.isna().to_numpy())
+    keep = np.zeros(len(df), dtype=bool)
+    keep[rows] = same
+    return keep
+
+
+@dataclass
+class Snapshot:
+    """
+    آخر نتيجة لملف بمفتاح رقم العميل: أساس المقارنة وإعادة التصنيف في الرفع التالي.
+    على القرص يُحفظ ما تحتاجه المقارنة فقط (أعمدة الإدخال، نواتج كل صف، الإجماليات)؛
+    النتيجة الكاملة (result) في الذاكرة فقط.
+    """
+    data_key: str | None
+    config_key: str            # بصمة الأعمدة والإعدادات (بصمة مرحلة unified)
+    id_col: str
+    ids: pd.Index
+    inputs: pd.DataFrame       # أعمدة الإدخال كما في الملف (input_columns) للمقارنة وطرح المساهمة
+    rows: dict                 # نواتج كل صف لنسخ غير المتغير (انظر _snapshot_rows)
+    stats: dict                # إجماليات قابلة للطرح/الإضافة (انظر _contrib)
+    diff: dict = field(default_factory=dict)   # المقارنة مع اللقطة السابقة (انظر run_incremental)
+    result: PipelineResult | None = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["result"] = None
+        return state
+
+
+# ================= مساهمة مجموعة صفوف في الإجماليات =================
+def _rep_col(df: pd.DataFrame) -> str | None:
+    return next((c for c in REP_COL_CANDIDATES if c in df.columns), None)
+
+
+def _returns_present(df: pd.DataFrame) -> list:
+    return [(c, label) for c, label in zip(RETURN_COLUMNS, RETURN_SECTION_LABELS) if c in df.columns]
+
+
+def _contrib(original: pd.DataFrame, num: pd.DataFrame, classes, values: pd.DataFrame | None,
+             failures: dict, cols: dict, max_avg) -> dict:
+    """
+    إجماليات قابلة للجمع لمجموعة صفوف: المديونية، مديونية كل تصنيف، (مندوب × تصنيف)،
+    مجموع/عدد قيم المرتجع في مجموعة المرجع، مجاميع دوران المندوبين، والخلايا الفاشلة.
+    """
+    col_debt = cols["debt"]
+    classes = pd.Series(np.asarray(classes, dtype=object), index=num.index)
+    out = {
+        "total_debt": num[col_debt].sum(skipna=True),
+        "class_debt": num[col_debt].groupby(classes).sum(),
+        "rep_sums": None,
+        "returns_sum": {},
+        "returns_count": {},
+        "rep_turnover": None,
+        "failures": dict(failures),
+    }
+    rep_col = _rep_col(original)
+    if rep_col is not None:
+        work = pd.DataFrame({rep_col: original[rep_col], "التصنيف النهائي": classes, col_debt: num[col_debt]})
+        out["rep_sums"] = rep_class_sums(work, rep_col, "التصنيف النهائي", col_debt)
+    if values is not None and not values.empty:
+        ref = returns_ref_mask(num[cols["avgq"]], max_avg).to_numpy()
+        vals = values[ref]
+        out["returns_sum"] = vals.sum(skipna=True).to_dict()
+        out["returns_count"] = vals.notna().sum().to_dict()
+    if all(c in original.columns for c in REP_TURNOVER_REQUIRED):
+        out["rep_turnover"] = rep_turnover_sums(original)
+    return out
+
+
+def _negate(df: pd.DataFrame, keys=()) -> pd.DataFrame:
+    out = df.copy()
+    values = [c for c in out.columns if c not in keys]
+    out[values] = -out[values]
+    return out
+
+
+def _sub_sums(prev, gone, added, group, keys=()):
+    """prev − gone + added لجداول مجاميع (أو None)؛ group يجمعها ويحذف المجموعات التي أصبح عددها صفرًا."""
+    parts = [prev, None if gone is None else _negate(gone, keys), added]
+    parts = [p for p in parts if p is not None]
+    return group(parts) if parts else None
+
+
+def _group_rep_class(parts: list) -> pd.DataFrame:
+    m = pd.concat(parts).groupby(level=[0, 1]).sum()
+    return m[m["عدد"] != 0].sort_index()
+
+
+REP_TURNOVER_KEYS = [REP_ID_COL, REP_NAME_COL]
+
+
+def _group_rep_turnover(parts: list) -> pd.DataFrame:
+    g = pd.concat(parts).groupby(REP_TURNOVER_KEYS, dropna=False).sum().reset_index()
+    return g[g["عدد_العملاء"] != 0].reset_index(drop=True)
+
+
+def _update_stats(prev: dict, gone: dict, added: dict) -> dict:
+    def dict_sum(key):
+        names = dict.fromkeys([*prev[key], *gone[key], *added[key]])
+        return {c: prev[key].get(c, 0) - gone[key].get(c, 0) + added[key].get(c, 0) for c in names}
+
+    return {
+        "max_avg": prev["max_avg"],
+        "leader": prev["leader"],
+        "total_debt": prev["total_debt"] - gone["total_debt"] + added["total_debt"],
+        "class_debt": prev["class_debt"].sub(gone["class_debt"], fill_value=0).add(added["class_debt"], fill_value=0),
+        "rep_sums": _sub_sums(prev["rep_sums"], gone["rep_sums"], added["rep_sums"], _group_rep_class),
+        "returns_sum": dict_sum("returns_sum"),
+        "returns_count": dict_sum("returns_count"),
+        "rep_turnover": _sub_sums(prev["rep_turnover"], gone["rep_turnover"], added["rep_turnover"],
+                                  _group_rep_turnover, REP_TURNOVER_KEYS),
+        "failures": dict_sum("failures"),
+    }
+
+
+def _derived_stats(stats: dict) -> dict:
+    """إحصاءات بنفس شكل chunked (class_share, rep_matrix, returns_ref, rep_turnover) من المجاميع."""
+    rep_turnover = stats["rep_turnover"]
+    return {
+        "max_avg": stats["max_avg"],
+        "class_share": class_share_map(stats["class_debt"], stats["total_debt"]),
+        "rep_matrix": None if stats["rep_sums"] is None else rep_class_ratios(stats["rep_sums"]),
+        "returns_ref": {
+            c: (stats["returns_sum"][c] / n if n else np.nan) for c, n in stats["returns_count"].items()
+        },
+        "rep_turnover": pd.DataFrame() if rep_turnover is None else rep_turnover_ratios(rep_turnover),
+    }
+
+
+def _num_columns(result: PipelineResult) -> list:
+    cols = result.cols
+    return [c for c in dict.fromkeys([cols["debt"], cols["avgq"], cols["age"]]) if c and c in result.scored.columns]
+
+
+def _return_values_of(result: PipelineResult) -> pd.DataFrame | None:
+    """قيم المرتجع المنظفة من أعمدة [مرتجع] قيمة (...) بأسماء أعمدة الملف."""
+    present = _returns_present(result.original)
+    if result.returns.empty or not present:
+        return None
+    return pd.DataFrame(
+        {c: result.returns[f"[مرتجع] قيمة ({label})"] for c, label in present}, index=result.returns.index
+    )
+
+
+def snapshot_stats(result: PipelineResult) -> dict:
+    """المجاميع القابلة للتحديث من نتيجة تشغيل كامل."""
+    cols = result.cols
+    num = result.scored[_num_columns(result)]
+    avg = num[cols["avgq"]]
+    max_avg = avg.max()
+    stats = _contrib(
+        result.original, num, result.scored["التصنيف النهائي"], _return_values_of(result),
+        result.failures, cols, max_avg,
+    )
+    stats["max_avg"] = max_avg
+    stats["leader"] = int(np.nanargmax(avg.to_numpy(dtype=float))) if pd.notna(max_avg) else None
+    return stats
+
+
+POINT_COLUMNS = STAGE_COLUMNS["pp"] + STAGE_COLUMNS["age"] + STAGE_COLUMNS["risk"]
+
+
+def _snapshot_rows(result: PipelineResult) -> dict:
+    """نواتج كل صف التي لا تعتمد على الإجماليات: تُنسخ كما هي للعملاء غير المتغيرين."""
+    scored = result.scored
+    return {
+        "num": scored[_num_columns(result)],
+        "points": scored[POINT_COLUMNS],
+        "classes": scored["التصنيف النهائي"],
+        "plan": scored[STAGE_COLUMNS["plan"]],
+        "delta": result.delta,
+        "returns": _return_values_of(result),
+    }
+
+
+def make_snapshot(result: PipelineResult, id_col: str, diff: dict | None = None) -> Snapshot:
+    stats = snapshot_stats(result)
+    ids = pd.Index(result.original[id_col])
+    # القائد يُحفظ برقم العميل لمطابقته في الرفع التالي
+    stats["leader"] = None if stats["leader"] is None else ids[stats["leader"]]
+    return Snapshot(
+        data_key=result.keys["unified"][0],
+        config_key=result.keys["unified"][2],
+        id_col=id_col,
+        ids=ids,
+        inputs=result.original[input_columns(result.original, result.cols)],
+        rows=_snapshot_rows(result),
+        stats=stats,
+        diff=diff or {},
+        result=result,
+    )
+
+
+# ================= مصفوفة انتقال التصنيفات =================
+def class_migration(prev_classes, new_classes, prev_pos: np.ndarray, removed: int) -> pd.DataFrame:
+    """
+    عدد العملاء من كل تصنيف سابق (صفوف، مع "جديد") إلى كل تصنيف حالي (أعمدة، مع "محذوف").
+    prev_pos: موضع كل عميل حالي في اللقطة السابقة (-1 = جديد).
+    """
+    k = len(CLASS_LABELS)
+    prev_codes = pd.Categorical(prev_classes, categories=CLASS_LABELS).codes
+    new_codes = pd.Categorical(new_classes, categories=CLASS_LABELS).codes
+    matched = prev_pos >= 0
+    from_codes = np.where(matched, prev_codes[np.where(matched, prev_pos, 0)], k)
+    m = np.bincount(from_codes * (k + 1) + new_codes, minlength=(k + 1) * (k + 1)).reshape(k + 1, k + 1)
+
+    # عملاء اللقطة السابقة غير الموجودين الآن => عمود "محذوف"
+    seen = np.zeros(len(prev_codes), dtype=bool)
+    seen[prev_pos[matched]] = True
+    m[:k, k] = np.bincount(prev_codes[~seen], minlength=k)
+    out = pd.DataFrame(m, index=CLASS_LABELS + [NEW_LABEL], columns=CLASS_LABELS + [REMOVED_LABEL])
+    out.index.name = "التصنيف السابق"
+    out.columns.name = "التصنيف الحالي"
+    return out
+
+
+def _diff_summary(mode: str, reason: str | None, base: str | None, new: int, changed: int, removed: int,
+                  unchanged: int, migration: pd.DataFrame | None) -> dict:
+    return {
+        "mode": mode, "reason": reason, "base": base,
+        "new": new, "changed": changed, "removed": removed, "unchanged": unchanged,
+        "migration": migration,
+    }
+
+
+# ================= التشغيل =================
+def _splice(prev: pd.DataFrame, prev_rows: np.ndarray, sub: pd.DataFrame, keep: np.ndarray, index) -> pd.DataFrame:
+    """
+    صفوف الملف الجديد بترتيبه: غير المتغيرة من prev (مواضعها prev_rows) والباقي من sub بالترتيب.
+    الأعمدة الصحيحة بأصغر نوع كما في التشغيل الكامل.
+    """
+    if prev.empty and sub.empty:
+        return pd.DataFrame()
+    n_keep = int(keep.sum())
+    order = np.empty(len(keep), dtype=np.int64)
+    order[keep] = np.arange(n_keep)
+    order[~keep] = n_keep + np.arange(len(keep) - n_keep)
+    both = pd.concat([prev.iloc[prev_rows], sub], ignore_index=True).iloc[order]
+    both.index = index
+    for c in both.columns:
+        if pd.api.types.is_integer_dtype(both[c]) and not pd.api.types.is_bool_dtype(both[c]):
+            both[c] = pd.to_numeric(both[c], downcast="integer")
+    return both
+
+
+def _rescore(prev: Snapshot, df: pd.DataFrame, cols: dict, config: dict, keep: np.ndarray,
+             prev_pos: np.ndarray, data_key, timer: StageTimer) -> tuple:
+    """
+    إعادة التصنيف للصفوف المتغيرة فقط. يرجع (النتيجة، المجاميع) أو (None، السبب) إذا تغير القائد.
+    """
+    prev_rows = prev.rows
+    stats = prev.stats
+    rows = np.flatnonzero(~keep)
+    sub = df.iloc[rows]
+    num_sub, fails_sub = timer.run("incremental_clean", clean_block, sub, cols)
+
+    # القائد: إن لم يبق كما هو أو تجاوزه صف متغير => كل النسب من القائد تتغير
+    kept_ids = prev.ids[prev_pos[keep]]
+    if stats["leader"] is None or stats["leader"] not in kept_ids:
+        return None, "تغير صف العميل صاحب أعلى متوسط سداد (القائد)"
+    if num_sub[cols["avgq"]].max() > stats["max_avg"]:
+        return None, "عميل جديد/متغير تجاوز أعلى متوسط سداد (القائد)"
+
+    pp_sub = pp_block(num_sub, cols, config, {"max_avg": stats["max_avg"]})
+    age_sub = age_block(num_sub, cols, config)
+    risk_sub = risk_block(num_sub, cols, config)
+    points_sub = pd.concat([pp_sub, age_sub, risk_sub], axis=1)
+    total_sub = points_sub[["نقاط القوة الشرائية", "نقاط الالتزام", "نقاط المخاطرة"]].sum(axis=1)
+    classes_sub = final_classification_vec(total_sub, config["final"])
+
+    present = _returns_present(df)
+    values_sub = returns_values(sub, [c for c, _ in present]) if present and cols["avgq"] in df.columns else None
+
+    # الصفوف القديمة التي خرجت (محذوفة أو تغيرت): مساهمتها تُطرح
+    left = np.ones(len(prev.ids), dtype=bool)
+    left[prev_pos[keep]] = False
+    gone_rows = np.flatnonzero(left)
+    p_gone = prev.inputs.iloc[gone_rows]
+    _, fails_gone = clean_block(p_gone, cols)
+    prev_values = prev_rows["returns"]
+    gone = _contrib(
+        p_gone, prev_rows["num"].iloc[gone_rows], prev_rows["classes"].iloc[gone_rows],
+        None if prev_values is None else prev_values.iloc[gone_rows], fails_gone, cols, stats["max_avg"],
+    )
+    added = _contrib(sub, num_sub, classes_sub, values_sub, fails_sub, cols, stats["max_avg"])
+    new_stats = _update_stats(stats, gone, added)
+    derived = _derived_stats(new_stats)
+
+    # الصفوف غير المتغيرة من النتيجة السابقة + المتغيرة، ثم أعمدة الإجماليات لكل الصفوف
+    kept_rows = prev_pos[keep]
+    index = df.index
+    num = _splice(prev_rows["num"], kept_rows, num_sub, keep, index)
+    points = _splice(prev_rows["points"], kept_rows, points_sub[POINT_COLUMNS], keep, index)
+    final, rep_matrix = final_block(df, num, points, cols, config, derived)
+
+    plan_sub = plan_block(num_sub, points_sub, final.iloc[rows], cols, config)
+    plan = _splice(prev_rows["plan"], kept_rows, plan_sub[STAGE_COLUMNS["plan"]], keep, index)
+    scored = assemble_scored(df, num, [points, final, plan])
+
+    delta = _splice(prev_rows["delta"], kept_rows, compute_delta_table(sub, cols, config), keep, index)
+
+    returns = pd.DataFrame()
+    if values_sub is not None and prev_values is not None:
+        values = _splice(prev_values, kept_rows, values_sub, keep, index)
+        ref = pd.Series([derived["returns_ref"].get(c, np.nan) for c in values.columns], index=values.columns)
+        returns = returns_table_columns(classify_return_values(values, ref, config), present)
+
+    rep_turnover = derived["rep_turnover"]
+    unified = assemble_unified(scored, df, delta, returns, compute_rep_turnover_map(df, rep_turnover))
+
+    failures = {c: n for c, n in new_stats["failures"].items() if c in stats["failures"] or n}
+    result = PipelineResult(
+        original=df,
+        scored=scored,
+        cols=cols,
+        config=config,
+        failures=failures,
+        rep_matrix=rep_matrix,
+        delta=delta,
+        returns=returns,
+        rep_turnover=rep_turnover,
+        unified=unified,
+        timings=timer.records,
+        keys={name: (data_key, name, h) for name, h in stage_keys(cols, config).items()},
+    )
+    return result, new_stats
+
+
+def run_incremental(df: pd.DataFrame, cols: dict, config: dict, id_col: str, previous: Snapshot | None,
+                    timer: StageTimer | None = None, cache=None, data_key: str | None = None) -> Snapshot:
+    """
+    نتيجة الملف df بالمقارنة مع اللقطة السابقة (previous) بمفتاح id_col:
+    إذا كانت بنفس الأعمدة والإعدادات وأرقام العملاء فريدة والقائد لم يتغير => يُصنف فقط
+    الجديد والمتغير، وإلا تشغيل كامل (run_pipeline). يرجع لقطة جديدة فيها النتيجة و diff:
+    {"mode": "incremental"/"full"، "reason"، "base" (data_key للملف السابق)،
+     "new"، "changed"، "removed"، "unchanged"، "migration"}.
+    """
+    timer = timer or StageTimer()
+    config_key = stage_keys(cols, config)["unified"]
+    ids = pd.Index(df[id_col])
+    base = None if previous is None else previous.data_key
+
+    def full(reason, prev_pos=None, counts=None):
+        result = run_pipeline(df, cols, config, timer=timer, cache=cache, data_key=data_key)
+        migration = None
+        if prev_pos is not None:
+            migration = class_migration(
+                previous.rows["classes"], result.scored["التصنيف النهائي"],
+                prev_pos, counts[2],
+            )
+        return timer.run("snapshot", make_snapshot, result, id_col,
+                         _diff_summary("full", reason, base, *(counts or (len(df), 0, 0, 0)), migration))
+
+    if previous is None:
+        return full("لا توجد لقطة سابقة لهذا الشكل من الملفات")
+    if not ids.is_unique or not previous.ids.is_unique:
+        return full(f"أرقام مكررة في '{id_col}'")
+
+    prev_pos = previous.ids.get_indexer(ids)
+    matched = prev_pos >= 0
+    keep = timer.run("snapshot_compare", unchanged_rows, previous.inputs, prev_pos, df[input_columns(df, cols)])
+    counts = (
+        int((~matched).sum()),                         # جديد
+        int((matched & ~keep).sum()),                  # متغير
+        int(len(previous.ids) - matched.sum()),        # محذوف
+        int(keep.sum()),                               # بدون تغيير
+    )
+
+    if previous.config_key != config_key:
+        return full("تغيرت الأعمدة أو الإعدادات عن اللقطة السابقة", prev_pos, counts)
+
+    result, stats = timer.run(
+        "incremental_rescore", _rescore, previous, df, cols, config, keep, prev_pos, data_key, timer
+    )
+    if result is None:
+        return full(stats, prev_pos, counts)
+
+    migration = class_migration(
+        previous.rows["classes"], result.scored["التصنيف النهائي"], prev_pos, counts[2]
+    )
+    return Snapshot(
+        data_key=data_key,
+        config_key=config_key,
+        id_col=id_col,
+        ids=ids,
+        inputs=df[input_columns(df, cols)],
+        rows=_snapshot_rows(result),
+        stats=stats,
+        diff=_diff_summary("incremental", None, base, *counts, migration),
+        result=result,
+    )
+
+
+# ================= حفظ اللقطات =================
+SNAPSHOT_FIELDS = {f.name for f in fields(Snapshot)}
+
+
+def snapshot_key(columns, id_col: str) -> str:
+    """اللقطة لكل شكل ملف (العناوين) ومفتاح عميل: ملف الأسبوع التالي بنفس الشكل يقارن بها."""
+    return config_hash([[str(c) for c in columns], id_col])
+
+
+class SnapshotStore:
+    """
+    آخر لقطتين لكل شكل ملف: "current" (آخر ملف) و"base" (الملف الذي قبله، أساس المقارنة).
+    ملف جديد => current السابقة تصبح base. "current" تُحفظ على القرص (pickle، بدون النتيجة الكاملة)
+    لتبقى بين الجلسات.
+    """
+
+    def __init__(self, directory: Path | str = DEFAULT_SNAPSHOT_DIR):
+        self.directory = Path(directory)
+        self._items = {}
+        # مشتركة بين الجلسات (st.cache_resource) => القراءة والتعديل والكتابة تحت قفل
+        self._lock = threading.RLock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key: str) -> dict:
+        with self._lock:
+            if key not in self._items:
+                current = None
+                try:
+                    with open(self._path(key), "rb") as f:
+                        current = pickle.load(f)
+                except Exception:
+                    # ملف تالف أو من إصدار سابق للوحدات => كأن لا توجد لقطة (حساب كامل)
+                    current = None
+                if not isinstance(current, Snapshot) or vars(current).keys() != SNAPSHOT_FIELDS:
+                    current = None
+                self._items[key] = {"base": current, "current": current}
+            return self._items[key]
+
+    def put(self, key: str, snapshot: Snapshot):
+        with self._lock:
+            entry = self.get(key)
+            current = entry["current"]
+            if current is not None and current.data_key != snapshot.data_key:
+                entry["base"] = current
+            entry["current"] = snapshot
+            tmp = None
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                # اسم مؤقت فريد: لا تكتب عمليتان (أو نسختان من التطبيق) على نفس الملف المؤقت
+                with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f"{key}.", suffix=".tmp",
+                                                 delete=False) as f:
+                    tmp = Path(f.name)
+                    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                tmp.replace(self._path(key))
+            except OSError:
+                if tmp is not None:
+                    tmp.unlink(missing_ok=True)  # بدون قرص قابل للكتابة تبقى اللقطة في الذاكرة فقط
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self.directory.exists():
+                for p in [*self.directory.glob("*.pkl"), *self.directory.glob("*.tmp")]:
+                    p.unlink(missing_ok=True)
+
+
+def snapshot_result(store: SnapshotStore, df: pd.DataFrame, cols: dict, config: dict, id_col: str,
+                    timer: StageTimer | None = None, cache=None, data_key: str | None = None) -> Snapshot:
+    """
+    لقطة الملف الحالي من الذاكرة إن حُسبت بنفس الملف والإعدادات، وإلا run_incremental مقابل الأساس
+    (الملف السابق) ثم حفظها.
+    """
+    key = snapshot_key(df.columns, id_col)
+    entry = store.get(key)
+    config_key = stage_keys(cols, config)["unified"]
+    current = entry["current"]
+    if current is not None and current.data_key == data_key and current.config_key == config_key:
+        if current.result is not None:
+            return current
+        # لقطة من القرص لنفس الملف: النتيجة تُبنى منها (كل الصفوف بدون تغيير) مع الاحتفاظ بمقارنتها
+        snapshot = run_incremental(df, cols, config, id_col, current, timer=timer, cache=cache, data_key=data_key)
+        snapshot.diff = current.diff
+        entry["current"] = snapshot
+        return snapshot
+    base = entry["base"] if current is not None and current.data_key == data_key else current
+    snapshot = run_incremental(df, cols, config, id_col, base, timer=timer, cache=cache, data_key=data_key)
+    store.put(key, snapshot)
+    return snapshot
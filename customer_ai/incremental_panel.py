@@ -0,0 +1,31 @@
+import streamlit as st
+
+from .downloads import lazy_download_button
+
+
+def render_snapshot_diff(snapshot):
+    """ملخص المقارنة مع الرفع السابق: طريقة الحساب، أعداد العملاء، ومصفوفة انتقال التصنيفات."""
+    diff = snapshot.diff
+    with st.expander("🔁 المقارنة مع الرفع السابق", expanded=diff["migration"] is not None):
+        if diff["mode"] == "incremental":
+            st.success("⚡ أُعيد تصنيف العملاء الجدد والمتغيرين فقط (بقية العملاء من الرفع السابق).")
+        else:
+            st.info(f"حساب كامل: {diff['reason']}")
+
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("جديد", f"{diff['new']:,}")
+        c2.metric("متغير", f"{diff['changed']:,}")
+        c3.metric("محذوف", f"{diff['removed']:,}")
+        c4.metric("بدون تغيير", f"{diff['unchanged']:,}")
+
+        migration = diff["migration"]
+        if migration is None:
+            return
+        st.markdown("#### انتقال التصنيفات (صفوف: السابق، أعمدة: الحالي)")
+        st.dataframe(migration, use_container_width=True)
+        lazy_download_button(
+            "⬇️ تحميل مصفوفة الانتقال",
+            (snapshot.data_key, "migration", snapshot.config_key, diff["base"]),
+            lambda: migration.reset_index(),
+            file_name="انتقال_التصنيفات.xlsx",
+        )
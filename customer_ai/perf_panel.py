@@ -0,0 +1,97 @@
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+
+from .pipeline import StageTimer
+
+PERF_RUNS_KEY = "perf_runs"
+PERF_MEMORY_KEY = "perf_memory"
+MAX_RUNS = 30
+
+LOG_COLUMNS = ["run", "time", "file", "stage", "depth", "seconds", "rows", "peak_mb"]
+
+
+def start_run(file_name: str | None = None) -> StageTimer:
+    """
+    StageTimer جديد لهذا التشغيل (إعادة تشغيل السكربت) يُضاف لسجل الجلسة.
+    قياس الذاكرة (tracemalloc) يعمل حسب مفتاح لوحة التشخيص ويؤثر على كل العملية.
+    """
+    if st.session_state.get(PERF_MEMORY_KEY, False):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    elif tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    runs = st.session_state.setdefault(PERF_RUNS_KEY, [])
+    # تشغيل سابق لم يحسب شيئًا (كل المراحل من الذاكرة) لا داعي لبقائه
+    if runs and not runs[-1]["timer"].records:
+        runs.pop()
+    runs.append({
+        "run": runs[-1]["run"] + 1 if runs else 1,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "file": file_name,
+        "timer": StageTimer(),
+    })
+    del runs[:-MAX_RUNS]
+    return runs[-1]["timer"]
+
+
+def current_timer() -> StageTimer:
+    """مؤقت التشغيل الحالي (مؤقت مستقل إذا لم يبدأ تشغيل بعد)."""
+    runs = st.session_state.get(PERF_RUNS_KEY)
+    return runs[-1]["timer"] if runs else StageTimer()
+
+
+def perf_log(runs) -> pd.DataFrame:
+    """سجل مسطّح: صف لكل مرحلة في كل تشغيل (الأحدث أولًا)."""
+    rows = [
+        {"run": r["run"], "time": r["time"], "file": r["file"], **rec}
+        for r in reversed(runs) for rec in r["timer"].records
+    ]
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
+
+def _jsonl(log: pd.DataFrame) -> bytes:
+    records = log.astype(object).where(log.notna(), None).to_dict("records")
+    return "\n".join(json.dumps(r, ensure_ascii=False) for r in records).encode("utf-8")
+
+
+def render_perf_panel():
+    """زمن وصفوف وذروة ذاكرة كل مرحلة حُسبت فعلًا (قراءة، تطبيع، مراحل التصنيف، التبويبات، التصدير)."""
+    with st.expander("⏱️ زمن وذاكرة كل مرحلة", expanded=False):
+        st.toggle(
+            "قياس ذروة الذاكرة لكل مرحلة (tracemalloc)", key=PERF_MEMORY_KEY,
+            help="يبطئ الحساب (خاصة قراءة/كتابة Excel)؛ يبدأ القياس من التشغيل التالي.",
+        )
+        runs = [r for r in st.session_state.get(PERF_RUNS_KEY, []) if r["timer"].records]
+        if not runs:
+            st.caption("لا توجد مراحل محسوبة بعد (كل النتائج من الذاكرة المؤقتة).")
+            return
+
+        log = perf_log(runs)
+        last = log[log["run"] == runs[-1]["run"]]
+        top = last[last["depth"] == 0].sort_values("seconds", ascending=False)
+        st.write(
+            f"آخر تشغيل ({runs[-1]['time']}): **{top['seconds'].sum():.2f} ث** — "
+            f"الأبطأ: **{top['stage'].iloc[0]}** ({top['seconds'].iloc[0]:.2f} ث)"
+        )
+        st.dataframe(last.drop(columns=["run", "time", "file"]), use_container_width=True)
+        st.caption(
+            "المراحل المحسوبة فقط (ما أُخذ من الذاكرة المؤقتة لا يظهر). depth > 0 = مرحلة داخل أخرى "
+            "(مثل عرض جدول داخل تبويب)، وزمن التصدير يظهر بعد الضغط على زر التحميل."
+        )
+
+        with st.expander(f"كل التشغيلات ({len(runs)})", expanded=False):
+            st.dataframe(log, use_container_width=True)
+
+        c1, c2, c3 = st.columns(3)
+        c1.download_button("⬇️ السجل (JSON Lines)", _jsonl(log), file_name="perf_log.jsonl",
+                           mime="application/x-ndjson")
+        c2.download_button("⬇️ السجل (CSV)", log.to_csv(index=False).encode("utf-8-sig"),
+                           file_name="perf_log.csv", mime="text/csv")
+        if c3.button("🧹 مسح السجل", key="perf_clear"):
+            st.session_state[PERF_RUNS_KEY] = []
+            st.rerun()
@@ -0,0 +1,759 @@
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import pandas as pd
+import numpy as np
+
+from .utils import clean_numeric, clean_numeric_frame, downcast_int, to_labels, frame_memory_mb
+from .cache import StageCache, config_hash
+from .scoring import (
+    score_purchase_power_vec,
+    score_debt_age_vec,
+    risk_ratio_vec,
+    score_risk_vec,
+    final_classification_vec,
+    treatment_plan_vec,
+    FINAL_LABELS,
+    FINAL_DEFAULT,
+    rep_class_matrix,
+    rep_class_row_columns,
+)
+
+# طبقة الحساب فقط (بدون Streamlit) — تستخدمها التبويبات وسطر الأوامر
+
+
+REP_COL_CANDIDATES = ["اسم المندوب", "المندوب", "مندوب", "اسم مندوب"]
+RETURN_COLUMNS = [
+    "نسبة المرتجع من المباع",
+    "نسبة نوع جديد من مرتجعات العميل",
+    "نسبة نوع تعويض من مرتجعات العميل",
+]
+
+
+def clean_block(df: pd.DataFrame, cols: dict) -> tuple:
+    """الأعمدة المختارة (مديونية/متوسط/عمر) بعد التنظيف + عدد الخلايا الفاشلة لكل عمود."""
+    col_debt = cols["debt"]
+    col_avgq = cols["avgq"]
+
+    missing = [c for c in [col_debt, col_avgq] if c not in df.columns]
+    if missing:
+        raise ValueError(f"يجب توافر أعمدة: {missing}")
+
+    picked = [c for c in dict.fromkeys([col_debt, col_avgq, cols["age"]]) if c and c in df.columns]
+    num = df[picked].copy()
+    failures = clean_numeric_frame(num, picked)
+    return num, failures
+
+
+def pp_block(num: pd.DataFrame, cols: dict, config: dict, stats: dict | None = None) -> pd.DataFrame:
+    """stats: إحصاءات الملف كاملًا عند المعالجة على دفعات (انظر chunked.py)."""
+    col_avgq = cols["avgq"]
+    b = pd.DataFrame(index=num.index)
+
+    # نسبة من القائد (متوسط السداد)
+    max_avg = num[col_avgq].max() if stats is None else stats["max_avg"]
+    b["نسبة من القائد (متوسط)"] = np.where(
+        max_avg > 0,
+        (num[col_avgq] / max_avg * 100).round(2),
+        np.nan
+    )
+    b["نقاط القوة الشرائية"] = downcast_int(score_purchase_power_vec(
+        b["نسبة من القائد (متوسط)"], config["pp"]
+    ))
+    return b
+
+
+def age_block(num: pd.DataFrame, cols: dict, config: dict) -> pd.DataFrame:
+    col_age = cols["age"]
+    b = pd.DataFrame(index=num.index)
+    b["نقاط الالتزام"] = (
+        score_debt_age_vec(num[col_age], config["age"])
+        if col_age and col_age in num.columns else 0
+    )
+    b["نقاط الالتزام"] = downcast_int(b["نقاط الالتزام"])
+    return b
+
+
+def risk_block(num: pd.DataFrame, cols: dict, config: dict) -> pd.DataFrame:
+    col_debt = cols["debt"]
+    col_avgq = cols["avgq"]
+    b = pd.DataFrame(index=num.index)
+    b["مؤشر المخاطرة (مديونية/متوسط)"] = risk_ratio_vec(
+        num[col_debt], num[col_avgq]
+    ).round(3)
+    b["نقاط المخاطرة"] = downcast_int(score_risk_vec(
+        num[col_debt], num[col_avgq], config["risk"]
+    ))
+    return b
+
+
+def final_block(df: pd.DataFrame, num: pd.DataFrame, points: pd.DataFrame, cols: dict, config: dict,
+                stats: dict | None = None) -> tuple:
+    """
+    إجمالي النقاط والتصنيف النهائي ونسب المندوب ونسبة التصنيف من المديونية.
+    يرجع (الأعمدة، مصفوفة المندوب × التصنيف أو None).
+    مع stats تُؤخذ المصفوفة ونسب التصنيفات من إجماليات الملف كاملًا بدل df.
+    """
+    col_debt = cols["debt"]
+    b = pd.DataFrame(index=num.index)
+
+    b["إجمالي النقاط"] = points[
+        ["نقاط القوة الشرائية", "نقاط الالتزام", "نقاط المخاطرة"]
+    ].sum(axis=1)
+
+    b["التصنيف النهائي"] = final_classification_vec(
+        b["إجمالي النقاط"], config["final"]
+    )
+
+    # ===== نسب المندوب =====
+    rep_col = next((c for c in REP_COL_CANDIDATES if c in df.columns), None)
+
+    rep_matrix = None
+    if rep_col is not None:
+        work = pd.DataFrame({
+            rep_col: df[rep_col],
+            "التصنيف النهائي": b["التصنيف النهائي"],
+            col_debt: num[col_debt],
+        })
+        rep_matrix = (
+            rep_class_matrix(work, rep_col, "التصنيف النهائي", col_debt)
+            if stats is None else stats["rep_matrix"]
+        )
+        rows = rep_class_row_columns(work, rep_matrix, rep_col, "التصنيف النهائي")
+        for c in rows.columns:
+            b[c] = rows[c]
+    else:
+        b["نسبة المندوب من فئة العميل (بالعدد %)"] = np.nan
+        b["نسبة المندوب من فئة العميل (بالمديونية %)"] = np.nan
+        b["نسبة الفئة داخل مديونية المندوب (%)"] = np.nan
+
+    # نسبة كل تصنيف من إجمالي المديونية
+    if stats is None:
+        total_debt = num[col_debt].sum(skipna=True)
+        class_debt = num[col_debt].groupby(b["التصنيف النهائي"]).sum()
+        share_map = class_share_map(class_debt, total_debt)
+    else:
+        share_map = stats["class_share"]
+    if share_map is not None:
+        b["نسبة التصنيف من إجمالي المديونية (%)"] = (
+            b["التصنيف النهائي"].map(share_map).round(2)
+        )
+    else:
+        b["نسبة التصنيف من إجمالي المديونية (%)"] = 0.0
+
+    # النقاط بأصغر نوع صحيح والتصنيف كـ category (بعد انتهاء التجميعات عليه)
+    b["إجمالي النقاط"] = downcast_int(b["إجمالي النقاط"])
+    b["التصنيف النهائي"] = to_labels(b["التصنيف النهائي"], FINAL_LABELS + [FINAL_DEFAULT])
+    return b, rep_matrix
+
+
+def class_share_map(class_debt: pd.Series, total_debt) -> dict | None:
+    """نسبة مديونية كل تصنيف من الإجمالي (None إذا كان الإجمالي صفرًا)."""
+    if total_debt and total_debt != 0:
+        return (class_debt / total_debt * 100).to_dict()
+    return None
+
+
+PLAN_NOTES = [
+    "لا توجد خسارة نقاط في الالتزام/المخاطرة — الاكتفاء بالهدف الأساسي",
+    "تفعيل الخطة: تمت إضافة قسط الانحراف الشهري",
+]
+
+
+def plan_block(num: pd.DataFrame, points: pd.DataFrame, final: pd.DataFrame, cols: dict, config: dict) -> pd.DataFrame:
+    """خطة المعالجة الذكية: الانحراف والقسط والأهداف الشهرية."""
+    col_debt = cols["debt"]
+    col_avgq = cols["avgq"]
+    b = pd.DataFrame(index=num.index)
+
+    b["مبلغ الانحراف (للـ3 أشهر)"] = np.maximum(
+        0.0,
+        num[col_debt].fillna(0).astype(float)
+        - 3.0 * num[col_avgq].fillna(0).astype(float)
+    ).round(2)
+
+    b["قسط الانحراف الشهري"] = (b["مبلغ الانحراف (للـ3 أشهر)"] / 3.0).round(2)
+    b["فقد_نقاط_التزام/مخاطرة؟"] = (
+        (points["نقاط الالتزام"] < 5) | (points["نقاط المخاطرة"] < 5)
+    )
+
+    plan = treatment_plan_vec(
+        final["التصنيف النهائي"],
+        points["نقاط القوة الشرائية"],
+        num[col_avgq],
+        num[col_debt],
+        b["قسط الانحراف الشهري"],
+        b["فقد_نقاط_التزام/مخاطرة؟"],
+        config["plan"],
+    )
+    for c in plan.columns:
+        b[c] = plan[c]
+
+    b["ملاحظة خطة السداد"] = to_labels(np.where(
+        b["فقد_نقاط_التزام/مخاطرة؟"],
+        PLAN_NOTES[1],
+        PLAN_NOTES[0],
+    ), PLAN_NOTES, index=b.index)
+    return b
+
+
+def assemble_scored(df: pd.DataFrame, num: pd.DataFrame, blocks: list) -> pd.DataFrame:
+    """الأصل مع الأعمدة المنظفة في مكانها + أعمدة النتائج بالترتيب (بدون نسخ أعمدة الأصل)."""
+    scored = df.copy(deep=False)
+    extra = []
+    for block in [num] + blocks:
+        present = [c for c in block.columns if c in scored.columns]
+        for c in present:
+            scored[c] = block[c]
+        if len(present) < block.shape[1]:
+            extra.append(block.drop(columns=present))
+    return compact_labels(concat_columns([scored] + extra))
+
+
+def concat_columns(blocks: list) -> pd.DataFrame:
+    """
+    ضم كتل أعمدة بنفس صفوف الكتلة الأولى وترتيبها (حسب الموضع، بدون محاذاة أو merge)
+    في خطوة واحدة؛ الكتل تبقى كما هي بدون نسخ بياناتها.
+    """
+    index = blocks[0].index
+    for b in blocks[1:]:
+        if len(b) != len(index):
+            raise ValueError(f"عدد صفوف غير متطابق: {len(b)} بدل {len(index)}")
+    aligned = [b if b.index.equals(index) else b.set_axis(index) for b in blocks]
+    return pd.concat(aligned, axis=1)
+
+
+def compact_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """أعمدة المندوب النصية كـ category داخل df (أسماء مكررة على آلاف الصفوف)."""
+    for c in REP_COL_CANDIDATES:
+        if c in df.columns and (df[c].dtype == object or pd.api.types.is_string_dtype(df[c].dtype)):
+            df[c] = to_labels(df[c])
+    return df
+
+
+def score_customers(df: pd.DataFrame, cols: dict, config: dict) -> dict:
+    """
+    يضيف أعمدة التصنيف والتحليل الأساسي وخطة المعالجة إلى df مباشرة.
+    يرجع {"failures": خلايا تعذر تحويلها لكل عمود، "rep_matrix": مصفوفة المندوب × التصنيف أو None}.
+    """
+    num, failures = clean_block(df, cols)
+    pp = pp_block(num, cols, config)
+    age = age_block(num, cols, config)
+    risk = risk_block(num, cols, config)
+    points = pd.concat([pp, age, risk], axis=1)
+    final, rep_matrix = final_block(df, num, points, cols, config)
+    plan = plan_block(num, points, final, cols, config)
+    for block in [num, pp, age, risk, final, plan]:
+        for c in block.columns:
+            df[c] = block[c]
+    return {"failures": failures, "rep_matrix": rep_matrix}
+
+
+# قيم أعمدة التصنيفات النصية (category بترتيب ثابت)
+DELTA_DIRECTIONS = ["ارتفاع", "انخفاض", "مستقر", "—"]
+DELTA_MAGNITUDES = ["خفيف", "متوسط", "قوي", "—"]
+RETURN_LABELS = ["ضمن المعيار", "يحتاج متابعة", "مرتفع", "مرتفع جدًا", "بيانات غير كافية"]
+
+
+DELTA_DIRECTION_DTYPE = pd.CategoricalDtype(DELTA_DIRECTIONS)
+DELTA_MAGNITUDE_DTYPE = pd.CategoricalDtype(DELTA_MAGNITUDES)
+
+
+def compute_delta_table(base_df: pd.DataFrame, cols: dict, config: dict) -> pd.DataFrame:
+    """
+    أعمدة [فارق] فقط (التبويب والملف الموحّد): (المتوسط − الأعلى) / المتوسط،
+    ونسبته % مقربة، والاتجاه والشدة كـ category بحدود config["delta"] (mag_mid / mag_strong).
+    """
+    col_avgq = cols["avgq"]
+    col_high = cols["high_avgq"]
+
+    if not col_high:
+        return pd.DataFrame()
+    if col_avgq not in base_df.columns or col_high not in base_df.columns:
+        return pd.DataFrame()
+
+    avg = clean_numeric(base_df[col_avgq]).to_numpy(dtype=float)
+    high = clean_numeric(base_df[col_high]).to_numpy(dtype=float)
+    cfg = config["delta"]
+
+    # (avg - high) / avg
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(~np.isnan(avg) & (avg != 0), (avg - high) / avg, np.nan)
+    pct = np.round(np.abs(ratio) * 100.0, int(cfg["decimals_pct"]))
+
+    # الاتجاه: >0 ارتفاع، <0 انخفاض، 0 مستقر، فارغ —
+    direction = np.select([ratio > 0, ratio < 0, ratio == 0], [0, 1, 2], default=3)
+    # الشدة حسب النسبة المقربة: < mag_mid خفيف، < mag_strong متوسط، غير ذلك قوي
+    magnitude = np.select(
+        [pct < cfg["mag_mid"], pct < cfg["mag_strong"], pct >= cfg["mag_strong"]], [0, 1, 2], default=3
+    )
+
+    return pd.DataFrame({
+        "[فارق] فارق التغير (نسبي)": ratio,
+        "[فارق] فئة نسبة الفارق %": pct,
+        "[فارق] اتجاه مبسط": pd.Categorical.from_codes(direction, dtype=DELTA_DIRECTION_DTYPE),
+        "[فارق] شدة الفارق": pd.Categorical.from_codes(magnitude, dtype=DELTA_MAGNITUDE_DTYPE),
+    }, index=base_df.index)
+
+
+# ================= محرك المرتجع (التبويب والملف الموحّد) =================
+RETURN_SECTION_LABELS = ["المرتجع من المباع", "النوع الجديد", "نوع تعويض"]
+RETURN_DTYPE = pd.CategoricalDtype(RETURN_LABELS)
+RETURNS_REF_MIN_PCT = 5.0
+
+
+def returns_ref_mask(avg_series: pd.Series, max_avg) -> pd.Series:
+    """
+    صفوف مجموعة مرجع المرتجع: نقاط قوة شرائية (ثابتة 50/25/15/10/5) بين 5 و 10،
+    أي نسبة من القائد (مقربة لمنزلتين كما في pp_block) ≥ 5%.
+    """
+    if not max_avg > 0:
+        return pd.Series(False, index=avg_series.index)
+    return (avg_series / max_avg * 100).round(2) >= RETURNS_REF_MIN_PCT
+
+
+def returns_values(base_df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """أعمدة نسب المرتجع بعد التنظيف (اللانهاية => فارغ)."""
+    values = base_df[columns].copy()
+    clean_numeric_frame(values, columns)
+    return values.astype(float).replace([np.inf, -np.inf], np.nan)
+
+
+def classify_returns(base_df: pd.DataFrame, col_avgpay: str, columns: list, config: dict,
+                     refs: dict | None = None) -> dict:
+    """
+    تصنيف كل أعمدة نسب المرتجع معًا: مجموعة المرجع تُحسب مرة واحدة، والمعيار = متوسط كل عمود فيها،
+    ثم المضاعف (القيمة / المعيار) يُصنف بحدود config["returns"] على كل الأعمدة دفعة واحدة.
+    refs: معيار كل عمود من الملف كاملًا (المعالجة على دفعات) بدل حسابه من base_df.
+    يرجع {"values", "ratio", "labels": DataFrame بأعمدة columns، "ref": معيار كل عمود}.
+    """
+    columns = list(dict.fromkeys(columns))
+    values = returns_values(base_df, columns)
+    if refs is None:
+        avg = clean_numeric(base_df[col_avgpay])
+        ref = values[returns_ref_mask(avg, avg.max()).to_numpy()].mean()
+    else:
+        ref = pd.Series([refs.get(c, np.nan) for c in columns], index=columns, dtype=float)
+    return classify_return_values(values, ref, config)
+
+
+def classify_return_values(values: pd.DataFrame, ref: pd.Series, config: dict) -> dict:
+    """المضاعف والتصنيف لقيم مرتجع منظفة ومعيار كل عمود (بدون إعادة تنظيف القيم)."""
+    # معيار فارغ أو صفر => مضاعف فارغ => "بيانات غير كافية"
+    ratio = values / ref.where(ref.notna() & (ref != 0))
+
+    m = config["returns"]
+    r = ratio.to_numpy()
+    codes = np.select(
+        [r <= m["m_ok"], r <= m["m_watch"], r <= m["m_high"], r > m["m_high"]],
+        [0, 1, 2, 3],
+        default=RETURN_LABELS.index("بيانات غير كافية"),
+    )
+    labels = pd.DataFrame(
+        {c: pd.Categorical.from_codes(codes[:, j], dtype=RETURN_DTYPE) for j, c in enumerate(values.columns)},
+        index=values.index,
+    )
+    return {"values": values, "ref": ref, "ratio": ratio, "labels": labels}
+
+
+def compute_returns_table(base_df: pd.DataFrame, cols: dict, config: dict, stats: dict | None = None) -> pd.DataFrame:
+    """
+    أعمدة [مرتجع] للملف الموحّد (أعمدة المرتجع الثابتة RETURN_COLUMNS).
+    stats: {"returns_ref": {عمود: المعيار}} من الملف كاملًا عند المعالجة على دفعات.
+    """
+    col_avgpay = cols["avgq"]
+    if col_avgpay not in base_df.columns:
+        return pd.DataFrame()
+
+    present = [(c, label) for c, label in zip(RETURN_COLUMNS, RETURN_SECTION_LABELS) if c in base_df.columns]
+    if not present:
+        return pd.DataFrame()
+    res = classify_returns(
+        base_df, col_avgpay, [c for c, _ in present], config,
+        refs=None if stats is None else stats["returns_ref"],
+    )
+    return returns_table_columns(res, present)
+
+
+def returns_table_columns(res: dict, present: list) -> pd.DataFrame:
+    """أعمدة [مرتجع] من ناتج classify_returns؛ present: [(عمود الملف، عنوانه)]."""
+    out = {}
+    for c, label in present:
+        ref = res["ref"][c]
+        out[f"[مرتجع] قيمة ({label})"] = res["values"][c]
+        out[f"[مرتجع] معيار ({label} 10–5)"] = round(ref, 4) if pd.notna(ref) else np.nan
+        out[f"[مرتجع] مضاعف ({label}) مقابل المعيار"] = res["ratio"][c]
+        out[f"[مرتجع] تصنيف ({label})"] = res["labels"][c]
+    return pd.DataFrame(out, index=res["values"].index)
+
+
+def compute_returns_sections(df: pd.DataFrame, col_avgpay: str, sections: list, config: dict) -> list:
+    """
+    تبويب المرتجع المستقل (أعمدة يحددها المستخدم) بنفس محرك الملف الموحّد:
+    لكل (عمود، عنوان) في sections يرجع (العنوان، الجدول أو None، تنبيه أو None).
+    """
+    present = [c for c, _ in sections if c in df.columns]
+    res = None
+    if present and col_avgpay in df.columns:
+        res = classify_returns(df, col_avgpay, present, config)
+
+    results = []
+    for cname, lbl in sections:
+        if cname not in df.columns:
+            results.append((lbl, None, f"⚠️ لم يتم العثور على العمود: {cname}"))
+        elif res is None:
+            results.append((lbl, None, f"لا يمكن احتساب مجموعة المرجع لعدم توفر '{col_avgpay}'."))
+        else:
+            out = pd.DataFrame({
+                cname: res["values"][cname],
+                f"معيار المرتجع ({lbl} 10–5)": res["ref"][cname],
+                f"مضاعف المرتجع ({lbl}) مقابل المعيار": res["ratio"][cname],
+                f"تصنيف المرتجع ({lbl})": res["labels"][cname],
+            }, index=df.index)
+            results.append((lbl, out, None))
+    return results
+
+
+REP_NAME_COL = "اسم المندوب"
+REP_ID_COL = "رقم المندوب"
+REP_DEBT_COL = "المديونية"
+REP_AVGQ_COL = "متوسط السداد الربعي"
+REP_MONTHLY_COL = "السداد الشهري للعميل"
+REP_TURNOVER_REQUIRED = [REP_ID_COL, REP_NAME_COL, REP_DEBT_COL, REP_AVGQ_COL, REP_MONTHLY_COL]
+
+
+def compute_rep_turnover(base_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    يحسب دوران المديونية لكل مندوب (ربعي/شهري) مع عدد العملاء والإجماليات.
+    يرجع DataFrame فارغ إذا نقص أي عمود مطلوب.
+    """
+    if any(c not in base_df.columns for c in REP_TURNOVER_REQUIRED):
+        return pd.DataFrame()
+    return rep_turnover_ratios(rep_turnover_sums(base_df))
+
+
+def rep_turnover_sums(base_df: pd.DataFrame) -> pd.DataFrame:
+    """عدد العملاء والإجماليات لكل مندوب — قابلة للجمع بين دفعات الملف."""
+    w = base_df[REP_TURNOVER_REQUIRED].copy()
+    w[REP_DEBT_COL] = clean_numeric(w[REP_DEBT_COL]).fillna(0.0)
+    w[REP_AVGQ_COL] = clean_numeric(w[REP_AVGQ_COL]).fillna(0.0)
+    w[REP_MONTHLY_COL] = clean_numeric(w[REP_MONTHLY_COL]).fillna(0.0)
+
+    grp = w.groupby([REP_ID_COL, REP_NAME_COL], dropna=False).agg(
+        عدد_العملاء=(REP_DEBT_COL, "size"),
+        اجمالي_المديونية=(REP_DEBT_COL, "sum"),
+        اجمالي_متوسط_السداد_الربعي=(REP_AVGQ_COL, "sum"),
+        اجمالي_السداد_الشهري=(REP_MONTHLY_COL, "sum"),
+    ).reset_index()
+    return grp
+
+
+def rep_turnover_ratios(grp: pd.DataFrame) -> pd.DataFrame:
+    """إضافة الدوران الربعي/الشهري إلى ناتج rep_turnover_sums."""
+    grp = grp.copy()
+
+    # حساب الدوران (مع حماية القسمة على صفر)
+    grp["الدوران الربعي للمندوب"] = np.where(
+        grp["اجمالي_المديونية"] != 0,
+        grp["اجمالي_متوسط_السداد_الربعي"] / grp["اجمالي_المديونية"],
+        np.nan
+    )
+
+    grp["الدوران الشهري للمندوب"] = np.where(
+        grp["اجمالي_المديونية"] != 0,
+        grp["اجمالي_السداد_الشهري"] / grp["اجمالي_المديونية"],
+        np.nan
+    )
+
+    return grp
+
+
+REP_TURNOVER_COLS = ["الدوران الربعي للمندوب", "الدوران الشهري للمندوب"]
+
+
+def compute_rep_turnover_map(base_df: pd.DataFrame, rep_turnover: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    مفاتيح الربط + العمودين المطلوب تكرارهما أمام كل عميل.
+    يمكن تمرير ناتج compute_rep_turnover لتجنب إعادة الحساب.
+    """
+    grp = compute_rep_turnover(base_df) if rep_turnover is None else rep_turnover
+    if grp.empty:
+        return pd.DataFrame()
+    return grp[[REP_ID_COL, REP_NAME_COL] + REP_TURNOVER_COLS]
+
+
+def _key_codes(left: pd.DataFrame, right: pd.DataFrame, on: list) -> tuple:
+    """
+    رمز صحيح واحد لكل تركيبة مفاتيح on في الجدولين (الفارغ يطابق الفارغ كما في merge)؛
+    القيم تُرمّز حسب قيم right (الجدول الصغير) فقط، و-1 لصفوف left التي لا مقابل لها.
+    """
+    code_l = np.zeros(len(left), dtype=np.int64)
+    code_r = np.zeros(len(right), dtype=np.int64)
+    unmatched = np.zeros(len(left), dtype=bool)
+    for c in on:
+        codes, uniques = pd.factorize(right[c], use_na_sentinel=False)
+        # ترميز left بقيمه الفريدة ثم مطابقة الفريدة فقط (أسرع من البحث لكل صف في النصوص)
+        rows_l, uniques_l = pd.factorize(left[c], use_na_sentinel=False)
+        codes_l = pd.Index(uniques).get_indexer(uniques_l)[rows_l]
+        unmatched |= codes_l < 0
+        code_l = code_l * len(uniques) + codes_l
+        code_r = code_r * len(uniques) + codes
+    code_l[unmatched] = -1
+    return code_l, code_r
+
+
+def rep_turnover_rows(base_df: pd.DataFrame, rep_turn: pd.DataFrame | None) -> pd.DataFrame:
+    """
+    عمودا دوران المندوب أمام كل عميل بنفس صفوف base_df وترتيبها:
+    موضع مندوب كل صف في rep_turn عبر فهرس المفاتيح (رقم/اسم المندوب) بدل merge.
+    """
+    values = np.full((len(base_df), len(REP_TURNOVER_COLS)), np.nan)
+    if (rep_turn is not None and not rep_turn.empty
+            and REP_ID_COL in base_df.columns and REP_NAME_COL in base_df.columns):
+        code_rows, code_reps = _key_codes(base_df, rep_turn, [REP_ID_COL, REP_NAME_COL])
+        pos = pd.Index(code_reps).get_indexer(code_rows)
+        found = pos >= 0
+        values[found] = rep_turn[REP_TURNOVER_COLS].to_numpy(dtype=float)[pos[found]]
+    return pd.DataFrame(values, index=base_df.index, columns=REP_TURNOVER_COLS)
+
+
+def assemble_unified(df, df_original, df_delta_all, df_returns_all, rep_turn) -> pd.DataFrame:
+    """
+    يجمع: أعمدة الملف الأصلي + نتائج التبويب الأساسي + أعمدة الفارق + تصنيفات المرتجع
+    + (تكرار) دوران المندوب أمام كل عميل.
+    كتل أعمدة تُضم مرة واحدة بنفس صفوف df_original وترتيبها (بدون نسخ الأصل أو merge).
+    """
+    blocks = [df_original]
+
+    # أعمدة النتائج الأساسية الموجودة في df وليست في df_original
+    main_extra_cols = [c for c in df.columns if c not in df_original.columns]
+    if main_extra_cols:
+        blocks.append(df[main_extra_cols].add_prefix("[أساسي] "))
+
+    # الفارق والمرتجع
+    for block in (df_delta_all, df_returns_all):
+        if block is not None and not block.empty:
+            blocks.append(block)
+
+    # ====== دوران المندوب لكل عميل (تكرار على الصفوف) ======
+    blocks.append(rep_turnover_rows(df_original, rep_turn))
+
+    return compact_labels(concat_columns(blocks))
+
+
+def required_columns(cols: dict) -> tuple:
+    """
+    الأعمدة التي يقرؤها خط المعالجة فعلًا (للقراءة السريعة):
+    يرجع (كل الأعمدة، الأعمدة الرقمية منها).
+    """
+    mapped = [cols.get(k) for k in ("debt", "avgq", "age", "high_avgq")]
+    numeric = [c for c in mapped + [REP_DEBT_COL, REP_AVGQ_COL, REP_MONTHLY_COL] + RETURN_COLUMNS if c]
+    every = list(dict.fromkeys(numeric + REP_COL_CANDIDATES + [REP_ID_COL, REP_NAME_COL]))
+    return every, list(dict.fromkeys(numeric))
+
+
+# ================= تشغيل كل المراحل مرة واحدة =================
+def _output_rows(out):
+    """عدد صفوف ناتج المرحلة (الإطار أو أول عنصر في tuple مثل (num, failures))."""
+    if isinstance(out, tuple) and out:
+        out = out[0]
+    return len(out) if isinstance(out, (pd.DataFrame, pd.Series)) else None
+
+
+class StageTimer:
+    """
+    تسجيل زمن كل مرحلة وعدد الصفوف، ومع tracemalloc شغال: ذروة الذاكرة المحجوزة أثناء المرحلة
+    فوق ما كان محجوزًا قبلها (peak_mb). المراحل المتداخلة (مرحلة داخل أخرى) لها depth أكبر
+    وذروة المرحلة الخارجية تشمل ذروة ما بداخلها.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._depth = 0
+        self._open = []        # [محجوز عند البداية، أعلى ذروة سُجلت] لكل مرحلة مفتوحة مع tracemalloc
+
+    def run(self, stage: str, fn, *args, **kwargs):
+        tracing = tracemalloc.is_tracing()
+        depth = self._depth
+        self._depth += 1
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._open:
+                self._open[-1][1] = max(self._open[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._open.append([current, current])
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        finally:
+            seconds = round(time.perf_counter() - t0, 4)
+            self._depth -= 1
+            if tracing:
+                base, peak = self._open.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._open:
+                    self._open[-1][1] = max(self._open[-1][1], peak)
+        record = {"stage": stage, "seconds": seconds, "rows": _output_rows(out), "depth": depth}
+        if tracing:
+            record["peak_mb"] = round((peak - base) / 2**20, 2)
+        self.records.append(record)
+        return out
+
+
+@dataclass
+class PipelineResult:
+    """كل نتائج الحساب لملف واحد وإعدادات واحدة؛ التبويبات تعرضها فقط."""
+    original: pd.DataFrame             # الملف بعد تطبيع أسماء الأعمدة فقط
+    scored: pd.DataFrame               # الأصل + أعمدة التصنيف وخطة المعالجة
+    cols: dict
+    config: dict
+    failures: dict                     # خلايا تعذر تحويلها إلى أرقام لكل عمود
+    rep_matrix: pd.DataFrame | None    # مصفوفة المندوب × التصنيف
+    delta: pd.DataFrame                # أعمدة [فارق]
+    returns: pd.DataFrame              # أعمدة [مرتجع]
+    rep_turnover: pd.DataFrame         # جدول دوران المندوبين
+    unified: pd.DataFrame              # الملف الموحّد
+    timings: list                      # المراحل التي حُسبت فعلًا في هذا التشغيل وأزمنتها
+    keys: dict                         # بصمة كل مرحلة (مع مفتاح البيانات) — مفاتيح للتصدير والذاكرة
+
+
+RESULT_FRAMES = ["original", "scored", "delta", "returns", "rep_turnover", "unified"]
+
+
+def memory_report(result: PipelineResult) -> pd.DataFrame:
+    """حجم كل جدول في النتيجة: الصفوف والأعمدة وأعمدة category والحجم بالميجابايت."""
+    rows = []
+    for name in RESULT_FRAMES:
+        df = getattr(result, name)
+        rows.append({
+            "الجدول": name,
+            "الصفوف": len(df),
+            "الأعمدة": df.shape[1],
+            "أعمدة category": sum(isinstance(t, pd.CategoricalDtype) for t in df.dtypes),
+            "الحجم (MB)": frame_memory_mb(df),
+        })
+    return pd.DataFrame(rows)
+
+
+# ================= رسم الاعتماديات بين المراحل =================
+# المرحلة: (أعمدة الربط التي تقرأها، أقسام الإعدادات، المراحل السابقة التي تعتمد عليها)
+# بالترتيب الطوبولوجي؛ تغيير قسم إعدادات يعيد حساب مرحلته وما بعدها فقط.
+STAGE_GRAPH = {
+    "clean": (["debt", "avgq", "age"], [], []),
+    "pp": (["avgq"], ["pp"], ["clean"]),
+    "age": (["age"], ["age"], ["clean"]),
+    "risk": (["debt", "avgq"], ["risk"], ["clean"]),
+    "final": (["debt"], ["final"], ["pp", "age", "risk"]),
+    "plan": (["debt", "avgq"], ["plan"], ["final"]),
+    "scored": ([], [], ["plan"]),
+    "delta": (["avgq", "high_avgq"], ["delta"], []),
+    "returns": (["avgq"], ["returns"], []),
+    "rep_turnover": ([], [], []),
+    "unified": ([], [], ["scored", "delta", "returns", "rep_turnover"]),
+}
+
+# الأعمدة المشتقة التي تنتجها كل مرحلة (أعمدة المرتجع تتبع أسماء أعمدة الملف ببادئة [مرتجع])
+STAGE_COLUMNS = {
+    "pp": ["نسبة من القائد (متوسط)", "نقاط القوة الشرائية"],
+    "age": ["نقاط الالتزام"],
+    "risk": ["مؤشر المخاطرة (مديونية/متوسط)", "نقاط المخاطرة"],
+    "final": [
+        "إجمالي النقاط", "التصنيف النهائي",
+        "نسبة المندوب من فئة العميل (بالعدد %)", "نسبة المندوب من فئة العميل (بالمديونية %)",
+        "إجمالي مديونية المندوب", "مديونية المندوب ضمن هذه الفئة",
+        "نسبة الفئة داخل مديونية المندوب (%)", "نسبة التصنيف من إجمالي المديونية (%)",
+    ],
+    "plan": [
+        "مبلغ الانحراف (للـ3 أشهر)", "قسط الانحراف الشهري", "فقد_نقاط_التزام/مخاطرة؟",
+        "هدف السداد الشهري (أساس)", "هدف المبيعات الشهري", "هدف السداد الشهري (بعد المعالجة)",
+        "ملاحظة خطة السداد",
+    ],
+    "delta": ["[فارق] فارق التغير (نسبي)", "[فارق] فئة نسبة الفارق %", "[فارق] اتجاه مبسط", "[فارق] شدة الفارق"],
+    "rep_turnover": ["الدوران الربعي للمندوب", "الدوران الشهري للمندوب"],
+}
+
+
+def affected_stages(sections) -> list:
+    """المراحل التي يلزم إعادة حسابها عند تغيير أقسام الإعدادات المعطاة (مع كل ما بعدها)."""
+    sections = set(sections)
+    out = []
+    for stage, (_, stage_sections, after) in STAGE_GRAPH.items():
+        if sections & set(stage_sections) or any(a in out for a in after):
+            out.append(stage)
+    return out
+
+
+def affected_columns(sections) -> list:
+    """الأعمدة المشتقة التي تتغير عند تغيير أقسام الإعدادات المعطاة."""
+    return [c for stage in affected_stages(sections) for c in STAGE_COLUMNS.get(stage, [])]
+
+
+def stage_keys(cols: dict, config: dict) -> dict:
+    """
+    بصمة لكل مرحلة = أعمدتها وإعداداتها + بصمات المراحل السابقة،
+    فتتغير بصمة المرحلة فقط إذا تغير شيء تعتمد عليه (مباشرة أو عبر ما قبلها).
+    """
+    keys = {}
+    for stage, (col_keys, sections, after) in STAGE_GRAPH.items():
+        keys[stage] = config_hash({
+            "cols": {k: cols.get(k) for k in col_keys},
+            "config": {k: config.get(k) for k in sections},
+            "after": [keys[a] for a in after],
+        })
+    return keys
+
+
+def run_pipeline(
+    df_original: pd.DataFrame,
+    cols: dict,
+    config: dict,
+    timer: StageTimer | None = None,
+    cache: StageCache | None = None,
+    data_key: str | None = None,
+) -> PipelineResult:
+    """
+    تنظيف وتصنيف وتجميع مرة واحدة لكل (ملف، إعدادات). df_original لا يتم تعديله.
+    مع cache و data_key (بصمة محتوى الملف) لا يُعاد إلا حساب المراحل التي تغيرت مدخلاتها
+    حسب STAGE_GRAPH، والباقي يُرجع من الذاكرة.
+    """
+    timer = timer or StageTimer()
+    keys = stage_keys(cols, config)
+
+    def stage(name, fn, *args):
+        if cache is None or data_key is None:
+            return timer.run(name, fn, *args)
+        return cache.get_or_compute((data_key, name, keys[name]), timer.run, name, fn, *args)
+
+    num, failures = stage("clean", clean_block, df_original, cols)
+    pp = stage("pp", pp_block, num, cols, config)
+    age = stage("age", age_block, num, cols, config)
+    risk = stage("risk", risk_block, num, cols, config)
+    points = pd.concat([pp, age, risk], axis=1)
+    final, rep_matrix = stage("final", final_block, df_original, num, points, cols, config)
+    plan = stage("plan", plan_block, num, points, final, cols, config)
+    scored = stage("scored", assemble_scored, df_original, num, [pp, age, risk, final, plan])
+
+    # الفارق والمرتجع ينظفان أعمدتهما بنفسيهما فلا يعتمدان على مرحلة التصنيف
+    delta = stage("delta", compute_delta_table, df_original, cols, config)
+    returns = stage("returns", compute_returns_table, df_original, cols, config)
+    rep_turnover = stage("rep_turnover", compute_rep_turnover, df_original)
+    unified = stage(
+        "unified", assemble_unified, scored, df_original, delta, returns,
+        compute_rep_turnover_map(df_original, rep_turnover),
+    )
+
+    return PipelineResult(
+        original=df_original,
+        scored=scored,
+        cols=cols,
+        config=config,
+        failures=failures,
+        rep_matrix=rep_matrix,
+        delta=delta,
+        returns=returns,
+        rep_turnover=rep_turnover,
+        unified=unified,
+        timings=timer.records,
+        keys={name: (data_key, name, h) for name, h in keys.items()},
+    )
@@ -0,0 +1,62 @@
+import json
+import os
+from pathlib import Path
+
+from .cache import config_hash
+
+DEFAULT_PROFILES_PATH = Path(os.environ.get(
+    "CUSTOMER_AI_PROFILES", Path.home() / ".cache" / "customer_ai" / "mapping_profiles.json"
+))
+
+# مفاتيح التعيين (نفس مفاتيح sidebar_column_mapping)
+MAPPING_KEYS = ["debt", "avgq", "age", "high_avgq"]
+
+
+def header_fingerprint(columns) -> str:
+    """بصمة شكل الملف = العناوين بعد normalize بنفس الترتيب."""
+    return config_hash([str(c) for c in columns])
+
+
+class MappingProfiles:
+    """
+    تعيينات الأعمدة المؤكدة محفوظة محليًا (JSON) حسب بصمة العناوين،
+    فالملف الجديد بنفس الشكل يأخذ تعيينه مباشرة بدون اكتشاف أو إعادة اختيار.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_PROFILES_PATH):
+        self.path = Path(path)
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def get(self, columns) -> dict | None:
+        """التعيين المحفوظ لهذه العناوين (None إذا لم يوجد أو لم تعد أعمدته موجودة)."""
+        cols = self._load().get(header_fingerprint(columns))
+        if not cols:
+            return None
+        present = set(map(str, columns))
+        if any(cols.get(k) and cols[k] not in present for k in MAPPING_KEYS):
+            return None
+        return {k: cols.get(k) for k in MAPPING_KEYS}
+
+    def save(self, columns, cols: dict):
+        data = self._load()
+        data[header_fingerprint(columns)] = {k: cols.get(k) for k in MAPPING_KEYS}
+        self._write(data)
+
+    def delete(self, columns):
+        data = self._load()
+        if data.pop(header_fingerprint(columns), None) is not None:
+            self._write(data)
+
+    def __len__(self):
+        return len(self._load())
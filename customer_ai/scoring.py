@@ -1,85 +1,67 @@
-import streamlit as st
+import copy
+
 import pandas as pd
+import numpy as np
+
+# مضاعفات خطة المعالجة الافتراضية: التصنيف => (مضاعف السداد، مضاعف المبيعات) من متوسط السداد
+PLAN_DEFAULTS = {
+    "ملتزم": (1.00, 1.00),
+    "جيد": (1.10, 1.00),
+    "جدوله مديونية وتثبيت السقف (حد أعلى المبيعات الآجل)": (1.15, 1.00),
+    "جدوله مديونية وتخفيف المبيعات الآجل": (1.15, 0.90),
+    "قبل النهاية": (1.15, 0.85),
+    "عميل غير مجدي": (0.00, 0.00),
+}
 
-# ================= إعدادات الشريط الجانبي =================
-def build_config_from_sidebar() -> dict:
-    # ---- نقاط القوة الشرائية ----
-    with st.sidebar.expander("نقاط القوة الشرائية (النسبة من القائد)", expanded=False):
-        st.info("جدول النقاط يعتمد على حدود دنيا لكل مستوى.")
-        pp_10 = st.number_input("حد أدنى % للحصول على 10 نقاط", value=50.0, step=0.1)
-        pp_8  = st.number_input("حد أدنى % للحصول على 8 نقاط",  value=25.0, step=0.1)
-        pp_7  = st.number_input("حد أدنى % للحصول على 7 نقاط",  value=15.0, step=0.1)
-        pp_6  = st.number_input("حد أدنى % للحصول على 6 نقاط",  value=10.0, step=0.1)
-        pp_5  = st.number_input("حد أدنى % للحصول على 5 نقاط",  value=5.0,  step=0.1)
-        pp_4  = st.number_input("حد أدنى % للحصول على 4 نقاط",  value=4.0,  step=0.1)
-        pp_3  = st.number_input("حد أدنى % للحصول على 3 نقاط",  value=3.0,  step=0.1)
-        pp_2  = st.number_input("حد أدنى % للحصول على 2 نقاط",  value=2.0,  step=0.1)
-        pp_1  = st.number_input("حد أدنى % للحصول على 1 نقطة",   value=1.0,  step=0.1)
-
-    # ---- نقاط الالتزام (عمر المديونية) ----
-    with st.sidebar.expander("نقاط الالتزام (عمر المديونية)", expanded=False):
-        st.info("خصم تلقائي بالسالب لما بعد 60 يوم على شكل شرائح كل 30 يوم.")
-        age_5 = st.number_input("≤ هذا العدد من الأيام = 5 نقاط", value=30, step=1)
-        age_4 = st.number_input("≤ هذا العدد من الأيام = 4 نقاط", value=40, step=1)
-        age_3 = st.number_input("≤ هذا العدد من الأيام = 3 نقاط", value=51, step=1)
-        age_2 = st.number_input("≤ هذا العدد من الأيام = 2 نقاط", value=60, step=1)
-
-    # ---- نقاط المخاطرة ----
-    with st.sidebar.expander("نقاط المخاطرة (المديونية ÷ متوسط السداد الربعي)", expanded=False):
-        st.info("يشمل نقاطًا سالبة إذا ارتفع المؤشر.")
-        r_5 = st.number_input("≤ هذا المؤشر = 5 نقاط", value=1.00, step=0.1, format="%.2f")
-        r_4 = st.number_input("≤ هذا المؤشر = 4 نقاط", value=1.50, step=0.1, format="%.2f")
-        r_3 = st.number_input("≤ هذا المؤشر = 3 نقاط", value=2.00, step=0.1, format="%.2f")
-        r_2 = st.number_input("≤ هذا المؤشر = 2 نقاط", value=2.50, step=0.1, format="%.2f")
-        r_1 = st.number_input("≤ هذا المؤشر = 1 نقطة", value=3.00, step=0.1, format="%.2f")
-
-    # ---- إعدادات الفارق ----
-    with st.sidebar.expander("إعدادات أعمدة الفارق المبسطة", expanded=False):
-        snap_to_int = st.checkbox("تقريب فئة الفارق (نقاط) إلى أقرب عدد صحيح", value=True)
-        decimals_pct = st.number_input("عدد المنازل العشرية لفئة نسبة الفارق %", value=0, step=1, min_value=0, max_value=4)
-
-    # ---- حدود تصنيف المرتجع ----
-    with st.sidebar.expander("حدود تصنيف المرتجع (المضاعف مقابل المعيار)", expanded=False):
-        m_ok     = st.number_input("≤ هذا المضاعف = ضمن المعيار", value=1.00, step=0.1, format="%.2f")
-        m_watch  = st.number_input("≤ هذا المضاعف = يحتاج متابعة", value=1.50, step=0.1, format="%.2f")
-        m_high   = st.number_input("≤ هذا المضاعف = مرتفع", value=2.00, step=0.1, format="%.2f")
-
-    # ---- التصنيف النهائي ----
-    with st.sidebar.expander("التصنيف النهائي (حسب مجموع النقاط)", expanded=False):
-        st.info("يشمل مستوى جديد: 8–9.9 = قبل النهاية.")
-        final_motazem_min = st.number_input("≥ هذا المجموع = ملتزم", value=17.0, step=0.5)
-        final_jayed_min   = st.number_input("≥ هذا المجموع = جيد", value=14.0, step=0.5)
-        final_fix_cap_min = st.number_input("≥ هذا المجموع = جدولة + تثبيت السقف", value=12.0, step=0.1)
-        final_reduce_min  = st.number_input("≥ هذا المجموع = جدولة + تخفيف", value=10.0, step=0.1)
-
-    return {
-        "pp": {
-            "pp_10": pp_10, "pp_8": pp_8, "pp_7": pp_7,
-            "pp_6": pp_6, "pp_5": pp_5, "pp_4": pp_4,
-            "pp_3": pp_3, "pp_2": pp_2, "pp_1": pp_1
-        },
-        "age": {
-            "age_5": age_5, "age_4": age_4,
-            "age_3": age_3, "age_2": age_2
-        },
-        "risk": {
-            "r_5": r_5, "r_4": r_4,
-            "r_3": r_3, "r_2": r_2, "r_1": r_1
-        },
-        "delta": {
-            "snap_to_int": snap_to_int,
-            "decimals_pct": int(decimals_pct)
-        },
-        "returns": {
-            "m_ok": m_ok, "m_watch": m_watch, "m_high": m_high
-        },
-        "final": {
-            "motazem": final_motazem_min,
-            "jayed": final_jayed_min,
-            "fix_cap": final_fix_cap_min,
-            "reduce": final_reduce_min
+# ================= الإعدادات الافتراضية =================
+# نفس شكل build_config_from_sidebar() وقيمه الابتدائية (تستخدمها الواجهة وسطر الأوامر)
+DEFAULT_CONFIG = {
+    "pp": {
+        "pp_10": 50.0, "pp_8": 25.0, "pp_7": 15.0,
+        "pp_6": 10.0, "pp_5": 5.0, "pp_4": 4.0,
+        "pp_3": 3.0, "pp_2": 2.0, "pp_1": 1.0
+    },
+    "age": {
+        "age_5": 30, "age_4": 40,
+        "age_3": 51, "age_2": 60
+    },
+    "risk": {
+        "r_5": 1.00, "r_4": 1.50,
+        "r_3": 2.00, "r_2": 2.50, "r_1": 3.00
+    },
+    "delta": {
+        "snap_to_int": True,
+        "decimals_pct": 0,
+        "mag_mid": 10.0, "mag_strong": 30.0
+    },
+    "returns": {
+        "m_ok": 1.00, "m_watch": 1.50, "m_high": 2.00
+    },
+    "final": {
+        "motazem": 17.0,
+        "jayed": 14.0,
+        "fix_cap": 12.0,
+        "reduce": 10.0
+    },
+    "plan": {
+        "min_pp": 5,
+        "rules": {
+            label: {"pay": pay, "sales": sales}
+            for label, (pay, sales) in PLAN_DEFAULTS.items()
         }
     }
+}
+
+
+def merge_config(overrides: dict | None, base: dict | None = None) -> dict:
+    """دمج إعدادات جزئية فوق الافتراضية (دمج عميق للقواميس)."""
+    out = copy.deepcopy(DEFAULT_CONFIG if base is None else base)
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(out.get(key), dict):
+            out[key] = merge_config(value, out[key])
+        else:
+            out[key] = value
+    return out
 
 # ================= دوال حساب النقاط =================
 def score_purchase_power(pct, cfg_pp: dict) -> int:
@@ -145,3 +127,180 @@ def final_classification(score, cfg_final: dict) -> str:
     elif score >= cfg_final["reduce"]: return "جدوله مديونية وتخفيف المبيعات الآجل"
     elif score >= 8: return "قبل النهاية"
     else: return "عميل غير مجدي"
+
+
+# ================= نسخ متجهة (عمود كامل دفعة واحدة) =================
+# نفس منطق الدوال أعلاه حرفيًا، لكن على مصفوفات حدود بدل التكرار صفًا بصف.
+PP_POINTS = [10, 8, 7, 6, 5, 4, 3, 2, 1]
+AGE_POINTS = [5, 4, 3, 2]
+RISK_POINTS = [5, 4, 2, 1, 0]
+# شرائح المؤشر الثابتة بعد r_1 كما في score_risk
+RISK_FIXED_BANDS = [(4.0, 0), (6.0, -5), (12.0, -10)]
+FINAL_LABELS = [
+    "ملتزم",
+    "جيد",
+    "جدوله مديونية وتثبيت السقف (حد أعلى المبيعات الآجل)",
+    "جدوله مديونية وتخفيف المبيعات الآجل",
+    "قبل النهاية",
+]
+FINAL_DEFAULT = "عميل غير مجدي"
+
+
+def _as_float(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+
+def _wrap(out, like):
+    """إرجاع Series بنفس الفهرس إن كان المدخل Series، وإلا مصفوفة."""
+    if isinstance(like, pd.Series):
+        return pd.Series(out, index=like.index)
+    return out
+
+
+def _round_py(values, decimals: int = 2) -> np.ndarray:
+    """
+    تقريب بنفس نتيجة round() في Python لكل عنصر. np.round يضرب في 10^n ثم يقرب فيختلف
+    عند القيم القريبة جدًا من المنتصف (مثل 11461.725)؛ هذه فقط تُقرب بـ round() العادية.
+    "القرب" بوحدات الدقة (ulp) للقيمة المضروبة وليس رقمًا ثابتًا، فيبقى صحيحًا للقيم الكبيرة.
+    """
+    x = np.asarray(values, dtype=float)
+    out = np.round(x, decimals)
+    scaled = x * 10.0 ** decimals
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    idx = np.flatnonzero(near_half)
+    if idx.size:
+        out[idx] = [round(v, decimals) for v in x[idx].tolist()]
+    return out
+
+
+def score_purchase_power_vec(pct, cfg_pp: dict):
+    x = _as_float(pct)
+    thresholds = np.array([cfg_pp[f"pp_{p}"] for p in PP_POINTS], dtype=float)
+    # NaN يعطي False في كل المقارنات => 0 كما في الدالة الأصلية
+    conds = [x >= t for t in thresholds]
+    out = np.select(conds, PP_POINTS, default=0).astype(np.int64)
+    return _wrap(out, pct)
+
+
+def score_debt_age_vec(days, cfg_age: dict):
+    d = _as_float(days)
+    thresholds = np.array([cfg_age[f"age_{p}"] for p in AGE_POINTS], dtype=float)
+    nan = np.isnan(d)
+    conds = [nan] + [d <= t for t in thresholds]
+    choices = [5.0] + [float(p) for p in AGE_POINTS]
+    # خصم بالسالب لكل 30 يوم بعد حد النقطتين (مقربًا لمنزلتين)
+    with np.errstate(invalid="ignore"):
+        penalty = -_round_py((d - thresholds[-1]) / 30)
+    out = np.select(conds, choices, default=penalty)
+    if np.all(np.mod(out, 1) == 0):
+        out = out.astype(np.int64)
+    return _wrap(out, days)
+
+
+def risk_ratio_vec(amount, avg_payment):
+    """المديونية ÷ متوسط السداد (NaN => 0 في البسط والمقام، والمقام 0 => NaN)."""
+    a = np.nan_to_num(_as_float(amount), nan=0.0)
+    b = np.nan_to_num(_as_float(avg_payment), nan=0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(b != 0, a / np.where(b != 0, b, 1.0), np.nan)
+    return _wrap(ratio, amount)
+
+
+def score_risk_vec(amount, avg_payment, cfg_risk: dict):
+    ratio = np.asarray(risk_ratio_vec(amount, avg_payment), dtype=float)
+    thresholds = [cfg_risk[f"r_{p}"] for p in [5, 4, 3, 2, 1]]
+    conds = [ratio <= t for t in thresholds] + [ratio <= t for t, _ in RISK_FIXED_BANDS]
+    choices = RISK_POINTS + [p for _, p in RISK_FIXED_BANDS]
+    # مقام 0 => NaN => لا يطابق أي شريحة => 0
+    out = np.select(conds, choices, default=0).astype(np.int64)
+    return _wrap(out, amount)
+
+
+def final_classification_vec(score, cfg_final: dict):
+    s = _as_float(score)
+    thresholds = [
+        cfg_final["motazem"], cfg_final["jayed"],
+        cfg_final["fix_cap"], cfg_final["reduce"], 8,
+    ]
+    conds = [s >= t for t in thresholds]
+    out = np.select(conds, FINAL_LABELS, default=FINAL_DEFAULT).astype(object)
+    return _wrap(out, score)
+
+
+def treatment_plan_vec(class_names, pp_points, avg_q, debt, installment, lost_points, cfg_plan: dict) -> pd.DataFrame:
+    """أهداف خطة المعالجة (أساس/مبيعات/بعد المعالجة) بجدول مضاعفات حسب التصنيف."""
+    classes = pd.Series(class_names)
+    rules = cfg_plan["rules"]
+    # تصنيف غير معروف => (0، 0) كما في الفرع الأخير من القواعد
+    # astype(float) قبل fillna: التصنيف قد يكون category والناتج category أيضًا
+    pay_mult = classes.map({k: v["pay"] for k, v in rules.items()}).astype(float).fillna(0.0).to_numpy()
+    sales_mult = classes.map({k: v["sales"] for k, v in rules.items()}).astype(float).fillna(0.0).to_numpy()
+
+    avg = _as_float(avg_q)
+    d = _as_float(debt)
+    pwr = np.nan_to_num(_as_float(pp_points), nan=0.0)
+    below = pwr < cfg_plan["min_pp"]
+
+    # تحت حد القوة الشرائية: السداد = المديونية والمبيعات = المتوسط (بدون تقريب)
+    pay_base = np.where(below, d, _round_py(avg * pay_mult))
+    sales = np.where(below, avg, _round_py(avg * sales_mult))
+
+    extra = np.where(np.asarray(lost_points, dtype=bool), _as_float(installment), 0.0)
+    pay_final = _round_py(pay_base + extra)
+
+    return pd.DataFrame({
+        "هدف السداد الشهري (أساس)": pay_base,
+        "هدف المبيعات الشهري": sales,
+        "هدف السداد الشهري (بعد المعالجة)": pay_final,
+    }, index=classes.index)
+
+
+# ================= تجميع المندوب × التصنيف =================
+REP_CLASS_ROW_COLS = [
+    "نسبة المندوب من فئة العميل (بالعدد %)",
+    "نسبة المندوب من فئة العميل (بالمديونية %)",
+    "إجمالي مديونية المندوب",
+    "مديونية المندوب ضمن هذه الفئة",
+    "نسبة الفئة داخل مديونية المندوب (%)",
+]
+
+
+def rep_class_matrix(df: pd.DataFrame, rep_col: str, class_col: str, debt_col: str) -> pd.DataFrame:
+    """مصفوفة (مندوب، تصنيف): العدد والمديونية ونسب المندوب داخل الفئة ونسبة الفئة داخل مديونية المندوب."""
+    return rep_class_ratios(rep_class_sums(df, rep_col, class_col, debt_col))
+
+
+def rep_class_sums(df: pd.DataFrame, rep_col: str, class_col: str, debt_col: str) -> pd.DataFrame:
+    """العدد والمديونية لكل (مندوب، تصنيف) — قابلة للجمع بين دفعات الملف."""
+    return df.groupby([rep_col, class_col]).agg(
+        عدد=(debt_col, "size"),
+        مديونية=(debt_col, "sum"),
+    )
+
+
+def rep_class_ratios(m: pd.DataFrame) -> pd.DataFrame:
+    """إضافة النسب إلى ناتج rep_class_sums (بعد جمع الدفعات إن وُجدت)."""
+    m = m.copy()
+    m["نسبة المندوب من فئة العميل (بالعدد %)"] = (
+        m["عدد"] / m["عدد"].groupby(level=1).transform("sum") * 100
+    ).round(2)
+    m["نسبة المندوب من فئة العميل (بالمديونية %)"] = (
+        m["مديونية"] / m["مديونية"].groupby(level=1).transform("sum") * 100
+    ).round(2)
+    m["إجمالي مديونية المندوب"] = m["مديونية"].groupby(level=0).transform("sum")
+    m["مديونية المندوب ضمن هذه الفئة"] = m["مديونية"]
+    m["نسبة الفئة داخل مديونية المندوب (%)"] = np.where(
+        m["إجمالي مديونية المندوب"] > 0,
+        m["مديونية"] / m["إجمالي مديونية المندوب"] * 100,
+        np.nan
+    ).round(2)
+    return m
+
+
+def rep_class_row_columns(df: pd.DataFrame, matrix: pd.DataFrame, rep_col: str, class_col: str) -> pd.DataFrame:
+    """نشر أعمدة المصفوفة على صفوف العملاء بنفس الترتيب (مندوب فارغ => NaN)."""
+    keys = pd.MultiIndex.from_arrays([df[rep_col], df[class_col]])
+    rows = matrix[REP_CLASS_ROW_COLS].reindex(keys)
+    rows.index = df.index
+    return rows
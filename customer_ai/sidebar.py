@@ -0,0 +1,318 @@
+import streamlit as st
+import pandas as pd
+
+from .utils import normalize
+from .cache import StageCache, content_hash, config_hash
+from .disk_cache import ParsedFileCache
+from .profiles import MappingProfiles
+from .columns import read_table, read_header
+from .scoring import DEFAULT_CONFIG, PLAN_DEFAULTS
+from .pipeline import StageTimer
+from .incremental import SnapshotStore, detect_id_column
+
+
+@st.cache_resource
+def get_stage_cache() -> StageCache:
+    """ذاكرة نتائج المراحل المشتركة بين إعادة التشغيل (المفاتيح ببصمة المحتوى)."""
+    return StageCache(max_entries=64)
+
+
+@st.cache_resource
+def get_parsed_cache() -> ParsedFileCache:
+    """ذاكرة القرص للملفات المقروءة (تبقى بين الجلسات)."""
+    return ParsedFileCache()
+
+
+@st.cache_resource
+def get_mapping_profiles() -> MappingProfiles:
+    """تعيينات الأعمدة المحفوظة حسب شكل الملف (تبقى بين الجلسات)."""
+    return MappingProfiles()
+
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    """آخر لقطة لكل شكل ملف للمقارنة مع الرفع التالي (تبقى بين الجلسات)."""
+    return SnapshotStore()
+
+
+def saved_mapping(header: pd.DataFrame) -> dict | None:
+    """التعيين المحفوظ لعناوين هذا الملف بنفس شكل detect_columns (None إذا لم يوجد)."""
+    saved = get_mapping_profiles().get(header.columns)
+    if saved is None:
+        return None
+    return {"debt": saved["debt"], "avgq": saved["avgq"], "age": saved["age"], "high": saved["high_avgq"]}
+
+
+def read_uploaded_file(uploaded_file, usecols=None, numeric=None):
+    """قراءة ملف CSV أو Excel بأمان"""
+    try:
+        return read_table(uploaded_file, uploaded_file.name, usecols=usecols, numeric=numeric)
+    except Exception as e:
+        st.error(f"تعذر قراءة الملف: {e}")
+        st.stop()
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [normalize(c) for c in df.columns]
+    return df
+
+
+def _read_normalized(uploaded_file, usecols=None, numeric=None, timer: StageTimer | None = None) -> pd.DataFrame:
+    timer = timer or StageTimer()
+    df = timer.run("read", read_uploaded_file, uploaded_file, usecols=usecols, numeric=numeric)
+    return timer.run("normalize", _normalize_columns, df)
+
+
+def _read_header_frame(uploaded_file) -> pd.DataFrame:
+    try:
+        header = read_header(uploaded_file, uploaded_file.name)
+    except Exception as e:
+        st.error(f"تعذر قراءة الملف: {e}")
+        st.stop()
+    return pd.DataFrame(columns=[normalize(c) for c in header])
+
+
+def load_uploaded_header(uploaded_file, cache: StageCache, timer: StageTimer | None = None) -> tuple:
+    """
+    قراءة صف العناوين فقط: يرجع (بصمة المحتوى، DataFrame فارغ بأسماء الأعمدة المطبّعة)
+    يكفي لاكتشاف الأعمدة وتعيينها قبل تحميل البيانات.
+    """
+    timer = timer or StageTimer()
+    file_key = content_hash(uploaded_file.getvalue())
+    header = cache.get_or_compute((file_key, "header"), timer.run, "read_header", _read_header_frame, uploaded_file)
+    return file_key, header
+
+
+def load_uploaded_file(uploaded_file, cache: StageCache, file_key: str, usecols=None, numeric=None,
+                       disk: ParsedFileCache | None = None, timer: StageTimer | None = None) -> tuple:
+    """
+    قراءة الملف مرة واحدة لكل (محتوى، أعمدة مطلوبة): يرجع (مفتاح البيانات، df بأسماء أعمدة مطبّعة).
+    usecols=None يقرأ كل الأعمدة. مفتاح البيانات يُمرّر إلى run_pipeline ويميّز القراءة الجزئية
+    عن الكاملة لنفس الملف. الإطار المرجع مشترك مع الذاكرة المؤقتة فلا يُعدّل.
+    مع disk يُحفظ الإطار المقروء على القرص فتُحمّل الجلسات اللاحقة نفس الملف بدون إعادة تحليله.
+    timer يسجل القراءة والتطبيع (عند الحساب فعلًا فقط) وتحميل ذاكرة القرص.
+    """
+    data_key = file_key if usecols is None else f"{file_key}:{config_hash([usecols, numeric])}"
+    timer = timer or StageTimer()
+    if disk is None:
+        df = cache.get_or_compute((data_key, "read"), _read_normalized, uploaded_file, usecols, numeric, timer)
+    else:
+        df = cache.get_or_compute(
+            (data_key, "read"), timer.run, "disk_cache", disk.get_or_parse,
+            data_key, _read_normalized, uploaded_file, usecols, numeric, timer,
+        )
+    return data_key, df
+
+
+def sidebar_column_mapping(df: pd.DataFrame, detected: dict, from_profile: bool = False) -> dict:
+    """
+    اختيار الأعمدة من الشريط الجانبي (القيم الافتراضية من الاكتشاف أو من تعيين محفوظ)،
+    مع حفظ التعيين لملفات بنفس العناوين.
+    """
+    st.sidebar.subheader("🧭 تعيين الأعمدة يدويًا (إن لزم)")
+    if from_profile:
+        st.sidebar.caption("✅ تم تطبيق تعيين محفوظ لملفات بنفس الأعمدة.")
+    cols = list(df.columns)
+
+    def idx(name):
+        return cols.index(name) if name in cols else 0
+
+    col_debt = st.sidebar.selectbox(
+        "عمود المديونية",
+        cols,
+        index=idx(detected["debt"]) if detected["debt"] else 0
+    )
+
+    col_avgq = st.sidebar.selectbox(
+        "عمود متوسط السداد الربعي",
+        cols,
+        index=idx(detected["avgq"]) if detected["avgq"] else 0
+    )
+
+    col_age_opt = ["— (بدون) —"] + cols
+    col_age = st.sidebar.selectbox(
+        "عمود عمر المديونية (اختياري)",
+        col_age_opt,
+        index=(1 + idx(detected["age"])) if detected["age"] else 0
+    )
+    if col_age == "— (بدون) —":
+        col_age = None
+
+    col_high_opt = ["— (غير مستخدم) —"] + cols
+    col_high = st.sidebar.selectbox(
+        "عمود أعلى متوسط السداد الربعي (للفارق)",
+        col_high_opt,
+        index=(1 + idx(detected["high"])) if detected["high"] else 0
+    )
+    if col_high == "— (غير مستخدم) —":
+        col_high = None
+
+    mapping = {
+        "debt": col_debt,
+        "avgq": col_avgq,
+        "age": col_age,
+        "high_avgq": col_high,
+    }
+
+    profiles = get_mapping_profiles()
+    c1, c2 = st.sidebar.columns(2)
+    if c1.button("💾 حفظ التعيين", help="يُطبق تلقائيًا على أي ملف لاحق بنفس العناوين"):
+        profiles.save(df.columns, mapping)
+        st.sidebar.success("تم حفظ التعيين لهذا الشكل من الملفات.")
+    if from_profile and c2.button("🗑️ نسيان التعيين"):
+        profiles.delete(df.columns)
+        st.rerun()
+    return mapping
+
+
+def sidebar_incremental(df: pd.DataFrame) -> str | None:
+    """تفعيل المقارنة مع الرفع السابق بمفتاح رقم العميل؛ يرجع عمود المفتاح أو None."""
+    cols = list(df.columns)
+    detected = detect_id_column(cols)
+    enabled = st.sidebar.toggle(
+        "🔁 مقارنة مع الرفع السابق (بمفتاح رقم العميل)", value=False,
+        help="يُعاد تصنيف العملاء الجدد أو الذين تغير صفهم فقط، مع مصفوفة انتقال التصنيفات عن الملف السابق."
+    )
+    if not enabled:
+        return None
+    return st.sidebar.selectbox(
+        "عمود رقم العميل", cols, index=cols.index(detected) if detected else 0, key="incremental_id_col"
+    )
+
+
+# ================= إعدادات الشريط الجانبي =================
+# قيم مقترحة (مثل معايرة الحدود) تُكتب في عناصر الشريط الجانبي قبل رسمها في التشغيل التالي
+PENDING_CONFIG_KEY = "pending_config"
+
+
+def _config_key(section: str, key: str) -> str:
+    return f"cfg_{section}_{key}"
+
+
+def _config_state(section: str, key: str) -> str:
+    """
+    مفتاح العنصر بعد وضع قيمته الافتراضية في session_state إن لم تكن فيه (مرة واحدة)،
+    فيبقى رقميًا (بدون value=None الذي يسمح بمسح الخانة) ويقبل القيم المقترحة.
+    """
+    state_key = _config_key(section, key)
+    if state_key not in st.session_state:
+        st.session_state[state_key] = DEFAULT_CONFIG[section][key]
+    return state_key
+
+
+def apply_config(config: dict, sections=("risk", "final")):
+    """كتابة أقسام من إعدادات بنفس شكل build_config_from_sidebar في الشريط الجانبي (بعد st.rerun)."""
+    st.session_state[PENDING_CONFIG_KEY] = {sec: dict(config[sec]) for sec in sections}
+
+
+def build_config_from_sidebar(batch: bool = False) -> dict:
+    """
+    عناصر الإعدادات في الشريط الجانبي. مع batch=True توضع داخل نموذج بزر تطبيق،
+    فتُجمع عدة تعديلات ولا يعاد الحساب إلا عند الضغط على الزر.
+    """
+    d = DEFAULT_CONFIG
+    for section, values in st.session_state.pop(PENDING_CONFIG_KEY, {}).items():
+        for key, value in values.items():
+            st.session_state[_config_key(section, key)] = value
+    container = st.sidebar.form("config_form") if batch else st.sidebar
+
+    with container:
+        # ---- نقاط القوة الشرائية ----
+        with st.expander("نقاط القوة الشرائية (النسبة من القائد)", expanded=False):
+            st.info("جدول النقاط يعتمد على حدود دنيا لكل مستوى.")
+            pp_10 = st.number_input("حد أدنى % للحصول على 10 نقاط", value=d["pp"]["pp_10"], step=0.1)
+            pp_8  = st.number_input("حد أدنى % للحصول على 8 نقاط",  value=d["pp"]["pp_8"], step=0.1)
+            pp_7  = st.number_input("حد أدنى % للحصول على 7 نقاط",  value=d["pp"]["pp_7"], step=0.1)
+            pp_6  = st.number_input("حد أدنى % للحصول على 6 نقاط",  value=d["pp"]["pp_6"], step=0.1)
+            pp_5  = st.number_input("حد أدنى % للحصول على 5 نقاط",  value=d["pp"]["pp_5"],  step=0.1)
+            pp_4  = st.number_input("حد أدنى % للحصول على 4 نقاط",  value=d["pp"]["pp_4"],  step=0.1)
+            pp_3  = st.number_input("حد أدنى % للحصول على 3 نقاط",  value=d["pp"]["pp_3"],  step=0.1)
+            pp_2  = st.number_input("حد أدنى % للحصول على 2 نقاط",  value=d["pp"]["pp_2"],  step=0.1)
+            pp_1  = st.number_input("حد أدنى % للحصول على 1 نقطة",   value=d["pp"]["pp_1"],  step=0.1)
+
+        # ---- نقاط الالتزام (عمر المديونية) ----
+        with st.expander("نقاط الالتزام (عمر المديونية)", expanded=False):
+            st.info("خصم تلقائي بالسالب لما بعد 60 يوم على شكل شرائح كل 30 يوم.")
+            age_5 = st.number_input("≤ هذا العدد من الأيام = 5 نقاط", value=d["age"]["age_5"], step=1)
+            age_4 = st.number_input("≤ هذا العدد من الأيام = 4 نقاط", value=d["age"]["age_4"], step=1)
+            age_3 = st.number_input("≤ هذا العدد من الأيام = 3 نقاط", value=d["age"]["age_3"], step=1)
+            age_2 = st.number_input("≤ هذا العدد من الأيام = 2 نقاط", value=d["age"]["age_2"], step=1)
+
+        # ---- نقاط المخاطرة ----
+        with st.expander("نقاط المخاطرة (المديونية ÷ متوسط السداد الربعي)", expanded=False):
+            st.info("يشمل نقاطًا سالبة إذا ارتفع المؤشر.")
+            r_5 = st.number_input("≤ هذا المؤشر = 5 نقاط", step=0.1, format="%.2f", key=_config_state("risk", "r_5"))
+            r_4 = st.number_input("≤ هذا المؤشر = 4 نقاط", step=0.1, format="%.2f", key=_config_state("risk", "r_4"))
+            r_3 = st.number_input("≤ هذا المؤشر = 3 نقاط", step=0.1, format="%.2f", key=_config_state("risk", "r_3"))
+            r_2 = st.number_input("≤ هذا المؤشر = 2 نقاط", step=0.1, format="%.2f", key=_config_state("risk", "r_2"))
+            r_1 = st.number_input("≤ هذا المؤشر = 1 نقطة", step=0.1, format="%.2f", key=_config_state("risk", "r_1"))
+
+        # ---- إعدادات الفارق ----
+        with st.expander("إعدادات أعمدة الفارق المبسطة", expanded=False):
+            snap_to_int = st.checkbox("تقريب فئة الفارق (نقاط) إلى أقرب عدد صحيح", value=d["delta"]["snap_to_int"])
+            decimals_pct = st.number_input("عدد المنازل العشرية لفئة نسبة الفارق %", value=d["delta"]["decimals_pct"], step=1, min_value=0, max_value=4)
+            mag_mid = st.number_input("شدة الفارق: أقل من هذا % = خفيف", value=d["delta"]["mag_mid"], step=1.0, min_value=0.0)
+            mag_strong = st.number_input("شدة الفارق: أقل من هذا % = متوسط (وما فوقه قوي)", value=d["delta"]["mag_strong"], step=1.0, min_value=0.0)
+
+        # ---- حدود تصنيف المرتجع ----
+        with st.expander("حدود تصنيف المرتجع (المضاعف مقابل المعيار)", expanded=False):
+            m_ok     = st.number_input("≤ هذا المضاعف = ضمن المعيار", value=d["returns"]["m_ok"], step=0.1, format="%.2f")
+            m_watch  = st.number_input("≤ هذا المضاعف = يحتاج متابعة", value=d["returns"]["m_watch"], step=0.1, format="%.2f")
+            m_high   = st.number_input("≤ هذا المضاعف = مرتفع", value=d["returns"]["m_high"], step=0.1, format="%.2f")
+
+        # ---- التصنيف النهائي ----
+        with st.expander("التصنيف النهائي (حسب مجموع النقاط)", expanded=False):
+            st.info("يشمل مستوى جديد: 8–9.9 = قبل النهاية.")
+            final_motazem_min = st.number_input("≥ هذا المجموع = ملتزم", step=0.5, key=_config_state("final", "motazem"))
+            final_jayed_min   = st.number_input("≥ هذا المجموع = جيد", step=0.5, key=_config_state("final", "jayed"))
+            final_fix_cap_min = st.number_input("≥ هذا المجموع = جدولة + تثبيت السقف", step=0.1, key=_config_state("final", "fix_cap"))
+            final_reduce_min  = st.number_input("≥ هذا المجموع = جدولة + تخفيف", step=0.1, key=_config_state("final", "reduce"))
+
+        # ---- قواعد خطة المعالجة ----
+        with st.expander("قواعد خطة المعالجة (مضاعفات متوسط السداد)", expanded=False):
+            st.info("الهدف الشهري = متوسط السداد × المضاعف حسب التصنيف. تحت حد القوة الشرائية: السداد = المديونية والمبيعات = المتوسط.")
+            plan_min_pp = st.number_input("أقل نقاط قوة شرائية لتطبيق المضاعفات", value=d["plan"]["min_pp"], step=1)
+            plan_rules = {}
+            for label in PLAN_DEFAULTS:
+                rule = d["plan"]["rules"][label]
+                plan_rules[label] = {
+                    "pay": st.number_input(f"مضاعف السداد — {label}", value=rule["pay"], step=0.05, format="%.2f"),
+                    "sales": st.number_input(f"مضاعف المبيعات — {label}", value=rule["sales"], step=0.05, format="%.2f"),
+                }
+
+        if batch:
+            st.form_submit_button("✅ تطبيق الإعدادات")
+
+    return {
+        "pp": {
+            "pp_10": pp_10, "pp_8": pp_8, "pp_7": pp_7,
+            "pp_6": pp_6, "pp_5": pp_5, "pp_4": pp_4,
+            "pp_3": pp_3, "pp_2": pp_2, "pp_1": pp_1
+        },
+        "age": {
+            "age_5": age_5, "age_4": age_4,
+            "age_3": age_3, "age_2": age_2
+        },
+        "risk": {
+            "r_5": r_5, "r_4": r_4,
+            "r_3": r_3, "r_2": r_2, "r_1": r_1
+        },
+        "delta": {
+            "snap_to_int": snap_to_int,
+            "decimals_pct": int(decimals_pct),
+            "mag_mid": mag_mid, "mag_strong": mag_strong
+        },
+        "returns": {
+            "m_ok": m_ok, "m_watch": m_watch, "m_high": m_high
+        },
+        "final": {
+            "motazem": final_motazem_min,
+            "jayed": final_jayed_min,
+            "fix_cap": final_fix_cap_min,
+            "reduce": final_reduce_min
+        },
+        "plan": {
+            "min_pp": plan_min_pp,
+            "rules": plan_rules
+        }
+    }
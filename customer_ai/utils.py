@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def normalize(name: str) -> str:
@@ -7,45 +8,106 @@ def normalize(name: str) -> str:
 def to_numeric(s):
     return pd.to_numeric(s, errors="coerce")
 
+# جدول تحويل الأرقام العربية والفواصل (يُبنى مرة واحدة)
+_NUMBER_TRANS = str.maketrans({
+    '٠': '0', '١': '1', '٢': '2', '٣': '3',
+    '٤': '4', '٥': '5', '٦': '6', '٧': '7',
+    '٨': '8', '٩': '9',
+    '٬': ',', '،': ',', '٫': '.',
+})
+
 def clean_number(x):
     """تحويل القيم النصية إلى رقم: أرقام عربية، فواصل عربية/إنجليزية، وإزالة %."""
     if pd.isna(x):
         return x
     try:
         s = str(x).strip()
-        trans = {
-            ord('٠'): '0', ord('١'): '1', ord('٢'): '2', ord('٣'): '3',
-            ord('٤'): '4', ord('٥'): '5', ord('٦'): '6', ord('٧'): '7',
-            ord('٨'): '8', ord('٩'): '9',
-            ord('٬'): ',', ord('،'): ',', ord('٫'): '.',
-        }
-        s = s.translate(trans)
+        s = s.translate(_NUMBER_TRANS)
         s = s.replace('%', '')
         s = s.replace(',', '')
         return s
     except Exception:
         return x
 
+def clean_numeric_with_failures(s: pd.Series) -> tuple[pd.Series, int]:
+    """نفس clean_number ثم to_numeric لكن على العمود كاملًا، مع عدد الخلايا التي تعذر تحويلها."""
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s, 0
+    present = s.notna()
+    text = (
+        s[present].astype(str).str.strip()
+        .str.translate(_NUMBER_TRANS)
+        .str.replace('%', '', regex=False)
+        .str.replace(',', '', regex=False)
+    )
+    num = pd.to_numeric(text, errors="coerce")
+    # بالموضع لا بالفهرس (reindex يفشل مع فهرس مكرر مثل إطارات مدمجة)
+    if len(num) == len(s):
+        out = pd.Series(num.to_numpy(), index=s.index, name=s.name)
+    else:
+        values = np.full(len(s), np.nan)
+        values[present.to_numpy()] = num.to_numpy(dtype=float)
+        out = pd.Series(values, index=s.index, name=s.name)
+    failed = int((present & out.isna()).sum())
+    return out, failed
+
+def clean_numeric(s: pd.Series) -> pd.Series:
+    """تنظيف وتحويل عمود كامل إلى رقمي (الأعمدة الرقمية أصلًا تُترك كما هي)."""
+    return clean_numeric_with_failures(s)[0]
+
+def clean_numeric_frame(df: pd.DataFrame, columns) -> dict:
+    """تنظيف عدة أعمدة داخل df مباشرة ويرجع عدد الخلايا الفاشلة لكل عمود."""
+    failures = {}
+    for c in dict.fromkeys(columns):
+        if c is None or c not in df.columns:
+            continue
+        df[c], failures[c] = clean_numeric_with_failures(df[c])
+    return failures
+
+def downcast_int(s: pd.Series) -> pd.Series:
+    """أصغر نوع صحيح يتسع للقيم (int8 للنقاط)؛ الأعمدة غير الصحيحة تُترك كما هي."""
+    if pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+def to_labels(values, categories=None, index=None) -> pd.Series:
+    """عمود نصي متكرر (تصنيفات، ملاحظات، أسماء مندوبين) كـ category: كل نص يُخزن مرة واحدة."""
+    s = values if isinstance(values, pd.Series) else pd.Series(values, index=index)
+    if categories is None:
+        return s.astype("category")
+    return s.astype(pd.CategoricalDtype(categories))
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """حجم df في الذاكرة (ميجابايت) شاملًا النصوص."""
+    return round(df.memory_usage(deep=True).sum() / 2**20, 3)
+
+# جدول تطبيع الحروف للمطابقة (يُبنى مرة واحدة)
+_KEY_TRANS = {
+    ord('آ'): 'ا', ord('أ'): 'ا', ord('إ'): 'ا',
+    ord('ى'): 'ي', ord('ة'): 'ه', ord('ؤ'): 'و', ord('ئ'): 'ي',
+    ord('٠'): '0', ord('١'): '1', ord('٢'): '2', ord('٣'): '3',
+    ord('٤'): '4', ord('٥'): '5', ord('٦'): '6', ord('٧'): '7',
+    ord('٨'): '8', ord('٩'): '9',
+    ord('٬'): ',', ord('،'): ',', ord('٫'): ',',
+    ord('ـ'): '',
+}
+
 def norm_key(s: str) -> str:
     """تطبيع قوي للأسماء العربية لتسهيل المطابقة."""
-    s = normalize(s)
-    trans = {
-        ord('آ'): 'ا', ord('أ'): 'ا', ord('إ'): 'ا',
-        ord('ى'): 'ي', ord('ة'): 'ه', ord('ؤ'): 'و', ord('ئ'): 'ي',
-        ord('٠'): '0', ord('١'): '1', ord('٢'): '2', ord('٣'): '3',
-        ord('٤'): '4', ord('٥'): '5', ord('٦'): '6', ord('٧'): '7',
-        ord('٨'): '8', ord('٩'): '9',
-        ord('٬'): ',', ord('،'): ',', ord('٫'): ',',
-        ord('ـ'): '',
-    }
-    s = s.translate(trans).lower()
+    s = normalize(s).translate(_KEY_TRANS).lower()
     return ''.join(ch for ch in s if ch.isalnum())
 
-def match_col(df: pd.DataFrame, aliases: list[str]) -> str | None:
-    """يرجع اسم العمود الأصلي إذا طابق أي اسم في القائمة بعد التطبيع."""
-    keys = {norm_key(c): c for c in df.columns}
-    for a in aliases:
-        k = norm_key(a)
+def column_keys(columns) -> dict:
+    """{مفتاح مطبع: اسم العمود الأصلي} — يُحسب مرة واحدة لكل عناوين ملف."""
+    return {norm_key(c): c for c in columns}
+
+def match_keys(keys: dict, alias_keys: list[str]) -> str | None:
+    """أول اسم بديل (مطبع مسبقًا) موجود في column_keys."""
+    for k in alias_keys:
         if k in keys:
             return keys[k]
     return None
+
+def match_col(df: pd.DataFrame, aliases: list[str]) -> str | None:
+    """يرجع اسم العمود الأصلي إذا طابق أي اسم في القائمة بعد التطبيع."""
+    return match_keys(column_keys(df.columns), [norm_key(a) for a in aliases])
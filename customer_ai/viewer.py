@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .cache import config_hash
+from .sidebar import get_stage_cache
+from .perf_panel import current_timer
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+# عمود يُعرض كفلتر قيم فقط إذا كانت قيمه المختلفة قليلة (تصنيفات، مندوبين...)
+MAX_FILTER_VALUES = 200
+
+
+# ================= اختيار الصفوف (بدون واجهة) =================
+def select_rows(df: pd.DataFrame, search: str = "", search_columns=None, filters: dict | None = None,
+                sort_by=None, ascending: bool = True) -> np.ndarray:
+    """
+    مواضع الصفوف (iloc) المطابقة للبحث والفلاتر بعد الترتيب.
+    search: نص يُبحث عنه في search_columns، filters: {عمود: [قيم مسموحة]}.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (filters or {}).items():
+        if values and col in df.columns:
+            mask &= df[col].isin(values).to_numpy()
+
+    if search:
+        hit = np.zeros(len(df), dtype=bool)
+        for col in search_columns or df.columns:
+            s = df[col]
+            hit |= s.astype(str).str.contains(search, case=False, regex=False, na=False).to_numpy() & s.notna().to_numpy()
+        mask &= hit
+
+    pos = np.flatnonzero(mask)
+    if sort_by is not None and sort_by in df.columns and len(pos):
+        s = df[sort_by].iloc[pos].reset_index(drop=True)
+        try:
+            order = s.sort_values(ascending=ascending, kind="stable", na_position="last").index
+        except TypeError:  # عمود مختلط (أرقام + نصوص)
+            order = s.sort_values(ascending=ascending, kind="stable", na_position="last", key=lambda x: x.astype(str)).index
+        pos = pos[order.to_numpy()]
+    return pos
+
+
+# ================= العارض =================
+def render_table(df: pd.DataFrame, key: str, frame_key=None, default_columns=None, filter_columns=None):
+    """
+    عرض df صفحةً صفحة: البحث والفلاتر والترتيب على الخادم، ويُرسل للمتصفح صفوف الصفحة الحالية فقط.
+    key: بادئة مفاتيح العناصر (فريدة لكل جدول).
+    frame_key: بصمة df تبدأ بمفتاح البيانات مثل result.keys[...] (لإعادة استخدام نتيجة الفلترة عند التنقل بين الصفحات).
+    default_columns: الأعمدة المعروضة افتراضيًا، filter_columns: أعمدة فلاتر القيم.
+    """
+    all_columns = list(df.columns)
+    defaults = [c for c in (default_columns or all_columns) if c in all_columns] or all_columns
+
+    with st.expander("🔍 البحث والفلاتر والأعمدة", expanded=False):
+        columns = st.multiselect("الأعمدة المعروضة", all_columns, default=defaults, key=f"{key}_cols") or defaults
+
+        search = st.text_input("بحث (في الأعمدة المعروضة)", key=f"{key}_search").strip()
+
+        filters = {}
+        for col in [c for c in (filter_columns or []) if c in all_columns]:
+            values = df[col].dropna().unique()
+            if len(values) <= MAX_FILTER_VALUES:
+                chosen = st.multiselect(f"تصفية: {col}", sorted(values, key=str), key=f"{key}_f_{col}")
+                if chosen:
+                    filters[col] = chosen
+
+        c1, c2, c3 = st.columns(3)
+        sort_by = c1.selectbox("ترتيب حسب", [None] + all_columns, format_func=lambda c: "— بدون —" if c is None else c,
+                               key=f"{key}_sort")
+        ascending = c2.toggle("تصاعدي", value=False, key=f"{key}_asc")
+        page_size = c3.selectbox("صفوف في الصفحة", PAGE_SIZES, index=1, key=f"{key}_size")
+
+    args = (df, search, columns, filters, sort_by, ascending)
+    if frame_key is None:
+        pos = select_rows(*args)
+    else:
+        state = [key, search, columns, {c: list(map(str, v)) for c, v in filters.items()}, sort_by, ascending]
+        cache_key = (frame_key[0], "view", config_hash([frame_key, state]))
+        pos = get_stage_cache().get_or_compute(cache_key, current_timer().run, f"view: {key}", select_rows, *args)
+
+    n_pages = max(1, math.ceil(len(pos) / page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    page = st.number_input("الصفحة", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    st.caption(f"{len(pos):,} صف مطابق من {len(df):,} — صفحة {page} من {n_pages}")
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[pos[start:start + page_size]][columns], use_container_width=True)
@@ -0,0 +1,301 @@
+"""
+محاكاة الحدود (تحليل الحساسية) بدون Streamlit: تصنيف كل العملاء على مئات/آلاف من تركيبات
+حدود pp/age/risk/final دفعة واحدة (مصفوفة عملاء × تركيبات) بدل إعادة التشغيل لكل تعديل.
+"""
+import copy
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .scoring import (
+    score_purchase_power_vec,
+    score_debt_age_vec,
+    score_risk_vec,
+    risk_ratio_vec,
+    RISK_POINTS,
+    RISK_FIXED_BANDS,
+    FINAL_LABELS,
+    FINAL_DEFAULT,
+    DEFAULT_CONFIG,
+)
+
+SWEEP_SECTIONS = ["pp", "age", "risk", "final"]
+# كل حد قابل للمحاكاة بالشكل "القسم.المفتاح" (مثل final.motazem أو risk.r_3)
+SWEEP_PARAMS = [f"{sec}.{key}" for sec in SWEEP_SECTIONS for key in DEFAULT_CONFIG[sec]]
+CLASS_LABELS = FINAL_LABELS + [FINAL_DEFAULT]
+MAX_VARIANTS = 5000
+# حجم دفعة التركيبات: عدد الخلايا (تركيبات × عملاء) في كل دفعة
+BATCH_CELLS = 4_000_000
+
+
+def _get_param(config: dict, name: str):
+    section, key = name.split(".", 1)
+    return config[section][key]
+
+
+def threshold_grid(base_config: dict, ranges: dict) -> list:
+    """
+    كل تركيبات القيم (حاصل ضرب ديكارتي) فوق base_config.
+    ranges: {"final.motazem": [15, 16, 17], "risk.r_3": [1.8, 2.0]} => 6 تركيبات.
+    يرجع [(قيم الحدود المتغيرة {الاسم: القيمة}، config)].
+    """
+    unknown = [n for n in ranges if n not in SWEEP_PARAMS]
+    if unknown:
+        raise ValueError(f"حدود غير معروفة: {unknown}")
+    names = list(ranges)
+    total = int(np.prod([len(ranges[n]) for n in names])) if names else 0
+    if total > MAX_VARIANTS:
+        raise ValueError(f"عدد التركيبات {total:,} أكبر من الحد {MAX_VARIANTS:,}")
+
+    variants = []
+    for values in itertools.product(*(ranges[n] for n in names)):
+        cfg = copy.deepcopy(base_config)
+        for n, v in zip(names, values):
+            section, key = n.split(".", 1)
+            cfg[section][key] = v
+        variants.append((dict(zip(names, values)), cfg))
+    return variants
+
+
+def _unique_points(score_fn, configs: list, section: str, *args) -> tuple:
+    """
+    نقاط مكوّن واحد لكل إعدادات مختلفة فقط (التركيبات تتشارك غالبًا نفس إعدادات القسم):
+    يرجع (مصفوفة نقاط لكل إعداد فريد، رقم الإعداد الفريد لكل تركيبة).
+    """
+    keys, rows, index = {}, [], []
+    for cfg in configs:
+        k = tuple(sorted(cfg[section].items()))
+        if k not in keys:
+            keys[k] = len(rows)
+            rows.append(np.asarray(score_fn(*args, cfg[section]), dtype=float))
+        index.append(keys[k])
+    return np.vstack(rows), np.array(index)
+
+
+def classify_batch(total: np.ndarray, finals: list) -> np.ndarray:
+    """
+    رموز التصنيف (موضع في CLASS_LABELS) لمصفوفة مجاميع (تركيبات × عملاء)، بحدود final لكل تركيبة.
+    نفس final_classification_vec: أول حد يتحقق بالترتيب.
+    """
+    bounds = np.array([[f["motazem"], f["jayed"], f["fix_cap"], f["reduce"], 8] for f in finals], dtype=float)
+    codes = np.full(total.shape, len(FINAL_LABELS), dtype=np.int8)
+    for j in range(bounds.shape[1] - 1, -1, -1):
+        codes[total >= bounds[:, j:j + 1]] = j
+    return codes
+
+
+def sweep_thresholds(scored: pd.DataFrame, cols: dict, base_config: dict, variants: list) -> pd.DataFrame:
+    """
+    تصنيف العملاء على كل التركيبات: صف لكل تركيبة فيه قيم حدودها المتغيرة، وعدد العملاء
+    ونسبة المديونية لكل تصنيف، وعدد العملاء (ونسبة المديونية) الذين تغير تصنيفهم عن base_config.
+    scored: ناتج خط المعالجة (أعمدة المديونية/المتوسط/العمر منظفة).
+    variants: ناتج threshold_grid.
+    """
+    debt = scored[cols["debt"]].to_numpy(dtype=float)
+    avg = scored[cols["avgq"]].to_numpy(dtype=float)
+    age = scored[cols["age"]].to_numpy(dtype=float) if cols["age"] and cols["age"] in scored.columns else None
+
+    # نفس مدخلات pp_block: النسبة من القائد مقربة لمنزلتين
+    max_avg = np.nanmax(avg) if np.isfinite(avg).any() else np.nan
+    pct = np.round(avg / max_avg * 100, 2) if max_avg > 0 else np.full(len(avg), np.nan)
+
+    configs = [base_config] + [cfg for _, cfg in variants]
+    pp, pp_i = _unique_points(score_purchase_power_vec, configs, "pp", pct)
+    risk, risk_i = _unique_points(score_risk_vec, configs, "risk", debt, avg)
+    if age is None:
+        ages, age_i = np.zeros((1, len(debt))), np.zeros(len(configs), dtype=int)
+    else:
+        ages, age_i = _unique_points(score_debt_age_vec, configs, "age", age)
+
+    debt0 = np.nan_to_num(debt, nan=0.0)
+    total_debt = debt0.sum()
+    finals = [cfg["final"] for cfg in configs]
+    base_codes = classify_batch(pp[pp_i[:1]] + ages[age_i[:1]] + risk[risk_i[:1]], finals[:1])[0]
+
+    n_classes = len(CLASS_LABELS)
+    counts = np.zeros((len(configs), n_classes), dtype=np.int64)
+    class_debt = np.zeros((len(configs), n_classes))
+    moved = np.zeros(len(configs), dtype=np.int64)
+    moved_debt = np.zeros(len(configs))
+
+    step = max(1, BATCH_CELLS // max(len(debt), 1))
+    for start in range(0, len(configs), step):
+        sl = slice(start, start + step)
+        total = pp[pp_i[sl]] + ages[age_i[sl]] + risk[risk_i[sl]]
+        codes = classify_batch(total, finals[sl])
+        for k in range(n_classes):
+            mask = codes == k
+            counts[sl, k] = mask.sum(axis=1)
+            class_debt[sl, k] = mask @ debt0
+        changed = codes != base_codes
+        moved[sl] = changed.sum(axis=1)
+        moved_debt[sl] = changed @ debt0
+
+    share = class_debt / total_debt * 100 if total_debt else np.zeros_like(class_debt)
+    table = pd.DataFrame(
+        [{"التركيبة": "الحالية"}] + [{"التركيبة": str(i)} for i in range(1, len(configs))]
+    )
+    params = pd.DataFrame([{}] + [values for values, _ in variants], index=table.index)
+    for name in params.columns:
+        params.loc[0, name] = _get_param(base_config, name)
+    out = [table, params]
+    out.append(pd.DataFrame(counts, columns=[f"عدد: {c}" for c in CLASS_LABELS]))
+    out.append(pd.DataFrame(share.round(2), columns=[f"% مديونية: {c}" for c in CLASS_LABELS]))
+    out.append(pd.DataFrame({
+        "عملاء تغير تصنيفهم": moved,
+        "% مديونية تغير تصنيفها": (moved_debt / total_debt * 100).round(2) if total_debt else 0.0,
+    }))
+    return pd.concat(out, axis=1)
+
+
+# ================= معايرة الحدود لأهداف النسب =================
+CALIBRATE_BASES = {"debt": "بالمديونية", "count": "بالعدد"}
+FINAL_CUTS = ["motazem", "jayed", "fix_cap", "reduce"]
+# حد "قبل النهاية" الثابت في final_classification_vec: ما تحته = عميل غير مجدي
+FINAL_FLOOR = 8
+
+
+def _weights(scored: pd.DataFrame, cols: dict, basis: str) -> np.ndarray:
+    if basis == "count":
+        return np.ones(len(scored))
+    return np.nan_to_num(scored[cols["debt"]].to_numpy(dtype=float), nan=0.0)
+
+
+def _class_shares(codes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    total = weights.sum()
+    sums = np.bincount(codes, weights=weights, minlength=len(CLASS_LABELS))
+    return sums / total * 100 if total else np.zeros(len(CLASS_LABELS))
+
+
+def _clean_cut(value: float) -> float:
+    """الحد بمنزلتين إن لم يُخرج صاحب القيمة نفسها (أخطاء الجمع العشري)."""
+    r = round(float(value), 2)
+    return r if r <= value else float(value)
+
+
+def risk_scale_for_floor(fixed_points: np.ndarray, ratio: np.ndarray, weights: np.ndarray,
+                         cfg_risk: dict, min_share: float) -> float:
+    """
+    أصغر معامل λ لشرائح المخاطرة (r_k × λ) يجعل نسبة (min_share %) على الأقل من الأوزان
+    بمجموع ≥ FINAL_FLOOR. لكل عميل أصغر λ يوصله للحد (نقاط المخاطرة لا تنقص بزيادة λ)،
+    ثم ترتيب هذه القيم وبحث ثنائي في مجموعها التراكمي => O(n log n).
+    يرجع inf إذا كان الهدف غير ممكن بتحريك الشرائح وحدها.
+    """
+    need = FINAL_FLOOR - fixed_points
+    thresholds = np.array([cfg_risk[f"r_{p}"] for p in [5, 4, 3, 2, 1]], dtype=float)
+    # نقاط العميل عندما λ → 0: نسبة ≤ 0 تطابق أول شريحة، والباقي للشرائح الثابتة (NaN => 0)
+    low = np.select(
+        [ratio <= 0] + [ratio <= t for t, _ in RISK_FIXED_BANDS],
+        [RISK_POINTS[0]] + [p for _, p in RISK_FIXED_BANDS],
+        default=0,
+    )
+
+    # أبعد شريحة تكفي نقاطها، وλ الذي يدخل العميل فيها = النسبة ÷ حدها
+    k = (np.array(RISK_POINTS)[None, :] >= need[:, None]).sum(axis=1) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lam = np.where(k >= 0, ratio / thresholds[np.clip(k, 0, None)], np.inf)
+    lam = np.where(np.isnan(lam), np.inf, lam)
+    lam = np.where(low >= need, 0.0, lam)
+
+    w = np.clip(weights, 0, None)
+    order = np.argsort(lam, kind="stable")
+    cum = np.cumsum(w[order])
+    goal = min_share / 100 * cum[-1] if len(cum) else 0.0
+    i = np.searchsorted(cum, goal * (1 - 1e-12))
+    return float(lam[order][i]) if i < len(order) else np.inf
+
+
+def final_cuts_for_shares(total: np.ndarray, weights: np.ndarray, cfg_final: dict, targets: dict) -> dict:
+    """
+    حدود final لأقرب توزيع للأهداف (% لكل تصنيف من الأعلى للأسفل).
+    المجموع مرتب تنازليًا مع المجموع التراكمي للأوزان، ولكل حد بحث ثنائي عن أقرب نسبة تراكمية
+    (حصة التصنيف + ما تحقق فعلًا للتصنيفات الأعلى). تصنيف بدون هدف يبقى حده الحالي.
+    """
+    order = np.argsort(-total, kind="stable")
+    ts = total[order]
+    w = np.clip(weights, 0, None)[order]
+    w_total = w.sum()
+    if not len(ts) or not w_total:
+        return dict(cfg_final)
+    cum = np.cumsum(w) / w_total * 100
+    ends = np.flatnonzero(np.r_[ts[1:] != ts[:-1], True])
+    # أول خيار: حد فوق أعلى مجموع (تصنيف فارغ)
+    shares = np.r_[0.0, cum[ends]]
+    values = np.r_[np.floor(ts[0]) + 1, ts[ends]]
+
+    cuts, above = {}, 0.0
+    for label, key in zip(CLASS_LABELS, FINAL_CUTS):
+        target = targets.get(label)
+        if target is None or pd.isna(target):
+            j = np.searchsorted(-values, -cfg_final[key], side="right") - 1
+            cuts[key] = cfg_final[key]
+        else:
+            goal = above + float(target)
+            j = int(np.clip(np.searchsorted(shares, goal), 1, len(shares) - 1))
+            if abs(shares[j - 1] - goal) <= abs(shares[j] - goal):
+                j -= 1
+            cuts[key] = _clean_cut(values[j])
+        above = shares[max(j, 0)]
+    # الحدود غير متزايدة (حد أعلى = تصنيف أعلى)
+    for a, b in zip(FINAL_CUTS, FINAL_CUTS[1:]):
+        cuts[b] = min(cuts[b], cuts[a])
+    return cuts
+
+
+def calibrate_thresholds(scored: pd.DataFrame, cols: dict, config: dict, targets: dict,
+                         basis: str = "debt", calibrate_risk: bool = False) -> dict:
+    """
+    اقتراح حدود final (واختياريًا شرائح risk) تحقق نسب مستهدفة لكل تصنيف.
+    targets: {التصنيف: النسبة %}؛ هدف "عميل غير مجدي" = حد أقصى لنسبته، ولا يتحقق إلا بتحريك
+    شرائح المخاطرة (calibrate_risk) لأن حده ثابت عند 8.
+    basis: "debt" (نسبة المديونية) أو "count" (نسبة العملاء).
+    يرجع {"config": إعدادات بنفس شكل build_config_from_sidebar، "report": جدول النسب، "notes": ملاحظات}.
+    """
+    weights = _weights(scored, cols, basis)
+    debt = scored[cols["debt"]].to_numpy(dtype=float)
+    avg = scored[cols["avgq"]].to_numpy(dtype=float)
+    fixed = (
+        scored["نقاط القوة الشرائية"].to_numpy(dtype=float)
+        + scored["نقاط الالتزام"].to_numpy(dtype=float)
+    )
+    current_total = scored["إجمالي النقاط"].to_numpy(dtype=float)
+
+    proposed = copy.deepcopy(config)
+    notes = []
+    floor_target = targets.get(FINAL_DEFAULT)
+    if floor_target is not None and not pd.isna(floor_target):
+        if not calibrate_risk:
+            notes.append(f"هدف '{FINAL_DEFAULT}' يحتاج معايرة شرائح المخاطرة (حده ثابت عند {FINAL_FLOOR}).")
+        else:
+            ratio = np.asarray(risk_ratio_vec(debt, avg), dtype=float)
+            lam = risk_scale_for_floor(fixed, ratio, weights, config["risk"], 100 - float(floor_target))
+            if np.isinf(lam):
+                notes.append(f"لا يمكن الوصول بنسبة '{FINAL_DEFAULT}' إلى {floor_target}% بتحريك شرائح المخاطرة وحدها.")
+            else:
+                # تقريب لأعلى (منزلتان كما في الشريط الجانبي) حتى لا يقل المتحقق عن الهدف
+                proposed["risk"] = {
+                    k: float(np.ceil(round(v * lam * 100, 6)) / 100) for k, v in config["risk"].items()
+                }
+    new_total = fixed + score_risk_vec(debt, avg, proposed["risk"])
+    proposed["final"] = final_cuts_for_shares(new_total, weights, config["final"], targets)
+
+    codes = classify_batch(np.vstack([current_total, new_total]), [config["final"], proposed["final"]])
+    report = pd.DataFrame({
+        "التصنيف": CLASS_LABELS,
+        "المستهدف %": [targets.get(c) for c in CLASS_LABELS],
+        "الحالي %": _class_shares(codes[0], weights).round(2),
+        "المقترح %": _class_shares(codes[1], weights).round(2),
+        "عدد (حالي)": np.bincount(codes[0], minlength=len(CLASS_LABELS)),
+        "عدد (مقترح)": np.bincount(codes[1], minlength=len(CLASS_LABELS)),
+    })
+    return {"config": proposed, "report": report, "notes": notes}
+
+
+def config_changes(old: dict, new: dict, sections=("risk", "final")) -> pd.DataFrame:
+    """الحدود التي تغيرت بين إعدادين: الحد، الحالي، المقترح."""
+    rows = [
+        {"الحد": f"{sec}.{k}", "الحالي": old[sec][k], "المقترح": new[sec][k]}
+        for sec in sections for k in old[sec] if old[sec][k] != new[sec][k]
+    ]
+    return pd.DataFrame(rows, columns=["الحد", "الحالي", "المقترح"])
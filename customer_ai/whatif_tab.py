@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .cache import config_hash
+from .downloads import lazy_download_button
+from .perf_panel import current_timer
+from .sidebar import apply_config
+from .viewer import render_table
+from .whatif import (
+    SWEEP_PARAMS,
+    MAX_VARIANTS,
+    CLASS_LABELS,
+    CALIBRATE_BASES,
+    FINAL_CUTS,
+    threshold_grid,
+    sweep_thresholds,
+    calibrate_thresholds,
+    config_changes,
+)
+
+WHATIF_STATE_KEY = "whatif_result"
+CALIBRATE_STATE_KEY = "calibrate_result"
+
+_DEFAULT_RANGES = pd.DataFrame([
+    {"الحد": "final.motazem", "من": 15.0, "إلى": 19.0, "عدد القيم": 5},
+    {"الحد": "final.jayed", "من": 12.0, "إلى": 16.0, "عدد القيم": 5},
+    {"الحد": "risk.r_3", "من": 1.8, "إلى": 2.4, "عدد القيم": 4},
+])
+
+
+def _ranges(edited: pd.DataFrame) -> dict:
+    """{الحد: قائمة قيم} من جدول النطاقات (القيم موزعة بالتساوي من..إلى)."""
+    ranges = {}
+    for row in edited.dropna(subset=["الحد"]).itertuples(index=False):
+        name, lo, hi, n = row
+        if pd.isna(lo):
+            continue
+        hi = lo if pd.isna(hi) else hi
+        n = 1 if pd.isna(n) else max(1, int(n))
+        ranges[name] = [float(v) for v in np.linspace(lo, hi, n).round(4)]
+    return ranges
+
+
+# أهداف المعايرة: التصنيفات التي لها حد في final + عميل غير مجدي (عبر شرائح المخاطرة)
+_DEFAULT_TARGETS = pd.DataFrame({
+    "التصنيف": CLASS_LABELS[:len(FINAL_CUTS)] + CLASS_LABELS[-1:],
+    "الهدف %": [None] * len(FINAL_CUTS) + [20.0],
+})
+
+
+def render_whatif_tab(result):
+    _render_sweep(result)
+    st.divider()
+    _render_calibration(result)
+
+
+def _render_sweep(result):
+    st.subheader("🧪 محاكاة الحدود (تحليل الحساسية)")
+    st.caption(
+        "كل تركيبة من قيم الحدود أدناه تُطبق على كل العملاء دفعة واحدة (بقية الحدود من الشريط الجانبي)، "
+        "مع توزيع التصنيفات ونسبة المديونية لكل تصنيف وعدد العملاء الذين يتغير تصنيفهم."
+    )
+
+    edited = st.data_editor(
+        _DEFAULT_RANGES,
+        num_rows="dynamic",
+        column_config={
+            "الحد": st.column_config.SelectboxColumn(options=SWEEP_PARAMS, required=True),
+            "عدد القيم": st.column_config.NumberColumn(min_value=1, step=1),
+        },
+        key="whatif_ranges",
+        use_container_width=True,
+    )
+    ranges = _ranges(edited)
+    n_variants = int(np.prod([len(v) for v in ranges.values()])) if ranges else 0
+    st.write(f"عدد التركيبات: **{n_variants:,}** (الحد الأقصى {MAX_VARIANTS:,})")
+
+    key = (result.keys["final"][0], "whatif", config_hash([result.keys["final"], ranges]))
+    if ranges and st.button("▶️ تشغيل المحاكاة", key="whatif_run", disabled=n_variants > MAX_VARIANTS):
+        variants = threshold_grid(result.config, ranges)
+        table = current_timer().run("whatif_sweep", sweep_thresholds, result.scored, result.cols, result.config, variants)
+        st.session_state[WHATIF_STATE_KEY] = {"key": key, "table": table}
+
+    state = st.session_state.get(WHATIF_STATE_KEY)
+    if not state or state["key"] != key:
+        return
+
+    table = state["table"]
+    render_table(table, "whatif", frame_key=key)
+    lazy_download_button(
+        "⬇️ تحميل نتائج المحاكاة",
+        key,
+        lambda: table,
+        file_name="محاكاة_الحدود.xlsx",
+    )
+
+
+def _render_calibration(result):
+    st.subheader("🎯 معايرة الحدود لأهداف النسب")
+    st.caption(
+        "اكتب النسبة المستهدفة لكل تصنيف (فارغ = يبقى حده الحالي). هدف 'عميل غير مجدي' حد أقصى لنسبته "
+        "ويتحقق بتكبير/تصغير شرائح المخاطرة بنفس المعامل، لأن حده ثابت عند 8."
+    )
+    targets_df = st.data_editor(
+        _DEFAULT_TARGETS,
+        column_config={
+            "التصنيف": st.column_config.TextColumn(disabled=True),
+            "الهدف %": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=1.0),
+        },
+        hide_index=True,
+        key="calibrate_targets",
+        use_container_width=True,
+    )
+    c1, c2 = st.columns(2)
+    basis = c1.radio(
+        "النسبة", list(CALIBRATE_BASES), format_func=CALIBRATE_BASES.get, horizontal=True, key="calibrate_basis"
+    )
+    calibrate_risk = c2.checkbox("معايرة شرائح المخاطرة أيضًا", value=True, key="calibrate_risk")
+
+    targets = {
+        row["التصنيف"]: float(row["الهدف %"])
+        for row in targets_df.to_dict("records") if pd.notna(row["الهدف %"])
+    }
+    key = config_hash([result.keys["final"], targets, basis, calibrate_risk])
+    if targets and st.button("🎯 اقتراح الحدود", key="calibrate_run"):
+        out = current_timer().run(
+            "calibrate", calibrate_thresholds, result.scored, result.cols, result.config, targets, basis, calibrate_risk
+        )
+        st.session_state[CALIBRATE_STATE_KEY] = {"key": key, **out}
+
+    state = st.session_state.get(CALIBRATE_STATE_KEY)
+    if not state or state["key"] != key:
+        return
+
+    for note in state["notes"]:
+        st.warning(note)
+    st.dataframe(state["report"], use_container_width=True, hide_index=True)
+    changes = config_changes(result.config, state["config"])
+    if changes.empty:
+        st.info("الحدود الحالية هي الأقرب للأهداف.")
+        return
+    st.dataframe(changes, use_container_width=True, hide_index=True)
+    if st.button("✅ تطبيق الحدود المقترحة على الشريط الجانبي", key="calibrate_apply"):
+        apply_config(state["config"])
+        st.rerun()
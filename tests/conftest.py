@@ -0,0 +1,55 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from benchmarks.generate import make_customers, write_customers
+from customer_ai.batch import _read_normalized, resolve_columns
+from customer_ai.columns import detect_columns
+from customer_ai.scoring import DEFAULT_CONFIG
+
+
+@pytest.fixture(scope="session")
+def customers() -> pd.DataFrame:
+    """ملف عملاء اصطناعي صغير (أرقام عربية، فواصل، %، خلايا فارغة، متوسطات صفرية)."""
+    return make_customers(3000, seed=7, reps=25)
+
+
+@pytest.fixture(scope="session")
+def cols(customers) -> dict:
+    return resolve_columns(detect_columns(customers), {})
+
+
+@pytest.fixture(scope="session")
+def source(customers, tmp_path_factory):
+    path = tmp_path_factory.mktemp("data") / "customers.csv"
+    write_customers(customers, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def frame(source) -> pd.DataFrame:
+    """الملف كما تقرؤه الواجهة والـ CLI (عناوين مطبّعة، نصوص كما هي)."""
+    return _read_normalized(source)
+
+
+@pytest.fixture(scope="session")
+def excel_frame(customers, tmp_path_factory) -> pd.DataFrame:
+    """من xlsx: أعمدة مختلطة (أرقام بجانب نصوص بأرقام عربية) كما يقرؤها pd.read_excel."""
+    path = tmp_path_factory.mktemp("data") / "customers.xlsx"
+    write_customers(customers.head(800), path)
+    return _read_normalized(path)
+
+
+@pytest.fixture
+def config() -> dict:
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def assert_results_equal(a, b):
+    """نتيجتان من خط المعالجة متطابقتان (القيم؛ الفئات category تُقارن كقيم)."""
+    for name in ["scored", "delta", "returns", "rep_turnover", "unified"]:
+        pd.testing.assert_frame_equal(getattr(a, name), getattr(b, name), check_categorical=False, obj=name)
+    if b.rep_matrix is not None:
+        pd.testing.assert_frame_equal(a.rep_matrix, b.rep_matrix, check_categorical=False, obj="rep_matrix")
+    assert a.failures == b.failures
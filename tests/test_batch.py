@@ -0,0 +1,28 @@
+import pandas as pd
+
+from customer_ai.batch import _read_normalized, _run_job, expand_inputs, output_paths
+from customer_ai.pipeline import run_pipeline
+
+
+def test_output_paths_are_unique(tmp_path):
+    sources = [tmp_path / "a" / "x.xlsx", tmp_path / "b" / "x.xlsx", tmp_path / "x.csv", tmp_path / "y.csv"]
+    paths = output_paths(sources, tmp_path / "out", ".csv")
+    assert len(set(paths)) == len(paths)
+    assert paths[-1].name == "y_نتائج_موحدة.csv"
+
+
+def test_expand_inputs_skips_unreadable_files(tmp_path):
+    for name in ["b.csv", "a.xlsx", "old.xls", "~$a.xlsx", "notes.txt"]:
+        (tmp_path / name).touch()
+    assert [p.name for p in expand_inputs([tmp_path])] == ["a.xlsx", "b.csv"]
+
+
+def test_run_job_keeps_frame_on_disk(source, cols, config, tmp_path):
+    frame_path = tmp_path / "branch.pkl"
+    job = {"source": ("x.csv", source.read_bytes()), "config": config, "overrides": {}, "output": None,
+           "frame_path": frame_path}
+    res = _run_job(job)
+    assert res["error"] is None and res["unified"] is None
+    assert res["frame_path"] == frame_path
+    expected = run_pipeline(_read_normalized(source), cols, config).unified
+    pd.testing.assert_frame_equal(pd.read_pickle(frame_path), expected)
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from customer_ai.cache import StageCache, value_nbytes
+
+
+def _frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"a": np.zeros(n), "b": np.arange(n)})
+
+
+def test_stage_cache_evicts_by_size():
+    size = value_nbytes(_frame(60_000))
+    cache = StageCache(max_entries=64, max_mb=2)
+    for i in range(5):
+        cache.get_or_compute(("f", "stage", i), _frame, 60_000)
+    assert len(cache) == 2
+    assert cache.size_bytes() == 2 * size
+    # الأحدث يبقى حتى لو كان وحده أكبر من الحد
+    cache.get_or_compute(("f", "big"), _frame, 10**6)
+    assert len(cache) == 1
+
+
+def test_stage_cache_invalidate_updates_size():
+    cache = StageCache()
+    cache.get_or_compute(("f1", "read"), _frame, 100)
+    cache.get_or_compute(("f2", "read"), _frame, 100)
+    cache.invalidate("f1")
+    assert len(cache) == 1
+    assert cache.size_bytes() == value_nbytes(_frame(100))
+
+
+def test_stage_cache_is_thread_safe():
+    cache = StageCache(max_entries=8)
+    errors = []
+
+    def compute(i):
+        time.sleep(0.0005)
+        return np.full(10, i)
+
+    def worker(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for _ in range(300):
+                i = int(rng.integers(0, 20))
+                if rng.random() < 0.1:
+                    cache.invalidate(f"f{i}")
+                else:
+                    assert cache.get_or_compute((f"f{i}", "s"), compute, i)[0] == i
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(cache) <= 8
+    assert cache.size_bytes() == sum(value_nbytes(v) for v in cache._items.values())
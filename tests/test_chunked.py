@@ -0,0 +1,22 @@
+import io
+
+import pandas as pd
+import pytest
+
+from customer_ai.chunked import run_chunked
+from customer_ai.export import write_frame
+from customer_ai.pipeline import run_pipeline
+
+
+@pytest.mark.parametrize("chunk_rows", [700, 5000])
+def test_chunked_matches_full_run(source, frame, cols, config, tmp_path, chunk_rows):
+    out = tmp_path / "chunked.csv"
+    stats = run_chunked(source, cols, config, out, "csv", chunk_rows)
+
+    full = run_pipeline(frame, cols, config)
+    assert stats["failures"] == full.failures
+    # نفس الصيغة للطرفين ثم مقارنة ما يصل للمستخدم
+    expected = io.BytesIO()
+    write_frame(full.unified, expected, "csv")
+    expected.seek(0)
+    pd.testing.assert_frame_equal(pd.read_csv(out), pd.read_csv(expected), rtol=1e-9)
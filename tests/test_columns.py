@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from customer_ai import columns
+from customer_ai.columns import _apply_numeric_hints, read_header, read_table
+
+
+@pytest.fixture
+def messy_xlsx(tmp_path):
+    """عناوين فارغة ومكررة (ومنها مكرر يتعارض مع اسم موجود مثل a.1)."""
+    path = tmp_path / "messy.xlsx"
+    wb = Workbook()
+    for row in [["a", None, "a", None, "b", "a.1", None, "b"], [1, 2, 3, 4, 5, 6, 7, 8], [1, None, 3, None, 5, 6, None, 8]]:
+        wb.active.append(row)
+    wb.save(path)
+    return path
+
+
+def test_read_header_matches_read_excel(messy_xlsx):
+    expected = list(pd.read_excel(messy_xlsx).columns)
+    assert read_header(messy_xlsx) == expected
+    assert expected == ["a", "Unnamed: 1", "a.2", "Unnamed: 3", "b", "a.1", "Unnamed: 6", "b.1"]
+
+
+@pytest.mark.parametrize("engine", [None, "calamine"])
+def test_fast_read_matches_full_read(customers, tmp_path, monkeypatch, engine):
+    if engine:
+        pytest.importorskip("python_calamine")
+    monkeypatch.setattr(columns, "FAST_EXCEL_ENGINE", engine)
+    path = tmp_path / "customers.xlsx"
+    customers.head(800).to_excel(path, index=False)
+    wanted = ["رقم المندوب", "المديونية", "متوسط السداد الربعي"]  # بترتيب الملف
+    fast = read_table(path, usecols=wanted)
+    pd.testing.assert_frame_equal(fast, pd.read_excel(path)[wanted])
+
+
+def test_numeric_hints_convert_string_columns():
+    df = pd.DataFrame({"a": pd.array(["1", "2.5"], dtype="str"), "b": ["1", "x"], "c": ["٣", "4"]})
+    out = _apply_numeric_hints(df, ["a", "b", "c"])
+    assert out["a"].tolist() == [1.0, 2.5]
+    assert out["b"].tolist() == ["1", "x"]
+    assert out["c"].tolist() == ["٣", "4"]
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from customer_ai.disk_cache import ParsedFileCache
+
+pytest.importorskip("pyarrow")
+
+
+def test_parsed_cache_round_trip(excel_frame, tmp_path):
+    cache = ParsedFileCache(tmp_path)
+    assert cache.store("k", excel_frame)
+    loaded = cache.load("k")
+    pd.testing.assert_frame_equal(loaded, excel_frame)
+    # نفس الأنواع داخل الأعمدة المختلطة (int/float/str) كما في القراءة الأصلية
+    for c in excel_frame.columns:
+        assert list(map(type, loaded[c])) == list(map(type, excel_frame[c])), c
+
+
+def test_parsed_cache_drops_corrupt_file(tmp_path):
+    cache = ParsedFileCache(tmp_path)
+    cache._path("bad").write_bytes(b"not arrow")
+    assert cache.load("bad") is None
+    assert not cache._path("bad").exists()
+
+
+def test_parsed_cache_evicts_oldest(excel_frame, tmp_path):
+    cache = ParsedFileCache(tmp_path)
+    cache.store("a", excel_frame)
+    size = cache.size_bytes()
+    cache.max_bytes = int(size * 1.5)
+    cache.store("b", excel_frame)
+    assert cache.load("a") is None
+    assert cache.load("b") is not None
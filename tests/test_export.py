@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from customer_ai.export import ExcelStreamWriter, ExportCache, write_excel
+
+
+def _frame(n: int = 50) -> pd.DataFrame:
+    return pd.DataFrame({"العميل": [f"ع{i}" for i in range(n)], "المديونية": [i * 1.5 for i in range(n)]})
+
+
+def test_export_cache_writes_once(tmp_path):
+    cache = ExportCache(tmp_path)
+    calls = []
+
+    def frame_fn():
+        calls.append(1)
+        return _frame()
+
+    first = cache.get_or_write(("k", 1), frame_fn, "csv")
+    second = cache.get_or_write(("k", 1), frame_fn, "csv")
+    assert first == second and len(calls) == 1
+    pd.testing.assert_frame_equal(pd.read_csv(first, encoding="utf-8-sig"), _frame())
+    # صيغة أو مفتاح آخر => ملف آخر
+    assert cache.get_or_write(("k", 1), frame_fn, "xlsx") != first
+    assert cache.get_or_write(("k", 2), frame_fn, "csv") != first
+    assert len(calls) == 3
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_export_cache_evicts_oldest(tmp_path):
+    cache = ExportCache(tmp_path)
+    old = cache.get_or_write("old", lambda: _frame(5000), "csv")
+    cache.max_bytes = int(old.stat().st_size * 1.5)
+    new = cache.get_or_write("new", lambda: _frame(5000), "csv")
+    assert not old.exists() and new.exists()
+
+    cache.clear()
+    assert not new.exists()
+
+
+# ================= xlsx على عدة أوراق =================
+@pytest.mark.parametrize("n, sheets", [
+    (0, ["Sheet1"]),
+    (9, ["Sheet1"]),
+    (10, ["Sheet1_1", "Sheet1_2"]),
+    (25, ["Sheet1_1", "Sheet1_2", "Sheet1_3"]),
+])
+def test_excel_splits_past_row_limit(tmp_path, n, sheets):
+    path = tmp_path / "out.xlsx"
+    # حد 10 صفوف للورقة = 9 صفوف بيانات + العناوين
+    write_excel(_frame(n), path, chunk_rows=4, max_rows=10)
+    book = pd.read_excel(path, sheet_name=None)
+    assert list(book) == sheets
+    if n:
+        assert all(len(df) <= 9 for df in book.values())
+        pd.testing.assert_frame_equal(pd.concat(book.values(), ignore_index=True), _frame(n))
+
+
+def test_excel_stream_writer_splits_across_writes(tmp_path):
+    path = tmp_path / "out.xlsx"
+    writer = ExcelStreamWriter(path, sheet_name="نتائج", max_rows=10)
+    for start in range(0, 20, 7):
+        writer.write(_frame(20).iloc[start:start + 7])
+    writer.close()
+    book = pd.read_excel(path, sheet_name=None)
+    assert list(book) == ["نتائج_1", "نتائج_2", "نتائج_3"]
+    pd.testing.assert_frame_equal(pd.concat(book.values(), ignore_index=True), _frame(20))
@@ -0,0 +1,128 @@
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_results_equal
+from customer_ai.incremental import (
+    SnapshotStore,
+    input_columns,
+    make_snapshot,
+    run_incremental,
+    snapshot_key,
+    snapshot_result,
+    unchanged_rows,
+)
+from customer_ai.pipeline import run_pipeline
+from customer_ai.scoring import DEFAULT_CONFIG
+
+ID_COL = "رقم العميل"
+
+
+def _next_week(df: pd.DataFrame, seed: int = 1) -> pd.DataFrame:
+    """ملف الأسبوع التالي: مديونيات متغيرة، عملاء محذوفون وجدد، وترتيب مختلف."""
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    new = df.copy()
+    changed = rng.choice(n, n // 20, replace=False)
+    debt = new["المديونية"].astype(object)
+    debt.iloc[changed] = "١٢٬٣٤٥"
+    new["المديونية"] = debt
+    dropped = rng.choice(np.setdiff1d(np.arange(n), changed), n // 40, replace=False)
+    new = new.drop(index=new.index[dropped])
+    added = df.iloc[: n // 40].copy()
+    added[ID_COL] = added[ID_COL] + 10**7
+    added["متوسط السداد الربعي"] = 100.0
+    new = pd.concat([new, added], ignore_index=True)
+    return new.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def previous(frame, cols):
+    return make_snapshot(run_pipeline(frame, cols, DEFAULT_CONFIG), ID_COL)
+
+
+def test_incremental_matches_full_run(frame, cols, config, previous):
+    new = _next_week(frame)
+    snap = run_incremental(new, cols, config, ID_COL, previous)
+
+    assert snap.diff["mode"] == "incremental"
+    n = len(frame)
+    assert (snap.diff["new"], snap.diff["removed"]) == (n // 40, n // 40)
+    assert snap.diff["changed"] > 0
+    assert_results_equal(snap.result, run_pipeline(new, cols, config))
+
+    migration = snap.diff["migration"]
+    assert migration.to_numpy().sum() == len(new) + snap.diff["removed"]
+
+
+def test_incremental_from_disk_snapshot(frame, cols, config, previous):
+    restored = pickle.loads(pickle.dumps(previous))
+    assert restored.result is None
+
+    same = run_incremental(frame, cols, config, ID_COL, restored)
+    assert (same.diff["mode"], same.diff["changed"], same.diff["new"]) == ("incremental", 0, 0)
+    assert_results_equal(same.result, previous.result)
+
+    new = _next_week(frame, seed=2)
+    assert_results_equal(run_incremental(new, cols, config, ID_COL, restored).result, run_pipeline(new, cols, config))
+
+
+def test_incremental_falls_back_when_leader_changes(frame, cols, config, previous):
+    new = frame.copy()
+    avg = new["متوسط السداد الربعي"].astype(object)
+    avg.iloc[5] = 10**9
+    new["متوسط السداد الربعي"] = avg
+    snap = run_incremental(new, cols, config, ID_COL, previous)
+    assert snap.diff["mode"] == "full"
+    assert_results_equal(snap.result, run_pipeline(new, cols, config))
+
+
+def test_incremental_falls_back_on_config_change(frame, cols, config, previous):
+    config["final"]["motazem"] = 16.0
+    snap = run_incremental(frame, cols, config, ID_COL, previous)
+    assert snap.diff["mode"] == "full"
+    assert snap.diff["unchanged"] == len(frame)
+
+
+def test_unchanged_rows_ignores_columns_not_read(frame, cols):
+    new = frame.copy()
+    new["اسم العميل"] = new["اسم العميل"] + " *"
+    pos = np.arange(len(frame))
+    keep = unchanged_rows(frame[input_columns(frame, cols)], pos, new[input_columns(new, cols)])
+    assert keep.all()
+
+
+# ================= اللقطات على القرص =================
+def test_snapshot_store_round_trip(excel_frame, cols, config, tmp_path):
+    snap = snapshot_result(SnapshotStore(tmp_path), excel_frame, cols, config, ID_COL, data_key="week1")
+    assert snap.diff["mode"] == "full"
+
+    # جلسة جديدة: اللقطة من القرص (بدون النتيجة الكاملة) تُعيد بناء نفس النتيجة
+    again = snapshot_result(SnapshotStore(tmp_path), excel_frame, cols, config, ID_COL, data_key="week1")
+    assert again.diff == snap.diff
+    assert_results_equal(again.result, run_pipeline(excel_frame, cols, config))
+
+
+@pytest.mark.parametrize("content", [b"\x80\x05garbage", pickle.dumps({"old": "layout"})])
+def test_snapshot_store_ignores_stale_files(tmp_path, content):
+    store = SnapshotStore(tmp_path)
+    key = snapshot_key(["a", ID_COL], ID_COL)
+    tmp_path.joinpath(f"{key}.pkl").write_bytes(content)
+    assert store.get(key) == {"base": None, "current": None}
+
+
+def test_snapshot_store_concurrent_puts(excel_frame, cols, config, tmp_path):
+    snap = make_snapshot(run_pipeline(excel_frame, cols, config), ID_COL)
+    key = snapshot_key(excel_frame.columns, ID_COL)
+    # نسختان من المخزن على نفس المجلد (جلستان/عمليتان) وعدة خيوط لكل منهما
+    stores = [SnapshotStore(tmp_path), SnapshotStore(tmp_path)]
+    threads = [threading.Thread(target=lambda s=s: [s.put(key, snap) for _ in range(5)]) for s in stores * 3]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [p.name for p in tmp_path.iterdir()] == [f"{key}.pkl"]
+    assert SnapshotStore(tmp_path).get(key)["current"].ids.equals(snap.ids)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from customer_ai.scoring import DEFAULT_CONFIG, treatment_plan_vec, _round_py
+
+RNG = np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("decimals", [2, 3])
+def test_round_py_matches_builtin_round(decimals):
+    x = np.concatenate([
+        RNG.uniform(-1e5, 1e5, 20000),
+        RNG.uniform(0, 1e5, 20000).round(decimals + 1),
+        RNG.uniform(0, 1e5, 20000).round(decimals + 1) * 1.15,
+        [11461.725, 2.675, -2.675, 0.125, 0.0],
+    ])
+    expected = [round(v, decimals) for v in x.tolist()]
+    assert _round_py(x, decimals).tolist() == expected
+
+
+@pytest.mark.parametrize("magnitude", [1e8, 1e10, 1e13, 1e14])
+def test_round_py_matches_builtin_round_on_large_ties(magnitude):
+    # أنصاف بالضبط (xx.xx5) وما يجاورها: فرق المنتصف هنا أكبر من 1e-6 بكثير
+    tie = np.floor(RNG.uniform(magnitude, magnitude * 10, 5000) * 100) / 100 + 0.005
+    x = np.concatenate([tie, -tie, np.nextafter(tie, np.inf), np.nextafter(tie, -np.inf)])
+    expected = [round(v, 2) for v in x.tolist()]
+    assert _round_py(x, 2).tolist() == expected
+
+
+def _plan_reference(class_name, pwr, avg_q, debt, installment, lost, cfg_plan):
+    """قواعد الخطة صفًا بصف كما كانت في main_tab قبل التحويل المتجه (بجدول المضاعفات)."""
+    avg_q = float(avg_q or 0)
+    debt = float(debt or 0)
+    if float(pwr or 0) < cfg_plan["min_pp"]:
+        pay, sales = debt, avg_q
+    else:
+        rule = cfg_plan["rules"].get(class_name, {"pay": 0.0, "sales": 0.0})
+        pay, sales = round(avg_q * rule["pay"], 2), round(avg_q * rule["sales"], 2)
+    final = round(pay + (float(installment) if lost else 0.0), 2)
+    return pay, sales, final
+
+
+def test_treatment_plan_vec_matches_row_rules():
+    cfg = DEFAULT_CONFIG["plan"]
+    n = 6000
+    labels = np.array(list(cfg["rules"]) + ["عميل غير مجدي"], dtype=object)
+    classes = labels[RNG.integers(0, len(labels), n)]
+    pwr = RNG.integers(0, 11, n)
+    # مبالغ بثلاث منازل => كثير منها عند منتصف السنت بعد الضرب في المضاعف
+    avg = RNG.uniform(0, 50_000, n).round(3)
+    avg[:4] = [11461.725, 2.675, 1000.005, 0.125]
+    debt = RNG.uniform(0, 90_000, n).round(2)
+    installment = RNG.uniform(0, 5000, n).round(2)
+    lost = RNG.random(n) < 0.4
+
+    out = treatment_plan_vec(classes, pwr, avg, debt, installment, lost, cfg)
+    expected = pd.DataFrame(
+        [_plan_reference(*row, cfg) for row in zip(classes, pwr, avg, debt, installment, lost)],
+        columns=out.columns,
+    )
+    pd.testing.assert_frame_equal(out, expected, check_exact=True)
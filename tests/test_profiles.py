@@ -0,0 +1,31 @@
+from customer_ai.profiles import MappingProfiles
+
+HEADER = ["رقم العميل", "المديونية", "متوسط السداد", "عمر الدين"]
+COLS = {"debt": "المديونية", "avgq": "متوسط السداد", "age": "عمر الدين", "high_avgq": None}
+
+
+def test_profiles_round_trip(tmp_path):
+    path = tmp_path / "profiles.json"
+    MappingProfiles(path).save(HEADER, {**COLS, "extra": "x"})
+
+    # نسخة جديدة (جلسة أخرى) تقرأ نفس الملف
+    profiles = MappingProfiles(path)
+    assert profiles.get(HEADER) == COLS
+    assert len(profiles) == 1
+    # شكل ملف آخر (ترتيب أو عناوين مختلفة) لا يأخذ التعيين
+    assert profiles.get(HEADER[::-1]) is None
+    assert profiles.get(HEADER + ["عمود جديد"]) is None
+
+    profiles.delete(HEADER)
+    assert profiles.get(HEADER) is None and len(profiles) == 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_profiles_ignore_missing_or_corrupt_file(tmp_path):
+    path = tmp_path / "profiles.json"
+    assert MappingProfiles(path).get(HEADER) is None
+    path.write_text("{not json", encoding="utf-8")
+    profiles = MappingProfiles(path)
+    assert profiles.get(HEADER) is None
+    profiles.save(HEADER, COLS)
+    assert profiles.get(HEADER) == COLS
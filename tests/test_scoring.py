@@ -0,0 +1,60 @@
+import numpy as np
+
+from customer_ai.scoring import (
+    DEFAULT_CONFIG,
+    score_purchase_power,
+    score_purchase_power_vec,
+    score_debt_age,
+    score_debt_age_vec,
+    score_risk,
+    score_risk_vec,
+    final_classification,
+    final_classification_vec,
+)
+
+RNG = np.random.default_rng(0)
+
+
+def _with_edges(values, thresholds):
+    """قيم عشوائية + الحدود نفسها وما حولها + NaN."""
+    t = np.asarray(list(thresholds), dtype=float)
+    return np.concatenate([values, t, t - 0.01, t + 0.01, [np.nan, 0.0, -1.0]])
+
+
+def test_purchase_power_vec_matches_scalar():
+    cfg = DEFAULT_CONFIG["pp"]
+    x = _with_edges(RNG.uniform(-5, 120, 5000), cfg.values())
+    expected = [score_purchase_power(v, cfg) for v in x]
+    assert score_purchase_power_vec(x, cfg).tolist() == expected
+
+
+def test_debt_age_vec_matches_scalar():
+    cfg = DEFAULT_CONFIG["age"]
+    # أيام صحيحة وكسرية (الكسرية تعطي خصمًا بمنزلتين قد يقع قرب المنتصف)
+    x = _with_edges(np.concatenate([RNG.integers(0, 600, 3000), RNG.uniform(0, 600, 3000).round(3)]), cfg.values())
+    expected = [float(score_debt_age(v, cfg)) for v in x]
+    assert np.asarray(score_debt_age_vec(x, cfg), dtype=float).tolist() == expected
+
+
+def test_risk_vec_matches_scalar():
+    cfg = DEFAULT_CONFIG["risk"]
+    avg = RNG.uniform(0, 10_000, 5000)
+    avg[::50] = 0.0
+    avg[1::70] = np.nan
+    ratio = RNG.uniform(0, 15, 5000)
+    debt = avg * ratio
+    debt[2::90] = np.nan
+    # الحدود بالضبط (مقام 1)
+    edges = np.array([*cfg.values(), 4.0, 6.0, 12.0])
+    debt = np.concatenate([debt, edges])
+    avg = np.concatenate([avg, np.ones(len(edges))])
+    expected = [score_risk(a, b, cfg) for a, b in zip(debt, avg)]
+    assert score_risk_vec(debt, avg, cfg).tolist() == expected
+
+
+def test_final_classification_vec_matches_scalar():
+    cfg = DEFAULT_CONFIG["final"]
+    s = _with_edges(RNG.uniform(-20, 25, 5000).round(2), [*cfg.values(), 8])
+    s = s[~np.isnan(s)]
+    expected = [final_classification(v, cfg) for v in s]
+    assert list(final_classification_vec(s, cfg)) == expected
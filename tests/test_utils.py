@@ -0,0 +1,12 @@
+import pandas as pd
+
+from customer_ai.utils import clean_numeric_with_failures
+
+
+def test_clean_numeric_with_duplicate_index():
+    s = pd.Series(["1,200", "٣٤%", None, "x"], index=[0, 0, 1, 1])
+    out, failed = clean_numeric_with_failures(s)
+    assert out.index.equals(s.index)
+    assert out.tolist()[:2] == [1200.0, 34.0]
+    assert out.iloc[2:].isna().all()
+    assert failed == 1
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from customer_ai.pipeline import run_pipeline
+from customer_ai.viewer import select_rows
+
+CLASS_COL = "التصنيف النهائي"
+
+
+def test_select_rows_matches_pandas(frame, cols, config):
+    df = run_pipeline(frame, cols, config).scored
+    classes = df[CLASS_COL].dropna().unique()[:2].tolist()
+    pos = select_rows(df, search="1", search_columns=["رقم العميل"], filters={CLASS_COL: classes},
+                      sort_by=cols["debt"], ascending=False)
+
+    hit = df["رقم العميل"].astype(str).str.contains("1", regex=False) & df[CLASS_COL].isin(classes)
+    expected = df[hit].sort_values(cols["debt"], ascending=False, kind="stable", na_position="last")
+    assert 0 < len(pos) < len(df)
+    assert pos.tolist() == [df.index.get_loc(i) for i in expected.index]
+
+
+def test_select_rows_search_ignores_missing_values():
+    df = pd.DataFrame({"الاسم": ["أحمد", None, "محمد"], "ملاحظة": [np.nan, "nan", "none"]})
+    assert select_rows(df, search="nan").tolist() == [1]
+    assert select_rows(df, search="NONE").tolist() == [2]
+    assert select_rows(df, search="").tolist() == [0, 1, 2]
+
+
+def test_select_rows_sorts_mixed_column_as_text():
+    df = pd.DataFrame({"الكود": [10, "ب", 2, None, "أ"]}, index=[5, 5, 6, 7, 8])
+    assert select_rows(df, sort_by="الكود").tolist() == [0, 2, 4, 1, 3]
+    # فلتر بدون قيم أو عمود غير موجود لا يحذف شيئًا
+    assert select_rows(df, filters={"الكود": [], "غير موجود": [1]}).tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from customer_ai.pipeline import run_pipeline
+from customer_ai.scoring import DEFAULT_CONFIG, FINAL_DEFAULT, FINAL_LABELS
+from customer_ai.whatif import (
+    CLASS_LABELS,
+    FINAL_CUTS,
+    calibrate_thresholds,
+    final_cuts_for_shares,
+    sweep_thresholds,
+    threshold_grid,
+)
+
+CLASS_COL = "التصنيف النهائي"
+
+
+@pytest.fixture(scope="module")
+def base(frame, cols):
+    return run_pipeline(frame, cols, DEFAULT_CONFIG)
+
+
+def test_sweep_matches_full_runs(frame, cols, base, config):
+    ranges = {"final.motazem": [15.0, 17.0], "risk.r_3": [1.5, 2.5], "pp.pp_8": [20.0, 30.0], "age.age_3": [45, 51]}
+    variants = threshold_grid(config, ranges)
+    table = sweep_thresholds(base.scored, cols, config, variants)
+
+    assert len(table) == len(variants) + 1
+    assert table.loc[0, "عملاء تغير تصنيفهم"] == 0
+    base_class = base.scored[CLASS_COL].astype(str)
+    for row, (values, cfg) in enumerate(variants, start=1):
+        assert table.loc[row, list(values)].to_dict() == values
+        classes = run_pipeline(frame, cols, cfg).scored[CLASS_COL].astype(str)
+        counts = classes.value_counts()
+        assert [table.loc[row, f"عدد: {c}"] for c in CLASS_LABELS] == [counts.get(c, 0) for c in CLASS_LABELS]
+        assert table.loc[row, "عملاء تغير تصنيفهم"] == (classes != base_class).sum()
+
+
+def test_threshold_grid_rejects_unknown_and_oversized(config):
+    with pytest.raises(ValueError):
+        threshold_grid(config, {"final.unknown": [1]})
+    with pytest.raises(ValueError):
+        threshold_grid(config, {"final.motazem": range(100), "final.jayed": range(100)})
+
+
+# ================= معايرة الحدود =================
+def test_final_cuts_hit_exact_shares(config):
+    # 100 مجموع مختلف بوزن واحد => كل نسبة بمضاعفات 1% قابلة للتحقيق بالضبط
+    total = np.arange(100, dtype=float) / 4
+    targets = dict(zip(FINAL_LABELS, [10, 20, 30, 15]))
+    cuts = final_cuts_for_shares(total, np.ones(100), config["final"], targets)
+    bounds = [cuts[k] for k in FINAL_CUTS]
+    assert bounds == sorted(bounds, reverse=True)
+    edges = [np.inf, *bounds]
+    shares = [((total >= lo) & (total < hi)).sum() for hi, lo in zip(edges, bounds)]
+    assert shares == [10, 20, 30, 15]
+
+
+def test_final_cuts_keep_untargeted_cut(config):
+    total = np.arange(100, dtype=float) / 4
+    cuts = final_cuts_for_shares(total, np.ones(100), config["final"], {FINAL_LABELS[0]: 10})
+    assert cuts["motazem"] == 22.5
+    assert {k: cuts[k] for k in FINAL_CUTS[1:]} == {k: config["final"][k] for k in FINAL_CUTS[1:]}
+
+
+@pytest.mark.parametrize("basis", ["debt", "count"])
+def test_calibrated_config_reproduces_report(frame, cols, base, config, basis):
+    targets = dict(zip(CLASS_LABELS, [15, 25, 20, 15, 5, 20]))
+    out = calibrate_thresholds(base.scored, cols, config, targets, basis=basis, calibrate_risk=True)
+    assert not out["notes"]
+
+    # التشغيل الكامل بالإعدادات المقترحة يعطي نفس النسب المعروضة في التقرير
+    scored = run_pipeline(frame, cols, out["config"]).scored
+    weights = scored[cols["debt"]].fillna(0) if basis == "debt" else pd.Series(1.0, index=scored.index)
+    shares = weights.groupby(scored[CLASS_COL].astype(str)).sum() / weights.sum() * 100
+    report = out["report"].set_index("التصنيف")
+    assert np.allclose([shares.get(c, 0.0) for c in CLASS_LABELS], report["المقترح %"], atol=0.01)
+    # هدف "عميل غير مجدي" حد أقصى
+    assert report.loc[FINAL_DEFAULT, "المقترح %"] <= targets[FINAL_DEFAULT]
+
+
+def test_calibrate_notes_floor_target_without_risk(base, cols, config):
+    out = calibrate_thresholds(base.scored, cols, config, {FINAL_DEFAULT: 5})
+    assert out["config"]["risk"] == config["risk"]
+    assert out["notes"]